@@ -0,0 +1,112 @@
+"""
+GameDatabase 混合读写吞吐基准
+
+对比单连接模式（旧实现：所有工具共用一个连接）与 WAL 连接池模式
+（单写连接 + 只读连接池）在持续写入压力下的读吞吐与读延迟。
+
+用法：
+    python benchmarks/bench_database_pool.py --readers 8 --seconds 5
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import GameDatabase  # noqa: E402
+
+# 基准只关心数据库开销，关闭逐条 DEBUG 日志
+logging.getLogger().setLevel(logging.INFO)
+
+
+def _seed(db: GameDatabase, games: int, events_per_game: int):
+    for g in range(games):
+        for i in range(events_per_game):
+            db.record_event(
+                round_num=i // 10 + 1,
+                speaker=f"player{i % 8}",
+                content=f"statement {i} in game {g}",
+                action_type="speak",
+                game_id=f"game_{g}"
+            )
+
+
+def run(pooled: bool, readers: int, seconds: float, games: int, events_per_game: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = GameDatabase(
+            db_path=os.path.join(tmp, "bench.db"),
+            pooled=pooled,
+            reader_pool_size=readers
+        )
+        _seed(db, games, events_per_game)
+
+        stop = threading.Event()
+        read_latencies = [[] for _ in range(readers)]
+        write_count = [0]
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                db.record_event(
+                    round_num=1,
+                    speaker=f"player{i % 8}",
+                    content=f"burst {i}",
+                    action_type="speak",
+                    game_id=f"game_{i % games}"
+                )
+                write_count[0] += 1
+                i += 1
+
+        def reader(slot: int):
+            i = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                db.get_game_history(game_id=f"game_{i % games}", speaker=f"player{i % 8}", limit=20)
+                db.get_game_state(f"game_{i % games}")
+                read_latencies[slot].append(time.perf_counter() - start)
+                i += 1
+
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        db.close()
+
+    latencies = sorted(x for slot in read_latencies for x in slot)
+    return {
+        "reads_per_sec": len(latencies) / seconds,
+        "writes_per_sec": write_count[0] / seconds,
+        "read_p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "read_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--events-per-game", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'reads/s':>12}{'writes/s':>12}{'read p50 ms':>14}{'read p95 ms':>14}")
+    for label, pooled in (("single", False), ("wal-pool", True)):
+        r = run(pooled, args.readers, args.seconds, args.games, args.events_per_game)
+        print(
+            f"{label:<12}{r['reads_per_sec']:>12.0f}{r['writes_per_sec']:>12.0f}"
+            f"{r['read_p50_ms']:>14.3f}{r['read_p95_ms']:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+PlayerProfile 更新吞吐基准
+
+对比三种写法在 5/12/50 人对局下每秒能完成的档案更新次数：
+- legacy：旧实现，SELECT + 动态 UPDATE/INSERT + commit，每次三次往返
+- upsert：单条 INSERT ... ON CONFLICT DO UPDATE + commit
+- bulk：update_player_profiles_many，一轮所有玩家一次事务
+
+用法：
+    python benchmarks/bench_profile_upsert.py --rounds 200
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import GameDatabase  # noqa: E402
+
+# 基准只关心数据库开销，关闭逐条 DEBUG 日志
+logging.getLogger().setLevel(logging.INFO)
+
+
+def legacy_update(db: GameDatabase, player_id: str, suspicion_score: float, game_id: str):
+    cursor = db.conn.cursor()
+    existing = cursor.execute(
+        "SELECT * FROM PlayerProfile WHERE player_id = ?", (player_id,)
+    ).fetchone()
+    if existing:
+        cursor.execute(
+            "UPDATE PlayerProfile SET suspicion_score = ?, game_id = ?, updated_at = ? WHERE player_id = ?",
+            (suspicion_score, game_id, datetime.now().isoformat(), player_id)
+        )
+    else:
+        cursor.execute(
+            "INSERT INTO PlayerProfile (player_id, suspicion_score, game_id, updated_at) VALUES (?, ?, ?, ?)",
+            (player_id, suspicion_score, game_id, datetime.now().isoformat())
+        )
+    db.conn.commit()
+
+
+def run(mode: str, players: int, rounds: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = GameDatabase(db_path=os.path.join(tmp, "bench.db"), pooled=True)
+        player_ids = [f"player{i}" for i in range(players)]
+        start = time.perf_counter()
+        for r in range(rounds):
+            score = (r % 100) / 100
+            if mode == "legacy":
+                for player_id in player_ids:
+                    legacy_update(db, player_id, score, "bench")
+            elif mode == "upsert":
+                for player_id in player_ids:
+                    db.update_player_profile(player_id, suspicion_score=score, game_id="bench")
+            else:
+                db.update_player_profiles_many(
+                    [{"player_id": player_id, "suspicion_score": score} for player_id in player_ids],
+                    game_id="bench"
+                )
+        elapsed = time.perf_counter() - start
+        db.close()
+    return players * rounds / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'players':>8}{'legacy/s':>12}{'upsert/s':>12}{'bulk/s':>12}")
+    for players in (5, 12, 50):
+        results = [run(mode, players, args.rounds) for mode in ("legacy", "upsert", "bulk")]
+        print(f"{players:>8}" + "".join(f"{r:>12.0f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+热重启耗时基准
+
+构造 N 局进行中的对局（每局若干关系事件与证据），对比两种恢复方式的耗时：
+- full-replay：没有检查点，从头重放全部事件日志
+- checkpoint：加载每局检查点，只重放其后的少量事件
+
+用法：
+    python benchmarks/bench_warm_restart.py --games 500 --events-per-game 400
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.async_database import AsyncGameDatabase  # noqa: E402
+from core.checkpoint import CheckpointManager, encode_state  # noqa: E402
+from core.database import GameDatabase  # noqa: E402
+from core.session import GameSession, SessionRegistry  # noqa: E402
+
+# 基准只关心恢复开销，关闭逐条 DEBUG 日志
+logging.getLogger().setLevel(logging.INFO)
+
+
+def _seed(db: GameDatabase, games: int, events_per_game: int, tail: int, checkpoints: bool):
+    for g in range(games):
+        game_id = f"game_{g}"
+        db.update_game_state(game_id, current_round=1, alive_players=[f"p{i}" for i in range(12)], game_status="active")
+        session = GameSession(game_id)
+        events = [
+            {
+                "round_num": i // 24 + 1,
+                "speaker": f"p{i % 12}",
+                "content": f"statement {i} in {game_id}",
+                "action_type": "speak",
+                "game_id": game_id,
+                "target_player": f"p{(i * 7 + 3) % 12}",
+                "relation_type": "attack" if i % 3 else "support",
+            }
+            for i in range(events_per_game)
+        ]
+        ids = db.record_events(events)
+        evidence_ids = [
+            db.record_suspicion_evidence(game_id, f"p{i % 12}", (i % 10) / 10, "behavior")
+            for i in range(events_per_game // 10)
+        ]
+        if checkpoints:
+            # 检查点覆盖除最后 tail 个事件之外的全部日志
+            covered = len(ids) - tail
+            session.apply_history_events([{**e, "id": i} for e, i in zip(events[:covered], ids[:covered])])
+            db.save_engine_checkpoint(game_id, encode_state(session.to_state()), ids[covered - 1], evidence_ids[-1] if evidence_ids else 0)
+
+
+def run(games: int, events_per_game: int, tail: int, checkpoints: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = GameDatabase(db_path=path, pooled=True)
+        _seed(db, games, events_per_game, tail, checkpoints)
+        db.close()
+
+        adb = AsyncGameDatabase(GameDatabase(db_path=path, pooled=True))
+        registry = SessionRegistry(adb, max_sessions=games, max_memory_mb=0, idle_ttl_seconds=0)
+        result = CheckpointManager(registry).attach().warm_restart()
+        adb.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--events-per-game", type=int, default=400)
+    parser.add_argument("--tail", type=int, default=20, help="检查点之后未覆盖的事件数")
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'games':>8}{'seconds':>10}")
+    for label, checkpoints in (("full-replay", False), ("checkpoint", True)):
+        r = run(args.games, args.events_per_game, args.tail, checkpoints)
+        print(f"{label:<14}{r['games']:>8}{r['seconds']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from core.database import GameDatabase
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("async_database")
+
+
+class AsyncGameDatabase:
+    """GameDatabase 的异步外观
+
+    所有工具/资源/Prompt 都是 async 函数，直接调用同步的 GameDatabase 会阻塞
+    uvicorn 事件循环。这里把读操作放到读线程池、写操作放到专用写线程执行，
+    调用方只需 await，慢查询或 commit 不再拖慢其他 SSE 会话。
+    """
+
+    def __init__(
+        self,
+        db: GameDatabase,
+        reader_threads: Optional[int] = None,
+        writer_threads: Optional[int] = None
+    ):
+        self.db = db
+        if reader_threads is None:
+            reader_threads = int(get_config("database.async.reader_threads", 4))
+        if writer_threads is None:
+            writer_threads = int(get_config("database.async.writer_threads", 0))
+        if writer_threads <= 0:
+            # 0 表示自动：组提交需要多个写线程同时等在窗口内才能合并 commit，
+            # 单写线程下窗口只会给每次写入平添延迟
+            writer_threads = int(get_config("database.group_commit.writers", 8)) if db.group_commit_enabled else 1
+        elif writer_threads == 1 and db.group_commit_enabled:
+            logger.warning(
+                "Group commit window is set but writer_threads=1: writes cannot coalesce, "
+                "each one only waits out the window"
+            )
+        self._readers = ThreadPoolExecutor(
+            max_workers=max(1, reader_threads), thread_name_prefix="db-reader"
+        )
+        self._writers = ThreadPoolExecutor(
+            max_workers=max(1, writer_threads), thread_name_prefix="db-writer"
+        )
+        logger.info(
+            f"Async database facade ready (readers={reader_threads}, writers={writer_threads})"
+        )
+
+    async def run_read(self, func: Callable, *args, **kwargs) -> Any:
+        """在读线程池中执行任意只读函数（例如对 self.db 的组合查询）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(func, *args, **kwargs))
+
+    async def run_write(self, func: Callable, *args, **kwargs) -> Any:
+        """在写线程中执行任意写函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writers, functools.partial(func, *args, **kwargs))
+
+    def submit_write(self, func: Callable, *args, **kwargs) -> Future:
+        """提交写操作但不等待结果，可在同步回调中使用（例如会话淘汰时保存检查点）"""
+        return self._writers.submit(func, *args, **kwargs)
+
+    # ========== GameHistory ==========
+    async def record_event(self, *args, **kwargs) -> int:
+        return await self.run_write(self.db.record_event, *args, **kwargs)
+
+    async def record_events(self, events: List[Dict[str, Any]]) -> List[int]:
+        return await self.run_write(self.db.record_events, events)
+
+    async def get_game_history(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self.run_read(self.db.get_game_history, *args, **kwargs)
+
+    async def search_game_history(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self.run_read(self.db.search_game_history, *args, **kwargs)
+
+    async def archive_game(self, *args, **kwargs) -> Dict[str, Any]:
+        return await self.run_write(self.db.archive_game, *args, **kwargs)
+
+    async def get_latest_history_id(self, game_id: str) -> int:
+        return await self.run_read(self.db.get_latest_history_id, game_id)
+
+    # ========== SuspicionEvidence / EngineCheckpoint ==========
+    async def record_suspicion_evidence(self, *args, **kwargs) -> int:
+        return await self.run_write(self.db.record_suspicion_evidence, *args, **kwargs)
+
+    async def record_suspicion_evidence_many(self, *args, **kwargs) -> List[int]:
+        return await self.run_write(self.db.record_suspicion_evidence_many, *args, **kwargs)
+
+    async def get_suspicion_evidence(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self.run_read(self.db.get_suspicion_evidence, *args, **kwargs)
+
+    async def get_latest_evidence_id(self, game_id: str) -> int:
+        return await self.run_read(self.db.get_latest_evidence_id, game_id)
+
+    async def save_engine_checkpoint(self, *args, **kwargs):
+        return await self.run_write(self.db.save_engine_checkpoint, *args, **kwargs)
+
+    async def get_engine_checkpoint(self, game_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self.db.get_engine_checkpoint, game_id)
+
+    # ========== PlayerProfile ==========
+    async def update_player_profile(self, *args, **kwargs):
+        return await self.run_write(self.db.update_player_profile, *args, **kwargs)
+
+    async def update_player_profiles_many(self, *args, **kwargs):
+        return await self.run_write(self.db.update_player_profiles_many, *args, **kwargs)
+
+    async def get_player_profile(self, player_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self.db.get_player_profile, player_id)
+
+    async def get_all_player_profiles(self, game_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self.run_read(self.db.get_all_player_profiles, game_id)
+
+    # ========== GameState ==========
+    async def update_game_state(self, *args, **kwargs):
+        return await self.run_write(self.db.update_game_state, *args, **kwargs)
+
+    async def get_game_state(self, game_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self.db.get_game_state, game_id)
+
+    # ========== TrainingData ==========
+    async def create_training_data(self, *args, **kwargs):
+        return await self.run_write(self.db.create_training_data, *args, **kwargs)
+
+    async def get_training_data(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        return await self.run_read(self.db.get_training_data, *args, **kwargs)
+
+    async def count_training_data(self, *args, **kwargs) -> int:
+        return await self.run_read(self.db.count_training_data, *args, **kwargs)
+
+    async def has_training_data(self, *args, **kwargs) -> bool:
+        return await self.run_read(self.db.has_training_data, *args, **kwargs)
+
+    # ========== ModelVersion ==========
+    async def create_model_version(self, *args, **kwargs):
+        return await self.run_write(self.db.create_model_version, *args, **kwargs)
+
+    async def get_model_version(self, version_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self.db.get_model_version, version_id)
+
+    async def update_model_version(self, *args, **kwargs):
+        return await self.run_write(self.db.update_model_version, *args, **kwargs)
+
+    # ========== TrainingRun ==========
+    async def create_training_run(self, *args, **kwargs):
+        return await self.run_write(self.db.create_training_run, *args, **kwargs)
+
+    async def get_training_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run_read(self.db.get_training_run, run_id)
+
+    async def update_training_run(self, *args, **kwargs):
+        return await self.run_write(self.db.update_training_run, *args, **kwargs)
+
+    def close(self):
+        self._readers.shutdown(wait=True)
+        self._writers.shutdown(wait=True)
+        self.db.close()
@@ -1,22 +1,79 @@
-from typing import Dict, List, Optional
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from core.contradiction_index import contradiction_score, default_lexicon
+from core.evidence_buffer import EvidenceBuffer, EvidenceRecord
+from core.likelihood_tables import get_likelihood_tables
+from modules.YA_Common.utils.config import get_config
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("bayesian_inference")
 
+# 硬事实（预言家查验、出局翻牌）在证据日志中的类型，evidence_score 为 1.0（狼人）或 0.0（好人）
+ROLE_FACT = "role_fact"
+
+
+def _logit(p: float) -> float:
+    if p <= 0.0:
+        return -math.inf
+    if p >= 1.0:
+        return math.inf
+    return math.log(p) - math.log1p(-p)
+
+
+def _sigmoid(x: float) -> float:
+    return 0.5 * (1.0 + math.tanh(0.5 * x))
+
+
+def _independent_pairs(marginals: np.ndarray) -> np.ndarray:
+    """各玩家相互独立时的两两联合概率：外积，对角线为边缘概率"""
+    pairs = np.outer(marginals, marginals)
+    np.fill_diagonal(pairs, marginals)
+    return pairs
+
+
+def _combine_pairs(
+    players: List[str],
+    pairs: np.ndarray,
+    other_players: List[str],
+    other_pairs: np.ndarray
+) -> Tuple[List[str], np.ndarray]:
+    """拼接两组互相独立的玩家的两两联合概率矩阵"""
+    if not other_players:
+        return players, pairs
+    size = len(players)
+    combined = np.empty((size + len(other_players),) * 2, dtype=np.float64)
+    combined[:size, :size] = pairs
+    combined[size:, size:] = other_pairs
+    combined[:size, size:] = np.outer(np.diag(pairs), np.diag(other_pairs))
+    combined[size:, :size] = combined[:size, size:].T
+    return players + other_players, combined
+
 
 class BayesianInference:
+    """逐玩家独立的贝叶斯推理
+
+    后验在对数几率空间累加：logit(p) += log(L(wolf) / L(villager))，并限制在
+    ±inference.max_log_odds 内，长对局中大量高置信证据不会把概率推到 0 或 1
+    （只有硬事实能确定身份）。每个玩家的证据只在内存中保留最近
+    inference.evidence_history_size 条，更早的证据在 SuspicionEvidence 表中。
+    对数似然比按证据类型查 inference.likelihood_tables 拟合的表，没有表的类型使用线性似然。
+    """
+    
     def __init__(self):
+        self.max_log_odds = float(get_config("inference.max_log_odds", 20))
+        self.evidence_capacity = int(get_config("inference.evidence_history_size", 32))
+        self.likelihood_tables = get_likelihood_tables()
         self.prior_probabilities: Dict[str, float] = {}
-        self.evidence_history: Dict[str, List[Dict]] = {}
+        self.evidence_history: Dict[str, EvidenceBuffer] = {}
         
     def initialize_priors(self, player_ids: List[str], total_wolves: int = 2):
         total_players = len(player_ids)
         wolf_prior = total_wolves / total_players
-        villager_prior = 1.0 - wolf_prior
         
         for player_id in player_ids:
             self.prior_probabilities[player_id] = wolf_prior
-            self.evidence_history[player_id] = []
+            self._reset_evidence(player_id)
         
         logger.info(f"Initialized priors for {len(player_ids)} players")
     
@@ -27,44 +84,163 @@ class BayesianInference:
         evidence_type: str = "general",
         description: str = ""
     ) -> float:
-        if player_id not in self.prior_probabilities:
-            self.prior_probabilities[player_id] = 0.4
-        
-        prior = self.prior_probabilities[player_id]
-        
-        evidence_history = self.evidence_history.get(player_id, [])
-        evidence_history.append({
-            "score": evidence_score,
-            "type": evidence_type,
+        return self.update_suspicion_batch([{
+            "player_id": player_id,
+            "evidence_score": evidence_score,
+            "evidence_type": evidence_type,
             "description": description
+        }])[player_id]
+    
+    def update_suspicion_batch(self, evidence: List[Dict]) -> Dict[str, float]:
+        posteriors = {}
+        for item in evidence:
+            player_id = item["player_id"]
+            prior = self.prior_probabilities.get(player_id, 0.4)
+            llr = self._log_likelihood_ratio(item["evidence_score"], item.get("evidence_type") or "general")
+            posterior = _sigmoid(self._clamp(_logit(prior) + llr))
+            self.prior_probabilities[player_id] = posterior
+            self._record_evidence(item)
+            
+            logger.debug(
+                f"Updated suspicion for {player_id}: {prior:.3f} -> {posterior:.3f} "
+                f"(evidence: {item['evidence_score']:.3f})"
+            )
+            posteriors[player_id] = posterior
+        return posteriors
+    
+    def add_evidence_batch(self, evidence: List[Dict]):
+        # 只应用证据、不需要返回后验时使用（例如重放事件日志），采样类引擎可以推迟计算
+        self.update_suspicion_batch(evidence)
+    
+    def diagnostics(self) -> Dict[str, Any]:
+        # 近似推理引擎的运行统计（例如有效样本量），精确引擎为空
+        return {}
+    
+    async def refresh(self):
+        """在事件循环之外算好并缓存后验，之后的 get_suspicion / pair_marginals 直接读缓存
+
+        精确引擎的后验在更新时已算好，无需预先计算；采样类引擎在线程中运行采样。
+        """
+    
+    def role_possible(self, player_id: str, is_wolf: bool) -> bool:
+        suspicion = self.get_suspicion(player_id)
+        return suspicion > 0.0 if is_wolf else suspicion < 1.0
+    
+    def observe_role(
+        self,
+        player_id: str,
+        is_wolf: bool,
+        description: str = "",
+        evidence_id: Optional[int] = None
+    ) -> bool:
+        """记录硬事实：该玩家的身份已确定；与已有事实矛盾时忽略并返回 False"""
+        if not self.role_possible(player_id, is_wolf):
+            logger.warning(f"Ignored role fact for {player_id} (is_wolf={is_wolf}): contradicts earlier facts")
+            return False
+        self._set_role(player_id, is_wolf)
+        self._record_evidence({
+            "player_id": player_id,
+            "evidence_score": 1.0 if is_wolf else 0.0,
+            "evidence_type": ROLE_FACT,
+            "description": description,
+            "id": evidence_id
         })
-        self.evidence_history[player_id] = evidence_history
-        
-        likelihood_wolf = self._calculate_likelihood(evidence_score, is_wolf=True)
-        likelihood_villager = self._calculate_likelihood(evidence_score, is_wolf=False)
-        
-        posterior = (likelihood_wolf * prior) / (
-            likelihood_wolf * prior + likelihood_villager * (1 - prior)
-        )
-        
-        self.prior_probabilities[player_id] = posterior
-        
-        logger.debug(
-            f"Updated suspicion for {player_id}: {prior:.3f} -> {posterior:.3f} "
-            f"(evidence: {evidence_score:.3f})"
+        return True
+    
+    def _set_role(self, player_id: str, is_wolf: bool):
+        # 概率为 0/1 后，后续证据的贝叶斯更新不会再改变它
+        self.prior_probabilities[player_id] = 1.0 if is_wolf else 0.0
+    
+    def _clamp(self, log_odds: float) -> float:
+        # 硬事实对应 ±inf，不做限制
+        if math.isinf(log_odds):
+            return log_odds
+        return max(-self.max_log_odds, min(self.max_log_odds, log_odds))
+    
+    def _log_likelihood_ratio(self, evidence_score: float, evidence_type: str = "general") -> float:
+        # log(L(wolf) / L(villager))；没有拟合表的类型使用线性似然 linear_log_ratio
+        # 不在 [0, 1] 内的分数（包括 NaN）不计入，否则对数几率会一直保持 NaN
+        if not 0.0 <= evidence_score <= 1.0:
+            return 0.0
+        return self.likelihood_tables.log_ratio(evidence_type, evidence_score)
+    
+    def _log_likelihood_ratios(self, evidence: List[Dict[str, Any]]):
+        """一批证据的对数似然比数组，供向量化引擎使用；不在 [0, 1] 内的分数记为 0"""
+        scores = np.fromiter((item["evidence_score"] for item in evidence), dtype=np.float64, count=len(evidence))
+        valid = (scores >= 0.0) & (scores <= 1.0)
+        llr = self.likelihood_tables.log_ratios(
+            [item.get("evidence_type") or "general" for item in evidence],
+            np.where(valid, scores, 0.5)
         )
-        
-        return posterior
+        llr[~valid] = 0.0
+        return llr
     
-    def _calculate_likelihood(self, evidence_score: float, is_wolf: bool) -> float:
-        if is_wolf:
-            return 0.5 + 0.5 * evidence_score
-        else:
-            return 0.5 + 0.5 * (1 - evidence_score)
+    # ========== 证据记录 ==========
+    def _reset_evidence(self, player_id: str):
+        self.evidence_history[player_id] = EvidenceBuffer(self.evidence_capacity)
+    
+    def _record_evidence(self, item: Dict[str, Any]):
+        buffer = self.evidence_history.get(item["player_id"])
+        if buffer is None:
+            buffer = self.evidence_history[item["player_id"]] = EvidenceBuffer(self.evidence_capacity)
+        buffer.append(EvidenceRecord(
+            item["evidence_score"],
+            item.get("evidence_type") or "general",
+            item.get("description") or "",
+            item.get("id")
+        ))
+    
+    def evidence_count(self, player_id: str) -> int:
+        """累计证据条数（包括已移出内存的证据）"""
+        buffer = self.evidence_history.get(player_id)
+        return buffer.total if buffer is not None else 0
+    
+    def _evidence_state(self) -> Dict[str, Any]:
+        return {player_id: buffer.to_state() for player_id, buffer in self.evidence_history.items()}
+    
+    def _load_evidence(self, state: Dict[str, Any]):
+        self.evidence_history = {
+            player_id: EvidenceBuffer.from_state(items, self.evidence_capacity)
+            for player_id, items in state.get("evidence", {}).items()
+        }
     
     def get_suspicion(self, player_id: str) -> float:
         return self.prior_probabilities.get(player_id, 0.4)
     
+    def pair_marginals(self) -> Tuple[List[str], np.ndarray]:
+        """(玩家列表, P[i, j] = 玩家 i 与 j 都是狼的概率)，对角线为各自的后验；独立模型为外积"""
+        suspicions = self.get_all_suspicions()
+        players = list(suspicions)
+        return players, _independent_pairs(np.fromiter(suspicions.values(), dtype=np.float64, count=len(players)))
+    
+    def leave_one_out(self, evidence: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """逐条去掉证据后所有玩家的后验，返回 (玩家列表, 当前后验, 证据数 x 玩家数 矩阵)
+
+        证据在对数几率上可加，去掉玩家 j 的一条对数似然比为 l 的证据，等于把 j 为狼的
+        情形的权重乘以 c = exp(-l)，因此只需当前的两两联合概率 P，所有证据一次算完：
+
+            p_i' = (P[i, i] + (c - 1) P[i, j]) / (1 + (c - 1) P[j, j])
+
+        独立模型中只有 j 自己的后验变化，联合模型中其他玩家随之变化。未计入对数几率限幅；
+        硬事实不可去掉，对应行即当前后验。
+        """
+        players, pairs = self.pair_marginals()
+        current = np.diag(pairs).copy()
+        index = {player_id: slot for slot, player_id in enumerate(players)}
+        without = np.tile(current, (len(evidence), 1))
+        rows = [
+            row for row, item in enumerate(evidence)
+            if item["player_id"] in index and item.get("evidence_type") != ROLE_FACT
+        ]
+        if rows:
+            items = [evidence[row] for row in rows]
+            slots = np.fromiter((index[item["player_id"]] for item in items), dtype=np.intp, count=len(items))
+            scale = np.expm1(-self._log_likelihood_ratios(items))
+            numerator = current + scale[:, None] * pairs[slots]
+            denominator = 1.0 + scale * current[slots]
+            without[rows] = np.clip(numerator / denominator[:, None], 0.0, 1.0)
+        return players, current, without
+    
     def get_all_suspicions(self) -> Dict[str, float]:
         return self.prior_probabilities.copy()
     
@@ -74,43 +250,130 @@ class BayesianInference:
         current_statement: str,
         historical_statements: List[Dict]
     ) -> float:
-        if not historical_statements:
-            return 0.0
-        
-        contradiction_score = 0.0
-        contradiction_count = 0
-        
-        for hist in historical_statements:
-            if self._detect_contradiction(current_statement, hist.get("content", "")):
-                contradiction_count += 1
-                contradiction_score += 0.3
-        
-        if contradiction_count > 0:
-            final_score = min(0.9, contradiction_score / len(historical_statements))
-            return final_score
-        
-        return 0.0
+        """当前发言与给定历史发言的矛盾分数；对局中的发言应使用会话的 ContradictionIndex"""
+        lexicon = default_lexicon()
+        opposites = lexicon.opposites(lexicon.features(current_statement))
+        contradiction_count = sum(
+            1 for hist in historical_statements
+            if opposites & lexicon.features(hist.get("content", ""))
+        )
+        return contradiction_score(contradiction_count, len(historical_statements))
     
     def _detect_contradiction(self, statement1: str, statement2: str) -> bool:
-        statement1_lower = statement1.lower()
-        statement2_lower = statement2.lower()
-        
-        contradiction_keywords = [
-            ("not", "is"),
-            ("never", "always"),
-            ("did", "didn't"),
-            ("was", "wasn't"),
-            ("saw", "didn't see"),
-        ]
-        
-        for neg, pos in contradiction_keywords:
-            if (neg in statement1_lower and pos in statement2_lower) or \
-               (neg in statement2_lower and pos in statement1_lower):
-                return True
-        
-        return False
+        return default_lexicon().contradicts(statement1, statement2)
+    
+    def to_state(self) -> Dict:
+        return {
+            "priors": dict(self.prior_probabilities),
+            "evidence": self._evidence_state()
+        }
+    
+    def load_state(self, state: Dict):
+        self.prior_probabilities = dict(state.get("priors", {}))
+        self._load_evidence(state)
     
     def reset(self):
         self.prior_probabilities.clear()
         self.evidence_history.clear()
         logger.info("Bayesian inference model reset")
+
+
+class RosterInference(BayesianInference):
+    """在 initialize_priors 名单上做联合推理的引擎的公共部分（联合枚举、采样）
+
+    名单内的玩家由子类处理（_index 为玩家 -> 下标，_add_roster / _set_roster_role 更新名单内的状态）；
+    名单外的玩家交给后备引擎 _fallback。后备引擎在第一次遇到名单外玩家时才创建，
+    与本引擎共享证据缓冲区。更新统一经过 add_evidence_batch，后验通过 get_suspicion 读取，
+    采样类引擎因此可以推迟计算。
+    """
+    
+    def __init__(self, fallback_factory: Callable[[], BayesianInference] = BayesianInference):
+        self._fallback_factory = fallback_factory
+        self._fallback_engine: Optional[BayesianInference] = None
+        super().__init__()
+    
+    @property
+    def _fallback(self) -> BayesianInference:
+        if self._fallback_engine is None:
+            self._fallback_engine = self._fallback_factory()
+        # load_state 会替换证据字典，每次取用时重新共享
+        self._fallback_engine.evidence_history = self.evidence_history
+        return self._fallback_engine
+    
+    def _set_outside_priors(self, priors: Dict[str, float]):
+        # 名单外玩家的先验；为空时丢弃后备引擎，需要时再重新创建
+        self._fallback_engine = None
+        if priors:
+            self._fallback.prior_probabilities = dict(priors)
+    
+    def _outside_suspicions(self) -> Dict[str, float]:
+        return self._fallback_engine.get_all_suspicions() if self._fallback_engine is not None else {}
+    
+    def _outside_pairs(self) -> Tuple[List[str], np.ndarray]:
+        if self._fallback_engine is None:
+            return [], np.zeros((0, 0), dtype=np.float64)
+        return self._fallback_engine.pair_marginals()
+    
+    def _outside_state(self) -> Optional[Dict]:
+        if self._fallback_engine is None:
+            return None
+        state = self._fallback_engine.to_state()
+        state.pop("evidence", None)
+        return state
+    
+    def _load_outside(self, state: Optional[Dict]):
+        self._fallback_engine = None
+        if state:
+            self._fallback.load_state(state)
+    
+    def update_suspicion_batch(self, evidence: List[Dict[str, Any]]) -> Dict[str, float]:
+        self.add_evidence_batch(evidence)
+        return {item["player_id"]: self.get_suspicion(item["player_id"]) for item in evidence}
+    
+    def add_evidence_batch(self, evidence: List[Dict[str, Any]]):
+        roster = [item for item in evidence if item["player_id"] in self._index]
+        outside = [item for item in evidence if item["player_id"] not in self._index]
+        if outside:
+            self._fallback.add_evidence_batch(outside)
+        if roster:
+            self._add_roster(roster)
+            for item in roster:
+                self._record_evidence(item)
+    
+    def _add_roster(self, evidence: List[Dict[str, Any]]):
+        raise NotImplementedError
+    
+    def _roster_role_possible(self, slot: int, is_wolf: bool) -> bool:
+        raise NotImplementedError
+    
+    def _set_roster_role(self, slot: int, is_wolf: bool):
+        raise NotImplementedError
+    
+    def _roster_suspicion(self, slot: int) -> float:
+        raise NotImplementedError
+    
+    def role_possible(self, player_id: str, is_wolf: bool) -> bool:
+        slot = self._index.get(player_id)
+        if slot is None:
+            return self._fallback.role_possible(player_id, is_wolf)
+        return self._roster_role_possible(slot, is_wolf)
+    
+    def _set_role(self, player_id: str, is_wolf: bool):
+        slot = self._index.get(player_id)
+        if slot is None:
+            self._fallback._set_role(player_id, is_wolf)
+        else:
+            self._set_roster_role(slot, is_wolf)
+    
+    def get_suspicion(self, player_id: str) -> float:
+        slot = self._index.get(player_id)
+        if slot is None:
+            return self._fallback.get_suspicion(player_id)
+        return self._roster_suspicion(slot)
+    
+    def get_all_suspicions(self) -> Dict[str, float]:
+        return self.prior_probabilities
+    
+    async def refresh(self):
+        if self._fallback_engine is not None:
+            await self._fallback_engine.refresh()
@@ -0,0 +1,254 @@
+"""
+后验校准
+
+引擎输出的狼人后验不保证"0.7 就是七成是狼"，而 calculate_action_utility 的阈值（0.3 / 0.7）
+按概率含义设定。校准分两步：
+
+- 离线：从已结束对局中取身份事实写入前的后验（SuspicionEvidence.suspicion_before）与真实身份，
+  拟合 isotonic（保序回归，PAV 算法）或 platt（对 logit(p) 做逻辑回归）映射；
+  每次拟合是一个 model_type 为 calibration 的 ModelVersion，映射表写入 model_path 指向的 JSON 文件
+- 在线：映射统一存为单调的分段线性节点 (x, y)，对几十个节点二分查找后线性插值，每次 O(log n)
+
+在线使用的版本由 inference.calibration.version 指定（latest 表示最近一次拟合，null 表示不校准），
+也可以用 load_model 切换。
+"""
+
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("calibration")
+
+CALIBRATION_MODEL_TYPE = "calibration"
+CALIBRATION_METHODS = ("isotonic", "platt")
+
+# platt 映射制表用的 logit 网格（p 约在 6e-6 到 1 - 6e-6 之间），两端之外取端点值
+_PLATT_GRID = np.linspace(-12.0, 12.0, 97)
+_EPSILON = 1e-6
+
+
+class Calibration:
+    """单调分段线性映射：原始后验 -> 校准后的概率"""
+
+    def __init__(
+        self,
+        version: str,
+        method: str,
+        knots_x: Iterable[float],
+        knots_y: Iterable[float],
+        params: Optional[Dict[str, float]] = None,
+        samples: int = 0,
+        fitted_at: Optional[str] = None
+    ):
+        self.version = version
+        self.method = method
+        self._x: List[float] = [float(x) for x in knots_x]
+        self._y: List[float] = [float(y) for y in knots_y]
+        if not self._x or len(self._x) != len(self._y):
+            raise ValueError("Calibration needs the same non-zero number of x and y knots")
+        self.params = params or {}
+        self.samples = samples
+        self.fitted_at = fitted_at
+
+    def __len__(self) -> int:
+        return len(self._x)
+
+    def apply(self, p: float) -> float:
+        i = bisect_right(self._x, p)
+        if i == 0:
+            return self._y[0]
+        if i == len(self._x):
+            return self._y[-1]
+        x0, x1 = self._x[i - 1], self._x[i]
+        y0, y1 = self._y[i - 1], self._y[i]
+        return y0 + (y1 - y0) * (p - x0) / (x1 - x0)
+
+    def apply_many(self, p) -> np.ndarray:
+        return np.interp(np.asarray(p, dtype=np.float64), self._x, self._y)
+
+    def info(self) -> Dict[str, Any]:
+        return {"version": self.version, "method": self.method}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "method": self.method,
+            "knots": [[round(x, 6), round(y, 6)] for x, y in zip(self._x, self._y)],
+            "params": self.params,
+            "samples": self.samples,
+            "fitted_at": self.fitted_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Calibration":
+        knots = data["knots"]
+        return cls(
+            data["version"],
+            data["method"],
+            [x for x, _ in knots],
+            [y for _, y in knots],
+            params=data.get("params"),
+            samples=data.get("samples", 0),
+            fitted_at=data.get("fitted_at")
+        )
+
+    def save(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# ========== 离线拟合 ==========
+def fit_isotonic(p: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """保序回归（PAV），返回各块的平均后验与平均标签作为节点"""
+    # 相同的后验先合并为一块
+    x, inverse, weights = np.unique(p, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=y)
+    blocks: List[List[float]] = []  # [x 加权和, y 加权和, 权重]
+    for xi, si, wi in zip(x, sums, weights):
+        blocks.append([xi * wi, si, float(wi)])
+        while len(blocks) > 1 and blocks[-2][1] / blocks[-2][2] >= blocks[-1][1] / blocks[-1][2]:
+            last = blocks.pop()
+            for k in range(3):
+                blocks[-1][k] += last[k]
+    knots_x = np.array([block[0] / block[2] for block in blocks])
+    knots_y = np.array([block[1] / block[2] for block in blocks])
+    return knots_x, knots_y
+
+
+def fit_platt(p: np.ndarray, y: np.ndarray, iterations: int = 50) -> Tuple[float, float]:
+    """在 z = logit(p) 上拟合 sigmoid(a * z + b)，标签按 Platt 的方法平滑，牛顿法求解"""
+    z = np.log(np.clip(p, _EPSILON, 1 - _EPSILON)) - np.log1p(-np.clip(p, _EPSILON, 1 - _EPSILON))
+    positives = float(y.sum())
+    negatives = float(len(y) - positives)
+    target = np.where(y > 0.5, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        q = 1.0 / (1.0 + np.exp(-(a * z + b)))
+        w = q * (1 - q) + 1e-12
+        gradient = np.array([np.dot(q - target, z), np.sum(q - target)])
+        hessian = np.array([[np.dot(w * z, z), np.dot(w, z)], [np.dot(w, z), np.sum(w)]]) + 1e-9 * np.eye(2)
+        step = np.linalg.solve(hessian, gradient)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-9:
+            break
+    return float(a), float(b)
+
+
+def fit_calibration(
+    samples: Iterable[Tuple[float, bool]],
+    method: Optional[str] = None,
+    version: Optional[str] = None,
+    min_samples: Optional[int] = None
+) -> Calibration:
+    """由 (原始后验, 是否为狼) 样本拟合校准映射"""
+    config = get_config("inference.calibration", {}) or {}
+    method = method or config.get("method", "isotonic")
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"Unknown calibration method: {method}")
+    min_samples = int(min_samples if min_samples is not None else config.get("min_samples", 50))
+
+    pairs = np.array([(float(p), 1.0 if is_wolf else 0.0) for p, is_wolf in samples], dtype=np.float64).reshape(-1, 2)
+    if len(pairs) < min_samples:
+        raise ValueError(f"Calibration needs at least {min_samples} samples, got {len(pairs)}")
+    p, y = pairs[:, 0], pairs[:, 1]
+
+    params: Dict[str, float] = {}
+    if method == "isotonic":
+        knots_x, knots_y = fit_isotonic(p, y)
+    else:
+        a, b = fit_platt(p, y)
+        params = {"a": a, "b": b}
+        knots_x = 1.0 / (1.0 + np.exp(-_PLATT_GRID))
+        knots_y = 1.0 / (1.0 + np.exp(-(a * _PLATT_GRID + b)))
+
+    version = version or f"calib_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    logger.info(f"Fitted {method} calibration {version} on {len(p)} samples ({len(knots_x)} knots)")
+    return Calibration(version, method, knots_x, knots_y, params, len(p), datetime.now().isoformat())
+
+
+def calibration_metrics(samples: Iterable[Tuple[float, bool]], calibration: Calibration, bins: int = 10) -> Dict[str, Any]:
+    """校准前后的 Brier 分数与期望校准误差（ECE，按 bins 个等宽区间）"""
+    pairs = np.array([(float(p), 1.0 if is_wolf else 0.0) for p, is_wolf in samples], dtype=np.float64).reshape(-1, 2)
+    p, y = pairs[:, 0], pairs[:, 1]
+    calibrated = calibration.apply_many(p)
+
+    def ece(probabilities: np.ndarray) -> float:
+        slots = np.minimum((probabilities * bins).astype(np.intp), bins - 1)
+        counts = np.bincount(slots, minlength=bins)
+        gaps = np.abs(np.bincount(slots, weights=probabilities - y, minlength=bins))
+        return float(gaps.sum() / max(1, counts.sum()))
+
+    return {
+        "samples": int(len(p)),
+        "wolf_rate": round(float(y.mean()), 4) if len(p) else 0.0,
+        "brier_raw": round(float(np.mean((p - y) ** 2)), 4) if len(p) else 0.0,
+        "brier": round(float(np.mean((calibrated - y) ** 2)), 4) if len(p) else 0.0,
+        "ece_raw": round(ece(p), 4),
+        "ece": round(ece(calibrated), 4)
+    }
+
+
+def finished_game_samples(db) -> List[Tuple[float, bool]]:
+    return [(row["suspicion_before"], bool(row["is_wolf"])) for row in db.iter_calibration_samples()]
+
+
+# ========== 在线使用的版本 ==========
+_active: Optional[Calibration] = None
+_loaded = False
+
+
+def load_calibration(db, version: Optional[str]) -> Optional[Calibration]:
+    """按 model_version_id 读取校准映射；latest 表示最近一次拟合"""
+    if not version:
+        return None
+    if version == "latest":
+        model_version = db.get_latest_model_version(CALIBRATION_MODEL_TYPE)
+    else:
+        model_version = db.get_model_version(version)
+    if not model_version:
+        if version != "latest":
+            logger.warning(f"Calibration version {version} not found; suspicion is reported uncalibrated")
+        return None
+    if model_version["model_type"] != CALIBRATION_MODEL_TYPE:
+        raise ValueError(f"Model version {version} is not a calibration ({model_version['model_type']})")
+    return Calibration.load(model_version["model_path"])
+
+
+def get_calibration(db) -> Optional[Calibration]:
+    """首次调用时按 inference.calibration.version 加载，之后返回进程内缓存"""
+    global _active, _loaded
+    if not _loaded:
+        try:
+            _active = load_calibration(db, get_config("inference.calibration.version", "latest"))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load calibration: {e}")
+            _active = None
+        _loaded = True
+    return _active
+
+
+async def get_calibration_async(adb) -> Optional[Calibration]:
+    """异步工具使用：已加载时直接返回缓存，首次加载（读库和映射文件）放到读线程池"""
+    if _loaded:
+        return _active
+    return await adb.run_read(get_calibration, adb.db)
+
+
+def set_calibration(calibration: Optional[Calibration]):
+    global _active, _loaded
+    _active = calibration
+    _loaded = True
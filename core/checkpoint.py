@@ -0,0 +1,133 @@
+"""
+引擎状态检查点与热重启
+
+GameHistory（知识图谱关系）和 SuspicionEvidence（贝叶斯证据）构成每局的事件日志。
+检查点保存某一时刻的引擎状态（zlib 压缩的 JSON）以及当时已应用的最后事件ID；
+恢复时加载检查点，再从这两个ID之后增量重放事件，不需要从头回放整局。
+
+- 每局应用 session.checkpoint.every_events 个事件后自动保存一次
+- 会话被淘汰时在写线程中保存，之后再次访问由注册表的加载器恢复（get_async 在读线程池中执行）
+- 服务启动时恢复所有进行中的对局
+"""
+
+import json
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+from core.session import GameSession, SessionRegistry
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("checkpoint")
+
+_CHECKPOINT_FORMAT = 1
+_REPLAY_CHUNK = 500
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    payload = {"format": _CHECKPOINT_FORMAT, "state": state}
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_state(blob: bytes) -> Dict[str, Any]:
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    if payload.get("format") != _CHECKPOINT_FORMAT:
+        raise ValueError(f"Unsupported checkpoint format: {payload.get('format')}")
+    return payload["state"]
+
+
+class CheckpointManager:
+    """按对局保存引擎检查点，并在会话缺失时从检查点 + 事件日志恢复"""
+
+    def __init__(self, registry: SessionRegistry, every_events: Optional[int] = None):
+        self.registry = registry
+        self.db = registry.db
+        self.every_events = every_events if every_events is not None else int(
+            get_config("session.checkpoint.every_events", 200)
+        )
+
+    def attach(self) -> "CheckpointManager":
+        """接入注册表：未命中时恢复会话，淘汰时保存检查点"""
+        self.registry.checkpoints = self
+        self.registry.set_loader(self.restore)
+        self.registry.add_evict_listener(self._on_evict)
+        return self
+
+    # ========== 保存 ==========
+    def _snapshot(self, session: GameSession) -> tuple:
+        """同步截取状态与水位，保证两者对应同一时刻"""
+        blob = encode_state(session.to_state())
+        session.pending_events = 0
+        return session.game_id, blob, session.history_id, session.evidence_id
+
+    async def save(self, session: GameSession):
+        await self.db.save_engine_checkpoint(*self._snapshot(session))
+        logger.debug(f"Saved checkpoint for game {session.game_id} at history {session.history_id}")
+
+    async def save_fresh(self, session: GameSession):
+        """为新建或重置的会话保存检查点：之前的事件不再属于当前状态"""
+        history_id = await self.db.get_latest_history_id(session.game_id)
+        evidence_id = await self.db.get_latest_evidence_id(session.game_id)
+        session.history_id = session.replayed_history_id = history_id
+        session.evidence_id = session.replayed_evidence_id = session.reset_evidence_id = evidence_id
+        await self.save(session)
+
+    async def maybe_checkpoint(self, session: GameSession):
+        if self.every_events > 0 and session.pending_events >= self.every_events:
+            await self.save(session)
+
+    def _on_evict(self, session: GameSession):
+        # 序列化与压缩也放到写线程，淘汰回调本身不做耗时工作
+        if session.pending_events:
+            self.db.submit_write(self._save_evicted, session)
+
+    def _save_evicted(self, session: GameSession):
+        try:
+            self.db.db.save_engine_checkpoint(*self._snapshot(session))
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint for evicted game {session.game_id}: {e}")
+
+    # ========== 恢复 ==========
+    def restore(self, game_id: str) -> GameSession:
+        """加载检查点并增量重放之后的事件（同步执行；注册表的 get_async 把它放到读线程池）"""
+        db = self.db.db
+        session = GameSession(game_id)
+        checkpoint = db.get_engine_checkpoint(game_id)
+        if checkpoint:
+            session.load_state(decode_state(checkpoint["state"]))
+            session.history_id = session.replayed_history_id = checkpoint["history_id"]
+            session.evidence_id = session.replayed_evidence_id = checkpoint["evidence_id"]
+
+        replayed = 0
+        chunk: List[Dict[str, Any]] = []
+        for event in db.iter_game_history(game_id=game_id, after_id=session.history_id, chunk_size=_REPLAY_CHUNK):
+            chunk.append(event)
+            if len(chunk) >= _REPLAY_CHUNK:
+                replayed += session.apply_history_events(chunk)
+                chunk = []
+        replayed += session.apply_history_events(chunk)
+        chunk = []
+        for evidence in db.iter_suspicion_evidence(game_id, after_id=session.evidence_id, chunk_size=_REPLAY_CHUNK):
+            chunk.append(evidence)
+            if len(chunk) >= _REPLAY_CHUNK:
+                replayed += session.apply_evidence_batch(chunk)
+                chunk = []
+        replayed += session.apply_evidence_batch(chunk)
+
+        session.replayed_history_id = session.history_id
+        session.replayed_evidence_id = session.evidence_id
+        if checkpoint or replayed:
+            logger.debug(
+                f"Restored game {game_id} (checkpoint={'yes' if checkpoint else 'no'}, replayed {replayed} events)"
+            )
+        return session
+
+    def warm_restart(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """启动时恢复进行中的对局，最近更新的对局最后载入（位于 LRU 最新端）"""
+        start = time.perf_counter()
+        game_ids = self.db.db.get_active_game_ids(limit or self.registry.max_sessions)
+        for game_id in reversed(game_ids):
+            self.registry.get(game_id)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warm restart restored {len(game_ids)} games in {elapsed:.2f}s")
+        return {"games": len(game_ids), "seconds": round(elapsed, 3)}
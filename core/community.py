@@ -0,0 +1,167 @@
+"""
+带符号关系图上的增量社区划分（狼队聚类）
+
+support 记正权重、attack 记负权重（映射由 knowledge_graph.community.relation_signs 配置，其他关系类型不参与），
+双向合并为无向带符号图。划分的目标是常数 Potts 模型（CPM）：
+
+    Q = Σ_C ( 社区 C 内部的带符号权重和 - resolution × C 内的玩家对数 )
+
+玩家 i 留在（或加入）社区 C 的收益为 W(i, C) - resolution × |C \\ {i}|，单独成团的收益为 0。
+每添加一条关系，只从两个端点出发做 Louvain 式的局部移动：把玩家移到收益最大的相邻社区，
+发生移动时再检查其邻居。每次移动都使 Q 严格增加，不会来回振荡；单次更新的移动次数受
+max_moves_per_node 限制，开销与对局规模无关，不需要从头重新划分。
+
+candidate_teams 把每个社区修整为 total_wolves 人的候选狼队（超出时去掉内部联系最弱的玩家，
+不足时补入与队伍正权重最大的邻居），满员的队伍在前，再按凝聚度（队内每对玩家的平均带符号权重）排序。
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+from modules.YA_Common.utils.config import get_config
+
+_DEFAULT_RELATION_SIGNS = {"support": 1.0, "attack": -1.0}
+_EPSILON = 1e-12
+
+
+class SignedCommunities:
+    """增量维护的带符号图社区划分"""
+
+    def __init__(
+        self,
+        relation_signs: Optional[Dict[str, float]] = None,
+        resolution: Optional[float] = None,
+        max_moves_per_node: Optional[int] = None
+    ):
+        config = get_config("knowledge_graph.community", {}) or {}
+        self.relation_signs: Dict[str, float] = dict(
+            relation_signs or config.get("relation_signs") or _DEFAULT_RELATION_SIGNS
+        )
+        self.resolution = float(resolution if resolution is not None else config.get("resolution", 0.5))
+        self.max_moves_per_node = int(
+            max_moves_per_node if max_moves_per_node is not None else config.get("max_moves_per_node", 32)
+        )
+        # 玩家 -> 邻居 -> 累计带符号权重（对称）
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.labels: Dict[str, int] = {}
+        self.members: Dict[int, Set[str]] = {}
+        self._next_label = 0
+
+    def add_relation(self, source: str, target: str, relation_type: str, weight: float) -> bool:
+        """累加一条关系的带符号权重，返回是否影响划分（需要随后对端点调用 refine）"""
+        sign = self.relation_signs.get(relation_type, 0.0)
+        if not sign or source == target:
+            return False
+        signed = sign * weight
+        for a, b in ((source, target), (target, source)):
+            if a not in self.labels:
+                self._assign(a, None)
+            neighbors = self.weights.setdefault(a, {})
+            neighbors[b] = neighbors.get(b, 0.0) + signed
+        return True
+
+    def refine(self, seeds: Iterable[str]) -> int:
+        """从 seeds 出发做局部移动直到稳定或用完预算，返回移动次数"""
+        queue = deque(player_id for player_id in dict.fromkeys(seeds) if player_id in self.labels)
+        queued = set(queue)
+        budget = self.max_moves_per_node * len(queue)
+        moves = 0
+        while queue and moves < budget:
+            player_id = queue.popleft()
+            queued.discard(player_id)
+            label = self._best_label(player_id)
+            if label == self.labels[player_id]:
+                continue
+            self._assign(player_id, label)
+            moves += 1
+            for neighbor in self.weights[player_id]:
+                if neighbor not in queued:
+                    queue.append(neighbor)
+                    queued.add(neighbor)
+        return moves
+
+    def _best_label(self, player_id: str) -> Optional[int]:
+        current = self.labels[player_id]
+        by_label: Dict[int, float] = {current: 0.0}
+        for neighbor, weight in self.weights[player_id].items():
+            label = self.labels[neighbor]
+            by_label[label] = by_label.get(label, 0.0) + weight
+
+        def gain(label: int) -> float:
+            others = len(self.members[label]) - (1 if label == current else 0)
+            return by_label[label] - self.resolution * others
+
+        best, best_gain = current, gain(current)
+        for label in by_label:
+            if gain(label) > best_gain + _EPSILON:
+                best, best_gain = label, gain(label)
+        # 所有社区收益都为负时单独成团（已是单人社区则不动）
+        if best_gain < -_EPSILON and len(self.members[current]) > 1:
+            return None
+        return best
+
+    def _assign(self, player_id: str, label: Optional[int]):
+        previous = self.labels.get(player_id)
+        if previous is not None:
+            self.members[previous].discard(player_id)
+            if not self.members[previous]:
+                del self.members[previous]
+        if label is None:
+            label = self._next_label
+            self._next_label += 1
+        self.labels[player_id] = label
+        self.members.setdefault(label, set()).add(player_id)
+
+    def communities(self) -> List[Set[str]]:
+        return [set(players) for players in self.members.values() if len(players) > 1]
+
+    def _weight(self, a: str, b: str) -> float:
+        return self.weights.get(a, {}).get(b, 0.0)
+
+    def cohesion(self, team: Iterable[str]) -> float:
+        """队内每对玩家的平均带符号权重"""
+        team = list(team)
+        pairs = len(team) * (len(team) - 1) / 2
+        if not pairs:
+            return 0.0
+        total = sum(self._weight(a, b) for i, a in enumerate(team) for b in team[i + 1:])
+        return total / pairs
+
+    def _fit_team(self, community: Set[str], team_size: int) -> Set[str]:
+        team = set(community)
+        while len(team) > team_size:
+            team.remove(min(team, key=lambda p: (sum(self._weight(p, q) for q in team), p)))
+        while len(team) < team_size:
+            scores: Dict[str, float] = {}
+            for player_id in team:
+                for neighbor, weight in self.weights[player_id].items():
+                    if neighbor not in team:
+                        scores[neighbor] = scores.get(neighbor, 0.0) + weight
+            candidates = [(-score, p) for p, score in scores.items() if score > _EPSILON]
+            if not candidates:
+                break
+            team.add(min(candidates)[1])
+        return team
+
+    def candidate_teams(self, team_size: int, top_k: Optional[int] = None) -> List[Dict]:
+        """每个社区修整为 team_size 人的候选队伍，满员队伍在前，各自按凝聚度从高到低排序"""
+        teams = {}
+        for community in self.communities():
+            team = frozenset(self._fit_team(community, team_size))
+            if len(team) > 1 and team not in teams:
+                teams[team] = {
+                    "players": sorted(team),
+                    "cohesion": self.cohesion(sorted(team)),
+                    "community_size": len(community)
+                }
+        # 凑满 team_size 人的队伍排在前面
+        ranked = sorted(
+            teams.values(),
+            key=lambda team: (len(team["players"]) < team_size, -team["cohesion"], team["players"])
+        )
+        return ranked[:top_k] if top_k is not None else ranked
+
+    def clear(self):
+        self.weights.clear()
+        self.labels.clear()
+        self.members.clear()
+        self._next_label = 0
@@ -0,0 +1,183 @@
+"""
+矛盾检测索引
+
+每条发言在写入时分词一次，提取两类特征：
+- 关键词特征 kw:<词>：命中 inference.contradiction.keyword_pairs 中的词或短语（按完整词匹配，
+  短语取最长匹配，"is" 不会匹配 "this"），互为一对的两个词视为矛盾
+- 极性特征 +<词> / -<词>：否定词（negators）之后的 negation_window 个实词记为否定
+  （遇到标点或转折词 but/但 等提前结束），同一个词在两条发言中极性相反视为矛盾（"I am the seer" 与 "I am not the seer"）
+
+每个玩家维护 特征 -> 发言ID 的倒排索引。检查新发言时只需把它的"对立特征"集合与索引求交，
+开销与该玩家的历史长度无关。
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from modules.YA_Common.utils.config import get_config
+
+_DEFAULT_KEYWORD_PAIRS = [
+    ["not", "is"],
+    ["never", "always"],
+    ["did", "didn't"],
+    ["was", "wasn't"],
+    ["saw", "didn't see"],
+]
+_DEFAULT_NEGATORS = ["not", "no", "never", "didn't", "don't", "doesn't", "isn't", "wasn't", "won't", "不", "没", "非"]
+_DEFAULT_STOPWORDS = [
+    "i", "me", "my", "you", "he", "she", "it", "we", "they", "the", "a", "an", "to", "of", "and", "or",
+    "am", "are", "be", "in", "on", "at", "for", "that", "this", "with", "as", "by", "so", "but",
+    "我", "你", "他", "她", "的", "了", "是", "在", "也", "都", "就",
+]
+
+_CLAUSE_BREAKS = frozenset(",.;:!?，。；：！？") | frozenset(["but", "however", "although", "但", "却"])
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[一-鿿]|[,.;:!?，。；：！？]")
+
+# 每个玩家的矛盾比例乘以该系数作为分数，与旧实现一致
+_SCORE_PER_CONTRADICTION = 0.3
+_MAX_SCORE = 0.9
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+class ContradictionLexicon:
+    """从配置构建的特征提取器；同一文本的特征带 LRU 缓存"""
+
+    def __init__(
+        self,
+        keyword_pairs: Optional[List[List[str]]] = None,
+        negators: Optional[List[str]] = None,
+        negation_window: Optional[int] = None,
+        stopwords: Optional[List[str]] = None,
+        polarity: Optional[bool] = None
+    ):
+        config = get_config("inference.contradiction", {}) or {}
+        pairs = keyword_pairs if keyword_pairs is not None else config.get("keyword_pairs", _DEFAULT_KEYWORD_PAIRS)
+        self.negators = frozenset(negators if negators is not None else config.get("negators", _DEFAULT_NEGATORS))
+        self.negation_window = negation_window if negation_window is not None else int(config.get("negation_window", 4))
+        self.stopwords = frozenset(stopwords if stopwords is not None else config.get("stopwords", _DEFAULT_STOPWORDS))
+        self.polarity = polarity if polarity is not None else bool(config.get("polarity", True))
+
+        # 关键词/短语按分词结果保存，匹配时取最长者
+        self._phrases: Dict[Tuple[str, ...], str] = {}
+        self._opposites: Dict[str, Set[str]] = {}
+        for left, right in pairs:
+            for term in (left, right):
+                self._phrases[tuple(tokenize(term))] = term
+            self._opposites.setdefault(f"kw:{left}", set()).add(f"kw:{right}")
+            self._opposites.setdefault(f"kw:{right}", set()).add(f"kw:{left}")
+        self._max_phrase = max((len(phrase) for phrase in self._phrases), default=1)
+        self.features = lru_cache(maxsize=4096)(self._extract)
+
+    def _extract(self, text: str) -> FrozenSet[str]:
+        tokens = tokenize(text)
+        features = set()
+        negated_left = 0
+        i = 0
+        while i < len(tokens):
+            length = 0
+            for size in range(min(self._max_phrase, len(tokens) - i), 0, -1):
+                term = self._phrases.get(tuple(tokens[i:i + size]))
+                if term is not None:
+                    features.add(f"kw:{term}")
+                    length = size
+                    break
+            span = tokens[i:i + max(length, 1)]
+            if not length and span[0] in _CLAUSE_BREAKS:
+                negated_left = 0
+            elif any(token in self.negators for token in span):
+                negated_left = self.negation_window
+            elif not length and self.polarity and span[0] not in self.stopwords:
+                features.add(("-" if negated_left > 0 else "+") + span[0])
+                negated_left = max(0, negated_left - 1)
+            i += len(span)
+        return frozenset(features)
+
+    def opposites(self, features: Iterable[str]) -> Set[str]:
+        """与给定特征矛盾的特征集合"""
+        result = set()
+        for feature in features:
+            if feature.startswith("kw:"):
+                result |= self._opposites.get(feature, set())
+            else:
+                result.add(("-" if feature[0] == "+" else "+") + feature[1:])
+        return result
+
+    def contradicts(self, text: str, other: str) -> bool:
+        return bool(self.opposites(self.features(text)) & self.features(other))
+
+
+_default_lexicon: Optional[ContradictionLexicon] = None
+
+
+def default_lexicon() -> ContradictionLexicon:
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = ContradictionLexicon()
+    return _default_lexicon
+
+
+def contradiction_score(contradictions: int, statements: int) -> float:
+    if not statements or not contradictions:
+        return 0.0
+    return min(_MAX_SCORE, _SCORE_PER_CONTRADICTION * contradictions / statements)
+
+
+class ContradictionIndex:
+    """按玩家增量维护的发言特征倒排索引"""
+
+    def __init__(self, lexicon: Optional[ContradictionLexicon] = None):
+        self.lexicon = lexicon or default_lexicon()
+        self._statements: Dict[str, Dict[int, FrozenSet[str]]] = {}
+        self._postings: Dict[str, Dict[str, Set[int]]] = {}
+
+    def add(self, player_id: str, statement_id: int, text: str) -> FrozenSet[str]:
+        features = self.lexicon.features(text)
+        self._add_features(player_id, statement_id, features)
+        return features
+
+    def _add_features(self, player_id: str, statement_id: int, features: Iterable[str]):
+        features = frozenset(features)
+        self._statements.setdefault(player_id, {})[statement_id] = features
+        postings = self._postings.setdefault(player_id, {})
+        for feature in features:
+            postings.setdefault(feature, set()).add(statement_id)
+
+    def statement_count(self, player_id: str) -> int:
+        return len(self._statements.get(player_id, {}))
+
+    @property
+    def entries(self) -> int:
+        return sum(len(features) for statements in self._statements.values() for features in statements.values())
+
+    def find(self, player_id: str, text: str, exclude_id: Optional[int] = None) -> Dict[int, Set[str]]:
+        """该玩家与 text 矛盾的历史发言：发言ID -> 触发矛盾的特征"""
+        postings = self._postings.get(player_id)
+        if not postings:
+            return {}
+        hits: Dict[int, Set[str]] = {}
+        for feature in self.lexicon.opposites(self.lexicon.features(text)) & postings.keys():
+            for statement_id in postings[feature]:
+                if statement_id != exclude_id:
+                    hits.setdefault(statement_id, set()).add(feature)
+        return hits
+
+    def score(self, player_id: str, text: str, exclude_id: Optional[int] = None) -> float:
+        statements = self.statement_count(player_id) - (1 if exclude_id in self._statements.get(player_id, {}) else 0)
+        return contradiction_score(len(self.find(player_id, text, exclude_id)), statements)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            player_id: [[statement_id, sorted(features)] for statement_id, features in statements.items()]
+            for player_id, statements in self._statements.items()
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self._statements = {}
+        self._postings = {}
+        for player_id, statements in state.items():
+            for statement_id, features in statements:
+                self._add_features(player_id, statement_id, features)
@@ -1,99 +1,475 @@
 import sqlite3
 import os
-from typing import List, Dict, Optional, Any
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Iterator
 from datetime import datetime
 from modules.YA_Common.utils.logger import get_logger
+from modules.YA_Common.utils.config import get_config
+from core import feature_codec
+from core.sharding import ShardRouter, STORAGE_PER_GAME, STORAGE_SINGLE
+import numpy as np
 import json
 
 logger = get_logger("database")
 
 
+class _ReaderPool:
+    """只读连接池：WAL 模式下读连接互不阻塞，也不会排在写事务后面"""
+
+    def __init__(self, db_path: str, size: int, busy_timeout_ms: int):
+        self._uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        self._size = max(1, size)
+        self._busy_timeout_ms = busy_timeout_ms
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {self._busy_timeout_ms}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def checkout(self) -> Iterator[sqlite3.Connection]:
+        # 同一线程内嵌套调用复用已借出的连接
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._all) < self._size:
+                    conn = self._connect()
+                    self._all.append(conn)
+        if conn is None:
+            conn = self._idle.get()
+
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
 class GameDatabase:
-    def __init__(self, db_path: str = "data/game.db"):
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+    SCHEMA_VERSION = 7
+
+    _INSERT_EVENT_SQL = """
+        INSERT INTO GameHistory (round_num, speaker, content, action_type, timestamp, game_id,
+                                 target_player, relation_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # 归档时带上事件ID，检查点水位与客户端的 before_id 游标在归档后仍指向同一条记录
+    _ARCHIVE_EVENT_SQL = """
+        INSERT INTO GameHistory (id, round_num, speaker, content, action_type, timestamp, game_id,
+                                 target_player, relation_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    _ARCHIVE_EVIDENCE_SQL = """
+        INSERT INTO SuspicionEvidence (id, game_id, player_id, evidence_score, evidence_type, description,
+                                       suspicion_before, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # 插入时给出默认值，冲突时 COALESCE 保留未传入（None）的字段
+    _UPSERT_PROFILE_SQL = """
+        INSERT INTO PlayerProfile (player_id, role_assumed, suspicion_score, personality, game_id, updated_at)
+        VALUES (:player_id, :role_assumed, COALESCE(:suspicion_score, 0.0), :personality, :game_id, :updated_at)
+        ON CONFLICT(player_id) DO UPDATE SET
+            role_assumed = COALESCE(excluded.role_assumed, PlayerProfile.role_assumed),
+            suspicion_score = COALESCE(:suspicion_score, PlayerProfile.suspicion_score),
+            personality = COALESCE(excluded.personality, PlayerProfile.personality),
+            game_id = COALESCE(excluded.game_id, PlayerProfile.game_id),
+            updated_at = excluded.updated_at
+    """
+
+    _UPSERT_GAME_STATE_SQL = """
+        INSERT INTO GameState (game_id, current_round, alive_players, game_status, updated_at)
+        VALUES (:game_id, COALESCE(:current_round, 1), COALESCE(:alive_players, ''), :game_status, :updated_at)
+        ON CONFLICT(game_id) DO UPDATE SET
+            current_round = COALESCE(:current_round, GameState.current_round),
+            alive_players = COALESCE(:alive_players, GameState.alive_players),
+            game_status = COALESCE(excluded.game_status, GameState.game_status),
+            updated_at = excluded.updated_at
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        pooled: Optional[bool] = None,
+        reader_pool_size: Optional[int] = None,
+        group_commit_window_ms: Optional[float] = None,
+        storage_mode: Optional[str] = None
+    ):
+        self.db_path = db_path or get_config("database.path", "data/game.db")
+        in_memory = self.db_path == ":memory:"
+        if not in_memory and os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        if pooled is None:
+            pooled = bool(get_config("database.pool.enabled", False))
+        if reader_pool_size is None:
+            reader_pool_size = int(get_config("database.pool.readers", 4))
+        if group_commit_window_ms is None:
+            group_commit_window_ms = float(get_config("database.group_commit.window_ms", 0))
+        busy_timeout_ms = int(get_config("database.pool.busy_timeout_ms", 5000))
+        # 内存库无法被多个连接共享，只能退回单连接模式
+        self.pooled = pooled and not in_memory
+
+        # 唯一的写连接，所有写操作通过 _write_lock 串行化
+        self._write_lock = threading.RLock()
+        # 组提交：窗口内到达的单条写入共享一次 commit（0 表示关闭）
+        self._group_commit_window = group_commit_window_ms / 1000
+        self._commit_cond = threading.Condition()
+        self._commit_leader = False
+        self._write_seq = 0
+        self._committed_seq = 0
+        self._failed_commits: List[tuple] = []
+        # FeatureSchema 缓存：特征名元组 <-> schema_id
+        self._schema_ids: Dict[tuple, int] = {}
+        self._schema_names: Dict[int, tuple] = {}
+        self._fts_available: Optional[bool] = None
+        self._feature_encoding = feature_codec.resolve_encoding(
+            get_config("training.data.feature_encoding", "json")
+        )
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        self.conn.execute(f"PRAGMA busy_timeout = {busy_timeout_ms}")
+        # 允许后台任务分步回收空闲页；只对新建的库生效，已有的库需离线 VACUUM 一次才能切换
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if self.pooled:
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute(
+                f"PRAGMA synchronous = {get_config('database.synchronous', 'NORMAL')}"
+            )
         self._init_tables()
 
+        self._readers = (
+            _ReaderPool(self.db_path, reader_pool_size, busy_timeout_ms)
+            if self.pooled else None
+        )
+
+        # GameHistory 路由：single 写主库，per_game 按对局写分片；归档对局从归档文件读取
+        if storage_mode is None:
+            storage_mode = get_config("database.storage.mode", STORAGE_SINGLE)
+        if in_memory and storage_mode == STORAGE_PER_GAME:
+            raise ValueError("per_game storage requires a file database")
+        shard_readers = int(get_config("database.storage.shard_readers", 2))
+        # 分片/归档目录相对于主库所在目录
+        base_dir = os.path.dirname(os.path.abspath(self.db_path)) if not in_memory else os.getcwd()
+        self.router = ShardRouter(
+            owner=self,
+            mode=storage_mode,
+            shard_dir=os.path.join(base_dir, get_config("database.storage.shard_dir", "shards")),
+            archive_dir=os.path.join(base_dir, get_config("database.storage.archive_dir", "archive")),
+            max_open=int(get_config("database.storage.max_open_shards", 64)),
+            factory=lambda path: GameDatabase(
+                path,
+                pooled=self.pooled,
+                reader_pool_size=shard_readers,
+                group_commit_window_ms=group_commit_window_ms,
+                storage_mode=STORAGE_SINGLE
+            )
+        )
+        logger.info(
+            f"Database opened: {self.db_path} "
+            f"(pooled={self.pooled}, readers={reader_pool_size if self.pooled else 0}, storage={storage_mode})"
+        )
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """借出一个读连接；未启用连接池时与写操作共用同一连接"""
+        if self._readers is None:
+            with self._write_lock:
+                yield self.conn
+            return
+        with self._readers.checkout() as conn:
+            yield conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """串行化的写事务，成功提交、异常回滚"""
+        with self._write_lock:
+            # 先落盘组提交中尚未提交的写入，避免回滚时连带丢弃
+            if self._write_seq > self._committed_seq:
+                self._commit_pending()
+            try:
+                yield self.conn
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    def _commit_pending(self):
+        """提交当前事务并唤醒等待组提交的写入方（调用方需持有写锁）"""
+        upto = self._write_seq
+        try:
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            with self._commit_cond:
+                self._failed_commits.append((self._committed_seq, upto, e))
+                self._committed_seq = upto
+                self._commit_cond.notify_all()
+            raise
+        with self._commit_cond:
+            self._committed_seq = upto
+            self._commit_cond.notify_all()
+
+    @property
+    def group_commit_enabled(self) -> bool:
+        """是否开启了组提交窗口"""
+        return self._group_commit_window > 0
+
+    def _await_group_commit(self, seq: int):
+        """等待覆盖第 seq 次写入的组提交完成；无领导者时自己成为领导者"""
+        with self._commit_cond:
+            while self._committed_seq < seq:
+                if self._commit_leader:
+                    self._commit_cond.wait()
+                    continue
+                self._commit_leader = True
+                self._commit_cond.release()
+                try:
+                    time.sleep(self._group_commit_window)
+                    with self._write_lock:
+                        if self._write_seq > self._committed_seq:
+                            self._commit_pending()
+                except Exception:
+                    pass
+                finally:
+                    self._commit_cond.acquire()
+                    self._commit_leader = False
+                    self._commit_cond.notify_all()
+
+            for low, high, error in self._failed_commits:
+                if low < seq <= high:
+                    raise error
+            # 只保留最近的失败记录，防止无限增长
+            del self._failed_commits[:-16]
+
     def _init_tables(self):
-        cursor = self.conn.cursor()
+        with self._write() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS GameHistory (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    round_num INTEGER NOT NULL,
+                    speaker TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    action_type TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    game_id TEXT
+                )
+            """)
+        
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS PlayerProfile (
+                    player_id TEXT PRIMARY KEY,
+                    role_assumed TEXT,
+                    suspicion_score REAL DEFAULT 0.0,
+                    personality TEXT,
+                    game_id TEXT,
+                    updated_at TEXT
+                )
+            """)
         
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS GameState (
+                    game_id TEXT PRIMARY KEY,
+                    current_round INTEGER DEFAULT 1,
+                    alive_players TEXT,
+                    game_status TEXT,
+                    updated_at TEXT
+                )
+            """)
+   
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS TrainingData (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dataset_id TEXT NOT NULL,
+                    features TEXT NOT NULL, 
+                    label TEXT NOT NULL,     
+                    game_id TEXT,           
+                    created_at TEXT NOT NULL,
+                    annotated_by TEXT DEFAULT 'system'  
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ModelVersion (
+                    version_id TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    model_type TEXT NOT NULL,  
+                    model_path TEXT NOT NULL,  
+                    run_id TEXT,               
+                    metrics TEXT,              
+                    description TEXT,
+                    created_at TEXT NOT NULL,
+                    last_evaluated TEXT       
+                )
+            """)
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS TrainingRun (
+                    run_id TEXT PRIMARY KEY,
+                    model_type TEXT NOT NULL,
+                    dataset_id TEXT NOT NULL,
+                    hyper_params TEXT NOT NULL,  
+                    start_time TEXT NOT NULL,
+                    end_time TEXT,
+                    status TEXT NOT NULL,        
+                    progress REAL DEFAULT 0.0,   
+                    model_version_id TEXT        
+                )
+            """)
+
+            self._migrate(cursor)
+
+        logger.info("Database tables initialized")
+
+    def _migrate(self, cursor: sqlite3.Cursor):
+        """按版本号依次执行 _migration_N，当前版本记录在 PRAGMA user_version"""
+        current = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version in range(current + 1, self.SCHEMA_VERSION + 1):
+            getattr(self, f"_migration_{version}")(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            logger.info(f"Applied schema migration v{version}")
+
+    def _migration_1(self, cursor: sqlite3.Cursor):
+        # GameHistory 查询索引：按玩家/轮次回忆、按动作类型过滤、按对局分页，均以自增 id 排序
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS GameHistory (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                round_num INTEGER NOT NULL,
-                speaker TEXT NOT NULL,
-                content TEXT NOT NULL,
-                action_type TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                game_id TEXT
-            )
+            CREATE INDEX IF NOT EXISTS idx_history_game_speaker_round
+            ON GameHistory (game_id, speaker, round_num, id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_game_action
+            ON GameHistory (game_id, action_type, id)
         """)
-        
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS PlayerProfile (
-                player_id TEXT PRIMARY KEY,
-                role_assumed TEXT,
-                suspicion_score REAL DEFAULT 0.0,
-                personality TEXT,
-                game_id TEXT,
-                updated_at TEXT
+            CREATE INDEX IF NOT EXISTS idx_history_game
+            ON GameHistory (game_id, id)
+        """)
+
+    def _migration_2(self, cursor: sqlite3.Cursor):
+        # 训练数据按数据集键集分页 / 存在性检查
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_training_dataset
+            ON TrainingData (dataset_id, id)
+        """)
+
+    def _migration_3(self, cursor: sqlite3.Cursor):
+        # 二进制特征：feature_encoding 标记编码版本，f32v1 行的数值存于 feature_blob，
+        # 特征名列表（schema）存于 FeatureSchema；JSON 行保持原样
+        cursor.execute("ALTER TABLE TrainingData ADD COLUMN feature_encoding TEXT NOT NULL DEFAULT 'json'")
+        cursor.execute("ALTER TABLE TrainingData ADD COLUMN feature_blob BLOB")
+        cursor.execute("ALTER TABLE TrainingData ADD COLUMN schema_id INTEGER")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS FeatureSchema (
+                schema_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                feature_names TEXT NOT NULL UNIQUE,
+                dim INTEGER NOT NULL,
+                created_at TEXT NOT NULL
             )
         """)
-        
+
+    def _migration_4(self, cursor: sqlite3.Cursor):
+        # 已归档对局的位置：game_id -> 月度归档文件
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS GameState (
+            CREATE TABLE IF NOT EXISTS GameArchive (
                 game_id TEXT PRIMARY KEY,
-                current_round INTEGER DEFAULT 1,
-                alive_players TEXT,
-                game_status TEXT,
-                updated_at TEXT
+                archive_path TEXT NOT NULL,
+                event_count INTEGER NOT NULL,
+                archived_at TEXT NOT NULL
             )
         """)
-   
+
+    def _migration_5(self, cursor: sqlite3.Cursor):
+        # GameHistory.content 的 FTS5 外部内容索引，由触发器与原表保持同步；
+        # 分词器在建表时确定，之后修改配置需要重建索引
+        tokenizer = get_config("database.fts.tokenizer", "unicode61")
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS GameHistoryFTS USING fts5(
+                    content, content='GameHistory', content_rowid='id', tokenize='{tokenizer}'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite 未编译 FTS5 时退回 LIKE 检索
+            logger.warning(f"FTS5 unavailable, full-text search falls back to LIKE: {e}")
+            return
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TrainingData (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                dataset_id TEXT NOT NULL,
-                features TEXT NOT NULL, 
-                label TEXT NOT NULL,     
-                game_id TEXT,           
-                created_at TEXT NOT NULL,
-                annotated_by TEXT DEFAULT 'system'  
-            )
+            CREATE TRIGGER IF NOT EXISTS GameHistory_fts_insert AFTER INSERT ON GameHistory BEGIN
+                INSERT INTO GameHistoryFTS (rowid, content) VALUES (new.id, new.content);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS GameHistory_fts_delete AFTER DELETE ON GameHistory BEGIN
+                INSERT INTO GameHistoryFTS (GameHistoryFTS, rowid, content) VALUES ('delete', old.id, old.content);
+            END
         """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS GameHistory_fts_update AFTER UPDATE OF content ON GameHistory BEGIN
+                INSERT INTO GameHistoryFTS (GameHistoryFTS, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO GameHistoryFTS (rowid, content) VALUES (new.id, new.content);
+            END
+        """)
+        cursor.execute("INSERT INTO GameHistoryFTS (GameHistoryFTS) VALUES ('rebuild')")
 
+    def _migration_6(self, cursor: sqlite3.Cursor):
+        # 事件溯源：GameHistory 记录关系目标，SuspicionEvidence 记录贝叶斯证据，
+        # EngineCheckpoint 保存每局引擎状态快照及其对应的最后事件ID
+        cursor.execute("ALTER TABLE GameHistory ADD COLUMN target_player TEXT")
+        cursor.execute("ALTER TABLE GameHistory ADD COLUMN relation_type TEXT")
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ModelVersion (
-                version_id TEXT PRIMARY KEY,
-                model_name TEXT NOT NULL,
-                model_type TEXT NOT NULL,  
-                model_path TEXT NOT NULL,  
-                run_id TEXT,               
-                metrics TEXT,              
+            CREATE TABLE IF NOT EXISTS SuspicionEvidence (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id TEXT NOT NULL,
+                player_id TEXT NOT NULL,
+                evidence_score REAL NOT NULL,
+                evidence_type TEXT NOT NULL,
                 description TEXT,
-                created_at TEXT NOT NULL,
-                last_evaluated TEXT       
+                created_at TEXT NOT NULL
             )
         """)
-
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS TrainingRun (
-                run_id TEXT PRIMARY KEY,
-                model_type TEXT NOT NULL,
-                dataset_id TEXT NOT NULL,
-                hyper_params TEXT NOT NULL,  
-                start_time TEXT NOT NULL,
-                end_time TEXT,
-                status TEXT NOT NULL,        
-                progress REAL DEFAULT 0.0,   
-                model_version_id TEXT        
+            CREATE INDEX IF NOT EXISTS idx_evidence_game
+            ON SuspicionEvidence (game_id, id)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS EngineCheckpoint (
+                game_id TEXT PRIMARY KEY,
+                state BLOB NOT NULL,
+                history_id INTEGER NOT NULL,
+                evidence_id INTEGER NOT NULL,
+                created_at TEXT NOT NULL
             )
         """)
 
-        self.conn.commit()
-        logger.info("Database tables initialized")
+    def _migration_7(self, cursor: sqlite3.Cursor):
+        # 身份事实写入前该玩家的未校准后验，作为离线拟合后验校准的样本
+        cursor.execute("ALTER TABLE SuspicionEvidence ADD COLUMN suspicion_before REAL")
 
     def record_event(
         self,
@@ -101,15 +477,116 @@ class GameDatabase:
         speaker: str,
         content: str,
         action_type: str,
-        game_id: Optional[str] = None
-    ):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO GameHistory (round_num, speaker, content, action_type, timestamp, game_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (round_num, speaker, content, action_type, datetime.now().isoformat(), game_id))
-        self.conn.commit()
+        game_id: Optional[str] = None,
+        target_player: Optional[str] = None,
+        relation_type: Optional[str] = None
+    ) -> int:
+        with self.router.writer_for(game_id) as target:
+            if target is not self:
+                return target.record_event(
+                    round_num, speaker, content, action_type, game_id, target_player, relation_type
+                )
+        params = (
+            round_num, speaker, content, action_type, datetime.now().isoformat(), game_id,
+            target_player, relation_type
+        )
+        if self._group_commit_window <= 0:
+            with self._write() as conn:
+                cursor = conn.execute(self._INSERT_EVENT_SQL, params)
+                event_id = cursor.lastrowid
+        else:
+            # 组提交：插入后不立即 commit，由窗口内的领导者统一提交
+            with self._write_lock:
+                cursor = self.conn.execute(self._INSERT_EVENT_SQL, params)
+                event_id = cursor.lastrowid
+                self._write_seq += 1
+                seq = self._write_seq
+            self._await_group_commit(seq)
         logger.debug(f"Recorded event: {action_type} by {speaker} in round {round_num}")
+        return event_id
+
+    def record_events(self, events: List[Dict[str, Any]]) -> List[int]:
+        """批量写入事件：单个事务内 executemany，返回与输入顺序一致的事件ID"""
+        if not events:
+            return []
+        if self.router.mode == STORAGE_SINGLE:
+            # 单库模式保持一个事务写完整批
+            for game_id in {e.get("game_id") for e in events}:
+                self.router.check_writable(game_id)
+            return self._record_events_local(events)
+        # 分片模式按对局分组，各分片一个事务，结果按输入顺序拼回
+        groups: Dict[Optional[str], List[int]] = {}
+        for index, e in enumerate(events):
+            groups.setdefault(e.get("game_id"), []).append(index)
+        ids: List[int] = [0] * len(events)
+        for game_id, indexes in groups.items():
+            with self.router.writer_for(game_id) as target:
+                group_ids = target._record_events_local([events[i] for i in indexes])
+            for index, event_id in zip(indexes, group_ids):
+                ids[index] = event_id
+        return ids
+
+    def _record_events_local(self, events: List[Dict[str, Any]]) -> List[int]:
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                e["round_num"],
+                e["speaker"],
+                e["content"],
+                e["action_type"],
+                e.get("timestamp") or now,
+                e.get("game_id"),
+                e.get("target_player"),
+                e.get("relation_type")
+            )
+            for e in events
+        ]
+        with self._write() as conn:
+            conn.executemany(self._INSERT_EVENT_SQL, rows)
+            # 单写连接 + AUTOINCREMENT 保证同一语句内分配的ID连续
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        logger.debug(f"Recorded {len(rows)} events in one transaction")
+        return list(range(first_id, last_id + 1))
+
+    def _archive_events_local(self, events: List[Dict[str, Any]], id_offset: int = 0):
+        rows = [
+            (
+                e["id"] + id_offset,
+                e["round_num"],
+                e["speaker"],
+                e["content"],
+                e["action_type"],
+                e["timestamp"],
+                e.get("game_id"),
+                e.get("target_player"),
+                e.get("relation_type")
+            )
+            for e in events
+        ]
+        with self._write() as conn:
+            conn.executemany(self._ARCHIVE_EVENT_SQL, rows)
+
+    def _archive_evidence_local(self, evidence: List[Dict[str, Any]]):
+        rows = [
+            (
+                e["id"],
+                e["game_id"],
+                e["player_id"],
+                e["evidence_score"],
+                e["evidence_type"],
+                e.get("description"),
+                e.get("suspicion_before"),
+                e["created_at"]
+            )
+            for e in evidence
+        ]
+        with self._write() as conn:
+            conn.executemany(self._ARCHIVE_EVIDENCE_SQL, rows)
+
+    def _max_history_id(self) -> int:
+        with self._read() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM GameHistory").fetchone()[0]
 
     def get_game_history(
         self,
@@ -117,32 +594,534 @@ class GameDatabase:
         round_num: Optional[int] = None,
         speaker: Optional[str] = None,
         action_type: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        before_id: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        cursor = self.conn.cursor()
-        query = "SELECT * FROM GameHistory WHERE 1=1"
-        params = []
+        """按 id 倒序返回历史记录；before_id 用于键集分页（只返回 id 更小的记录）
+
+        指定 game_id 时从该对局所在的分片/归档文件读取；不指定时只查询主库，
+        跨分片的全量读取使用 iter_all_history。
+        """
+        with self.router.reader_for(game_id) as source:
+            if source is not self:
+                return source.get_game_history(game_id, round_num, speaker, action_type, limit, before_id)
+        with self._read() as conn:
+            cursor = conn.cursor()
+            query = "SELECT * FROM GameHistory WHERE 1=1"
+            params = []
         
-        if game_id:
-            query += " AND game_id = ?"
-            params.append(game_id)
-        if round_num:
-            query += " AND round_num = ?"
-            params.append(round_num)
-        if speaker:
-            query += " AND speaker = ?"
-            params.append(speaker)
-        if action_type:
-            query += " AND action_type = ?"
-            params.append(action_type)
+            if game_id:
+                query += " AND game_id = ?"
+                params.append(game_id)
+            if round_num:
+                query += " AND round_num = ?"
+                params.append(round_num)
+            if speaker:
+                query += " AND speaker = ?"
+                params.append(speaker)
+            if action_type:
+                query += " AND action_type = ?"
+                params.append(action_type)
+            if before_id is not None:
+                query += " AND id < ?"
+                params.append(before_id)
         
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+            query += " ORDER BY id DESC LIMIT ?"
+            params.append(limit)
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    def iter_game_history(
+        self,
+        game_id: Optional[str] = None,
+        round_num: Optional[int] = None,
+        speaker: Optional[str] = None,
+        action_type: Optional[str] = None,
+        after_id: int = 0,
+        chunk_size: int = 500
+    ) -> Iterator[Dict[str, Any]]:
+        """按 id 升序（即时间顺序）流式读取历史记录，after_id 之后开始"""
+        with self.router.reader_for(game_id) as source:
+            yield from source._iter_history_local(game_id, round_num, speaker, action_type, after_id, chunk_size)
+
+    def _iter_history_local(
+        self,
+        game_id: Optional[str],
+        round_num: Optional[int],
+        speaker: Optional[str],
+        action_type: Optional[str],
+        after_id: int,
+        chunk_size: int
+    ) -> Iterator[Dict[str, Any]]:
+        query = "SELECT * FROM GameHistory WHERE id > ?"
+        filters = []
+        params: List[Any] = []
+        for column, value in (
+            ("game_id", game_id),
+            ("round_num", round_num),
+            ("speaker", speaker),
+            ("action_type", action_type),
+        ):
+            if value is not None:
+                filters.append(f" AND {column} = ?")
+                params.append(value)
+        query += "".join(filters) + " ORDER BY id LIMIT ?"
+        last_id = after_id
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(query, [last_id] + params + [chunk_size]).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def search_game_history(
+        self,
+        query: str,
+        game_id: Optional[str] = None,
+        round_num: Optional[int] = None,
+        speaker: Optional[str] = None,
+        action_type: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """全文检索历史记录，按 BM25 相关度排序
+
+        query 按空白切分为词项，所有词项都需命中（词项内的 FTS5 语法字符按字面处理）。
+        每条结果附带 snippet（命中词以 [] 标出）和 score（越大越相关）。
+        """
+        with self.router.reader_for(game_id) as source:
+            if source is not self:
+                return source.search_game_history(query, game_id, round_num, speaker, action_type, limit)
+
+        terms = query.split()
+        if not terms:
+            return []
+        filters = ""
+        params: List[Any] = []
+        for column, value in (
+            ("game_id", game_id),
+            ("round_num", round_num),
+            ("speaker", speaker),
+            ("action_type", action_type),
+        ):
+            if value is not None:
+                filters += f" AND h.{column} = ?"
+                params.append(value)
+
+        with self._read() as conn:
+            if self._has_fts(conn):
+                match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = conn.execute(f"""
+                    SELECT h.*,
+                           snippet(GameHistoryFTS, 0, '[', ']', '...', 16) AS snippet,
+                           -bm25(GameHistoryFTS) AS score
+                    FROM GameHistoryFTS JOIN GameHistory h ON h.id = GameHistoryFTS.rowid
+                    WHERE GameHistoryFTS MATCH ?{filters}
+                    ORDER BY bm25(GameHistoryFTS) LIMIT ?
+                """, [match] + params + [limit]).fetchall()
+            else:
+                like = "".join(" AND h.content LIKE ?" for _ in terms)
+                rows = conn.execute(f"""
+                    SELECT h.*, h.content AS snippet, NULL AS score
+                    FROM GameHistory h
+                    WHERE 1=1{like}{filters}
+                    ORDER BY h.id DESC LIMIT ?
+                """, [f"%{term}%" for term in terms] + params + [limit]).fetchall()
         return [dict(row) for row in rows]
 
+    def _has_fts(self, conn: sqlite3.Connection) -> bool:
+        if self._fts_available is None:
+            self._fts_available = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'GameHistoryFTS'"
+            ).fetchone() is not None
+        return self._fts_available
+
+    def iter_all_history(
+        self,
+        game_id: Optional[str] = None,
+        speaker: Optional[str] = None,
+        action_type: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """跨主库、全部分片与归档文件读取 GameHistory（供分析与训练导出使用）
+
+        每行附带 source 字段（main / shard:<名称> / archive:<月份文件>）；
+        各来源内按 id 升序，来源之间不保证时间顺序。
+        """
+        where = "1=1"
+        params: List[Any] = []
+        for column, value in (("game_id", game_id), ("speaker", speaker), ("action_type", action_type)):
+            if value is not None:
+                where += f" AND {column} = ?"
+                params.append(value)
+        return self.router.iter_all_history(where, params, chunk_size)
+
+    def archive_game(
+        self,
+        game_id: str,
+        month: Optional[str] = None,
+        chunk_size: int = 1000,
+        pause_seconds: float = 0.0
+    ) -> Dict[str, Any]:
+        """把已结束对局的历史移入月度归档文件，之后该对局的历史只读
+
+        按块复制到 archive_dir/history-<month>.db（默认当前月份，格式 YYYY-MM），
+        在主库登记 GameArchive 后删除原分片文件或主库中的行。
+
+        主库的事件ID全局唯一，归档时原样保留。per_game 模式下各分片的ID都从 1 开始，
+        同一归档文件中会冲突，因此整体平移到归档文件现有ID之后，并在登记的同一事务中
+        删除该对局的引擎检查点（其水位与矛盾索引中的ID已失效），恢复时从归档历史完整重放。
+        该对局的 SuspicionEvidence（ID 始终来自主库，全局唯一）原样随历史移入同一归档文件。
+        """
+        if self.router.archive_location(game_id):
+            raise ValueError(f"Game {game_id} is already archived")
+        month = month or datetime.now().strftime("%Y-%m")
+        archive_path = self.router.archive_path(month)
+        shard_path = self.router.shard_path(game_id)
+        moved = 0
+
+        with self.router.reader_for(game_id) as source, self.router.acquire(archive_path) as archive:
+            id_offset = 0 if source is self else archive._max_history_id()
+            last_id = 0
+            last_evidence_id = 0
+            # 登记前后各复制一次：第二次补上复制期间新写入的事件，登记后写入会被拒绝
+            for register in (False, True):
+                evidence: List[Dict[str, Any]] = []
+                for row in self._iter_evidence_local(game_id, last_evidence_id, chunk_size):
+                    evidence.append(row)
+                    last_evidence_id = row["id"]
+                    if len(evidence) >= chunk_size:
+                        archive._archive_evidence_local(evidence)
+                        evidence = []
+                if evidence:
+                    archive._archive_evidence_local(evidence)
+                buffer: List[Dict[str, Any]] = []
+                for row in source._iter_history_local(game_id, None, None, None, last_id, chunk_size):
+                    buffer.append(row)
+                    last_id = row["id"]
+                    if len(buffer) >= chunk_size:
+                        archive._archive_events_local(buffer, id_offset)
+                        moved += len(buffer)
+                        buffer = []
+                if buffer:
+                    archive._archive_events_local(buffer, id_offset)
+                    moved += len(buffer)
+                if not register:
+                    with self._write() as conn:
+                        conn.execute(
+                            "INSERT INTO GameArchive (game_id, archive_path, event_count, archived_at) "
+                            "VALUES (?, ?, 0, ?)",
+                            (game_id, archive_path, datetime.now().isoformat())
+                        )
+                        if id_offset:
+                            conn.execute("DELETE FROM EngineCheckpoint WHERE game_id = ?", (game_id,))
+                    self.router.mark_archived(game_id, archive_path)
+
+        with self._write() as conn:
+            conn.execute("UPDATE GameArchive SET event_count = ? WHERE game_id = ?", (moved, game_id))
+
+        # 删除原数据：分片文件整体删除，主库中的行分块删除以缩短写锁持有时间
+        if source is not self:
+            if self.router.release(shard_path):
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(shard_path + suffix):
+                        os.remove(shard_path + suffix)
+            else:
+                logger.warning(f"Shard {shard_path} still in use, leaving file in place")
+        self.purge_rows("GameHistory", "game_id = ?", [game_id], chunk_size, pause_seconds)
+        self.purge_rows("SuspicionEvidence", "game_id = ?", [game_id], chunk_size, pause_seconds)
+
+        logger.info(f"Archived {moved} events of game {game_id} to {archive_path}")
+        return {"game_id": game_id, "archive_path": archive_path, "events": moved}
+
+    def delete_game(self, game_id: str, chunk_size: int = 500, pause_seconds: float = 0.0) -> Dict[str, int]:
+        """删除对局的全部数据：历史与证据（分片/归档/主库）、检查点、归档登记与对局状态"""
+        deleted: Dict[str, int] = {}
+        archive_path = self.router.archive_location(game_id)
+        shard_path = self.router.shard_path(game_id)
+        if archive_path:
+            with self.router.acquire(archive_path) as archive:
+                for table in ("GameHistory", "SuspicionEvidence"):
+                    deleted[table] = archive.purge_rows(table, "game_id = ?", [game_id], chunk_size, pause_seconds)
+        elif self.router.mode == STORAGE_PER_GAME and os.path.exists(shard_path):
+            with self.router.acquire(shard_path) as shard:
+                deleted["GameHistory"] = shard.count_rows("GameHistory")
+            if self.router.release(shard_path):
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(shard_path + suffix):
+                        os.remove(shard_path + suffix)
+        deleted["GameHistory"] = deleted.get("GameHistory", 0) + self.purge_rows(
+            "GameHistory", "game_id = ?", [game_id], chunk_size, pause_seconds
+        )
+        for table in ("SuspicionEvidence", "EngineCheckpoint", "GameArchive", "GameState"):
+            deleted[table] = deleted.get(table, 0) + self.purge_rows(
+                table, "game_id = ?", [game_id], chunk_size, pause_seconds
+            )
+        self.router.forget_archive(game_id)
+        logger.info(f"Deleted game {game_id}: {deleted}")
+        return deleted
+
+    # ========== 维护 ==========
+    def purge_rows(
+        self,
+        table: str,
+        where: str,
+        params: List[Any],
+        chunk_size: int = 500,
+        pause_seconds: float = 0.0
+    ) -> int:
+        """分块删除满足条件的行，每块一个短事务，块之间可暂停让出写锁"""
+        total = 0
+        while True:
+            with self._write() as conn:
+                deleted = conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                    list(params) + [chunk_size]
+                ).rowcount
+            total += deleted
+            if deleted < chunk_size:
+                return total
+            if pause_seconds > 0:
+                time.sleep(pause_seconds)
+
+    def count_rows(self, table: str, where: str = "1=1", params: Optional[List[Any]] = None) -> int:
+        with self._read() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params or []).fetchone()[0]
+
+    def get_expired_games(self, cutoff: str, limit: int = 100) -> List[str]:
+        """已结束且最后更新早于 cutoff、尚未归档的对局"""
+        with self._read() as conn:
+            rows = conn.execute("""
+                SELECT game_id FROM GameState
+                WHERE game_status = 'finished' AND updated_at < ?
+                  AND game_id NOT IN (SELECT game_id FROM GameArchive)
+                ORDER BY updated_at LIMIT ?
+            """, (cutoff, limit)).fetchall()
+        return [row["game_id"] for row in rows]
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """回收最多 pages 个空闲页，返回实际回收的页数（auto_vacuum 不是 INCREMENTAL 时为 0）"""
+        with self._write() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+
+    def freelist_pages(self) -> int:
+        with self._read() as conn:
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def optimize(self):
+        """PRAGMA optimize：只在统计信息过期时重新 ANALYZE，通常很快"""
+        with self._write() as conn:
+            conn.execute("PRAGMA optimize")
+
+    def get_latest_history_id(self, game_id: str) -> int:
+        """对局最新一条历史记录的ID（没有记录时为 0）"""
+        with self.router.reader_for(game_id) as source:
+            with source._read() as conn:
+                row = conn.execute(
+                    "SELECT MAX(id) FROM GameHistory WHERE game_id = ?", (game_id,)
+                ).fetchone()
+        return row[0] or 0
+
+    # ========== SuspicionEvidence / EngineCheckpoint ==========
+    def record_suspicion_evidence(
+        self,
+        game_id: str,
+        player_id: str,
+        evidence_score: float,
+        evidence_type: str = "general",
+        description: str = "",
+        suspicion_before: Optional[float] = None
+    ) -> int:
+        """记录一条贝叶斯证据（用于重启后重放），返回证据ID
+
+        suspicion_before 为应用该证据前的后验，身份事实记录它作为校准样本。
+        """
+        self.router.check_writable(game_id)
+        with self._write() as conn:
+            cursor = conn.execute("""
+                INSERT INTO SuspicionEvidence
+                    (game_id, player_id, evidence_score, evidence_type, description, suspicion_before, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                game_id, player_id, evidence_score, evidence_type, description, suspicion_before,
+                datetime.now().isoformat()
+            ))
+            return cursor.lastrowid
+
+    def record_suspicion_evidence_many(self, game_id: str, evidence: List[Dict[str, Any]]) -> List[int]:
+        """单个事务批量记录证据，返回与输入顺序一致的证据ID"""
+        if not evidence:
+            return []
+        self.router.check_writable(game_id)
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                game_id,
+                item["player_id"],
+                item["evidence_score"],
+                item.get("evidence_type") or "general",
+                item.get("description") or "",
+                item.get("suspicion_before"),
+                now
+            )
+            for item in evidence
+        ]
+        with self._write() as conn:
+            conn.executemany("""
+                INSERT INTO SuspicionEvidence
+                    (game_id, player_id, evidence_score, evidence_type, description, suspicion_before, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def iter_suspicion_evidence(
+        self,
+        game_id: str,
+        after_id: int = 0,
+        chunk_size: int = 500
+    ) -> Iterator[Dict[str, Any]]:
+        """按 id 升序流式读取对局的证据记录（已归档对局从归档文件读取）"""
+        with self.router.evidence_reader_for(game_id) as source:
+            yield from source._iter_evidence_local(game_id, after_id, chunk_size)
+
+    def _iter_evidence_local(self, game_id: str, after_id: int, chunk_size: int) -> Iterator[Dict[str, Any]]:
+        last_id = after_id
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM SuspicionEvidence WHERE game_id = ? AND id > ? ORDER BY id LIMIT ?",
+                    (game_id, last_id, chunk_size)
+                ).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def get_suspicion_evidence(
+        self,
+        game_id: str,
+        player_id: Optional[str] = None,
+        limit: int = 50,
+        before_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """按 id 倒序返回证据记录；before_id 用于键集分页，也可用引擎内存缓冲中最旧的 id 读取更早的证据"""
+        with self.router.evidence_reader_for(game_id) as source:
+            if source is not self:
+                return source.get_suspicion_evidence(game_id, player_id, limit, before_id)
+        query = "SELECT * FROM SuspicionEvidence WHERE game_id = ?"
+        params: List[Any] = [game_id]
+        if player_id:
+            query += " AND player_id = ?"
+            params.append(player_id)
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._read() as conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def iter_labeled_evidence(self, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """流式读取已结束对局中身份已知玩家的证据，is_wolf 取同局该玩家最后一条身份事实"""
+        query = """
+            SELECT e.id, e.game_id, e.player_id, e.evidence_type, e.evidence_score,
+                   r.evidence_score >= 0.5 AS is_wolf
+            FROM SuspicionEvidence e{finished}
+            JOIN (
+                SELECT game_id, player_id, evidence_score, MAX(id)
+                FROM SuspicionEvidence WHERE evidence_type = 'role_fact'
+                GROUP BY game_id, player_id
+            ) r ON r.game_id = e.game_id AND r.player_id = e.player_id
+            WHERE e.evidence_type != 'role_fact' AND e.id > ?
+            ORDER BY e.id LIMIT ?
+        """
+        return self._iter_finished_evidence(query, chunk_size)
+
+    def iter_calibration_samples(self, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """流式读取已结束对局中身份事实写入前的后验（suspicion_before）与真实身份（is_wolf）
+
+        身份已确定后重复写入的事实（后验已是 0 或 1）不作为样本。
+        """
+        query = """
+            SELECT e.id, e.game_id, e.player_id, e.suspicion_before, e.evidence_score >= 0.5 AS is_wolf
+            FROM SuspicionEvidence e{finished}
+            WHERE e.evidence_type = 'role_fact' AND e.suspicion_before > 0 AND e.suspicion_before < 1
+              AND e.id > ?
+            ORDER BY e.id LIMIT ?
+        """
+        return self._iter_finished_evidence(query, chunk_size)
+
+    def _iter_finished_evidence(self, query: str, chunk_size: int) -> Iterator[Dict[str, Any]]:
+        """先读主库，再读各归档文件；各来源内按 id 升序
+
+        归档文件中只有已结束对局且没有 GameState，不需要按对局状态过滤。
+        """
+        yield from self._iter_keyset(
+            query.format(finished="\n            JOIN GameState g ON g.game_id = e.game_id AND g.game_status = 'finished'"),
+            chunk_size
+        )
+        for path in self.router.archive_files():
+            with self.router.acquire(path) as archive:
+                yield from archive._iter_keyset(query.format(finished=""), chunk_size)
+
+    def _iter_keyset(self, query: str, chunk_size: int) -> Iterator[Dict[str, Any]]:
+        last_id = 0
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(query, (last_id, chunk_size)).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def get_latest_evidence_id(self, game_id: str) -> int:
+        with self.router.evidence_reader_for(game_id) as source:
+            if source is not self:
+                return source.get_latest_evidence_id(game_id)
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT MAX(id) FROM SuspicionEvidence WHERE game_id = ?", (game_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def save_engine_checkpoint(self, game_id: str, state: bytes, history_id: int, evidence_id: int):
+        """保存（覆盖）对局的引擎状态快照"""
+        with self._write() as conn:
+            conn.execute("""
+                INSERT INTO EngineCheckpoint (game_id, state, history_id, evidence_id, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(game_id) DO UPDATE SET
+                    state = excluded.state,
+                    history_id = excluded.history_id,
+                    evidence_id = excluded.evidence_id,
+                    created_at = excluded.created_at
+            """, (game_id, state, history_id, evidence_id, datetime.now().isoformat()))
+
+    def get_engine_checkpoint(self, game_id: str) -> Optional[Dict[str, Any]]:
+        with self._read() as conn:
+            row = conn.execute("SELECT * FROM EngineCheckpoint WHERE game_id = ?", (game_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_active_game_ids(self, limit: int = 500) -> List[str]:
+        """进行中的对局，按最近更新时间倒序"""
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT game_id FROM GameState WHERE game_status = 'active' ORDER BY updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [row["game_id"] for row in rows]
+
     def update_player_profile(
         self,
         player_id: str,
@@ -151,67 +1130,62 @@ class GameDatabase:
         personality: Optional[str] = None,
         game_id: Optional[str] = None
     ):
-        cursor = self.conn.cursor()
-        
-        existing = cursor.execute(
-            "SELECT * FROM PlayerProfile WHERE player_id = ?",
-            (player_id,)
-        ).fetchone()
-        
-        if existing:
-            updates = []
-            params = []
-            if role_assumed is not None:
-                updates.append("role_assumed = ?")
-                params.append(role_assumed)
-            if suspicion_score is not None:
-                updates.append("suspicion_score = ?")
-                params.append(suspicion_score)
-            if personality is not None:
-                updates.append("personality = ?")
-                params.append(personality)
-            if game_id is not None:
-                updates.append("game_id = ?")
-                params.append(game_id)
-            
-            updates.append("updated_at = ?")
-            params.append(datetime.now().isoformat())
-            params.append(player_id)
-            
-            cursor.execute(
-                f"UPDATE PlayerProfile SET {', '.join(updates)} WHERE player_id = ?",
-                params
-            )
-        else:
-            cursor.execute("""
-                INSERT INTO PlayerProfile (player_id, role_assumed, suspicion_score, personality, game_id, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                player_id,
-                role_assumed,
-                suspicion_score if suspicion_score is not None else 0.0,
-                personality,
-                game_id,
-                datetime.now().isoformat()
-            ))
-        
-        self.conn.commit()
+        """单条 UPSERT：为 None 的字段保留原值"""
+        with self._write() as conn:
+            conn.execute(self._UPSERT_PROFILE_SQL, {
+                "player_id": player_id,
+                "role_assumed": role_assumed,
+                "suspicion_score": suspicion_score,
+                "personality": personality,
+                "game_id": game_id,
+                "updated_at": datetime.now().isoformat()
+            })
         logger.debug(f"Updated player profile: {player_id}")
 
+    def update_player_profiles_many(
+        self,
+        profiles: List[Dict[str, Any]],
+        game_id: Optional[str] = None
+    ):
+        """批量 UPSERT 玩家档案（单个事务）
+
+        profiles 中每个元素必须包含 player_id，可选 role_assumed/suspicion_score/
+        personality/game_id；未给出 game_id 时使用参数 game_id。
+        """
+        if not profiles:
+            return
+        now = datetime.now().isoformat()
+        rows = [
+            {
+                "player_id": p["player_id"],
+                "role_assumed": p.get("role_assumed"),
+                "suspicion_score": p.get("suspicion_score"),
+                "personality": p.get("personality"),
+                "game_id": p.get("game_id") or game_id,
+                "updated_at": now
+            }
+            for p in profiles
+        ]
+        with self._write() as conn:
+            conn.executemany(self._UPSERT_PROFILE_SQL, rows)
+        logger.debug(f"Updated {len(rows)} player profiles")
+
     def get_player_profile(self, player_id: str) -> Optional[Dict[str, Any]]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM PlayerProfile WHERE player_id = ?", (player_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM PlayerProfile WHERE player_id = ?", (player_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def get_all_player_profiles(self, game_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        cursor = self.conn.cursor()
-        if game_id:
-            cursor.execute("SELECT * FROM PlayerProfile WHERE game_id = ?", (game_id,))
-        else:
-            cursor.execute("SELECT * FROM PlayerProfile")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        with self._read() as conn:
+            cursor = conn.cursor()
+            if game_id:
+                cursor.execute("SELECT * FROM PlayerProfile WHERE game_id = ?", (game_id,))
+            else:
+                cursor.execute("SELECT * FROM PlayerProfile")
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
 
     def update_game_state(
         self,
@@ -220,58 +1194,27 @@ class GameDatabase:
         alive_players: Optional[List[str]] = None,
         game_status: Optional[str] = None
     ):
-        cursor = self.conn.cursor()
-        
-        existing = cursor.execute(
-            "SELECT * FROM GameState WHERE game_id = ?",
-            (game_id,)
-        ).fetchone()
-        
-        if existing:
-            updates = []
-            params = []
-            if current_round is not None:
-                updates.append("current_round = ?")
-                params.append(current_round)
-            if alive_players is not None:
-                updates.append("alive_players = ?")
-                params.append(",".join(alive_players))
-            if game_status is not None:
-                updates.append("game_status = ?")
-                params.append(game_status)
-            
-            updates.append("updated_at = ?")
-            params.append(datetime.now().isoformat())
-            params.append(game_id)
-            
-            cursor.execute(
-                f"UPDATE GameState SET {', '.join(updates)} WHERE game_id = ?",
-                params
-            )
-        else:
-            cursor.execute("""
-                INSERT INTO GameState (game_id, current_round, alive_players, game_status, updated_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                game_id,
-                current_round if current_round is not None else 1,
-                ",".join(alive_players) if alive_players else "",
-                game_status,
-                datetime.now().isoformat()
-            ))
-        
-        self.conn.commit()
+        """单条 UPSERT：为 None 的字段保留原值"""
+        with self._write() as conn:
+            conn.execute(self._UPSERT_GAME_STATE_SQL, {
+                "game_id": game_id,
+                "current_round": current_round,
+                "alive_players": ",".join(alive_players) if alive_players is not None else None,
+                "game_status": game_status,
+                "updated_at": datetime.now().isoformat()
+            })
 
     def get_game_state(self, game_id: str) -> Optional[Dict[str, Any]]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM GameState WHERE game_id = ?", (game_id,))
-        row = cursor.fetchone()
-        if row:
-            result = dict(row)
-            if result.get("alive_players"):
-                result["alive_players"] = result["alive_players"].split(",")
-            return result
-        return None
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM GameState WHERE game_id = ?", (game_id,))
+            row = cursor.fetchone()
+            if row:
+                result = dict(row)
+                if result.get("alive_players"):
+                    result["alive_players"] = result["alive_players"].split(",")
+                return result
+            return None
 
      # ========== 新增：TrainingData表CRUD方法 ==========
     def create_training_data(
@@ -280,22 +1223,91 @@ class GameDatabase:
         features: Dict[str, Any],
         label: str,
         game_id: Optional[str] = None,
-        annotated_by: str = "system"
+        annotated_by: str = "system",
+        feature_encoding: Optional[str] = None
     ):
-        """新增训练样本"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO TrainingData (dataset_id, features, label, game_id, created_at, annotated_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            dataset_id,
-            json.dumps(features, ensure_ascii=False),
-            label,
-            game_id,
-            datetime.now().isoformat(),
-            annotated_by
-        ))
-        self.conn.commit()
+        """新增训练样本
+
+        feature_encoding 为 "float32" 且特征全部为数值时以 float32 BLOB 存储，
+        否则回退为 JSON；默认取 training.data.feature_encoding 配置。
+        """
+        encoding = (
+            feature_codec.resolve_encoding(feature_encoding)
+            if feature_encoding is not None else self._feature_encoding
+        )
+        with self._write() as conn:
+            if encoding == feature_codec.FEATURE_ENCODING_F32 and feature_codec.is_numeric_features(features):
+                schema = feature_codec.feature_schema(features)
+                schema_id = self._feature_schema_id(conn, schema)
+                conn.execute("""
+                    INSERT INTO TrainingData (dataset_id, features, label, game_id, created_at, annotated_by,
+                                              feature_encoding, feature_blob, schema_id)
+                    VALUES (?, '', ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    dataset_id,
+                    label,
+                    game_id,
+                    datetime.now().isoformat(),
+                    annotated_by,
+                    feature_codec.FEATURE_ENCODING_F32,
+                    feature_codec.pack_features(features, schema),
+                    schema_id
+                ))
+            else:
+                conn.execute("""
+                    INSERT INTO TrainingData (dataset_id, features, label, game_id, created_at, annotated_by)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    dataset_id,
+                    feature_codec.encode_json(features),
+                    label,
+                    game_id,
+                    datetime.now().isoformat(),
+                    annotated_by
+                ))
+
+    def _feature_schema_id(self, conn: sqlite3.Connection, schema: tuple) -> int:
+        """取得（必要时登记）特征 schema 的ID，调用方需持有写事务"""
+        schema_id = self._schema_ids.get(schema)
+        if schema_id is not None:
+            return schema_id
+        names = json.dumps(list(schema), ensure_ascii=False)
+        conn.execute(
+            "INSERT OR IGNORE INTO FeatureSchema (feature_names, dim, created_at) VALUES (?, ?, ?)",
+            (names, len(schema), datetime.now().isoformat())
+        )
+        schema_id = conn.execute(
+            "SELECT schema_id FROM FeatureSchema WHERE feature_names = ?", (names,)
+        ).fetchone()[0]
+        self._schema_ids[schema] = schema_id
+        self._schema_names[schema_id] = schema
+        return schema_id
+
+    def get_feature_schema(self, schema_id: int) -> tuple:
+        """按ID读取特征名列表（带缓存）"""
+        schema = self._schema_names.get(schema_id)
+        if schema is None:
+            with self._read() as conn:
+                row = conn.execute(
+                    "SELECT feature_names FROM FeatureSchema WHERE schema_id = ?", (schema_id,)
+                ).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown feature schema: {schema_id}")
+            schema = tuple(json.loads(row["feature_names"]))
+            self._schema_names[schema_id] = schema
+            self._schema_ids[schema] = schema_id
+        return schema
+
+    def _decode_training_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        row_dict = dict(row)
+        encoding = row_dict.pop("feature_encoding", feature_codec.FEATURE_ENCODING_JSON)
+        blob = row_dict.pop("feature_blob", None)
+        schema_id = row_dict.pop("schema_id", None)
+        if encoding == feature_codec.FEATURE_ENCODING_F32:
+            row_dict["features"] = feature_codec.unpack_features(blob, self.get_feature_schema(schema_id))
+        else:
+            row_dict["features"] = json.loads(row_dict["features"])
+        return row_dict
 
     def get_training_data(
         self,
@@ -305,30 +1317,156 @@ class GameDatabase:
         limit: int = 10000
     ) -> List[Dict[str, Any]]:
         """查询训练数据，支持多条件过滤"""
-        cursor = self.conn.cursor()
-        query = "SELECT * FROM TrainingData WHERE 1=1"
-        params = []
+        where, params = self._training_filters(dataset_id, label, game_id)
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT * FROM TrainingData WHERE {where} ORDER BY created_at DESC LIMIT ?",
+                params + [limit]
+            )
+            rows = cursor.fetchall()
+        # 解析特征（JSON 或 float32 BLOB）
+        return [self._decode_training_row(row) for row in rows]
+
+    def iter_training_data(
+        self,
+        dataset_id: Optional[str] = None,
+        label: Optional[str] = None,
+        game_id: Optional[str] = None,
+        chunk_size: int = 500
+    ) -> Iterator[Dict[str, Any]]:
+        """按 id 升序流式读取训练数据，每块单独借出读连接，内存占用与数据量无关"""
+        where, params = self._training_filters(dataset_id, label, game_id)
+        query = f"SELECT * FROM TrainingData WHERE {where} AND id > ? ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            with self._read() as conn:
+                rows = conn.execute(query, params + [last_id, chunk_size]).fetchall()
+            for row in rows:
+                yield self._decode_training_row(row)
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    def count_training_data(
+        self,
+        dataset_id: Optional[str] = None,
+        label: Optional[str] = None,
+        game_id: Optional[str] = None
+    ) -> int:
+        """统计训练样本数，不读取特征"""
+        where, params = self._training_filters(dataset_id, label, game_id)
+        with self._read() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM TrainingData WHERE {where}", params).fetchone()[0]
+
+    def has_training_data(
+        self,
+        dataset_id: Optional[str] = None,
+        label: Optional[str] = None,
+        game_id: Optional[str] = None
+    ) -> bool:
+        """判断是否存在符合条件的训练样本（命中第一行即返回）"""
+        where, params = self._training_filters(dataset_id, label, game_id)
+        with self._read() as conn:
+            row = conn.execute(f"SELECT 1 FROM TrainingData WHERE {where} LIMIT 1", params).fetchone()
+        return row is not None
+
+    def load_training_matrix(
+        self,
+        dataset_id: Optional[str] = None,
+        label: Optional[str] = None,
+        game_id: Optional[str] = None,
+        schema_id: Optional[int] = None,
+        chunk_size: int = 4096
+    ) -> Dict[str, Any]:
+        """把 float32 编码的训练样本直接读入连续的 NumPy 数组
+
+        不构造逐行的特征字典：BLOB 按块拼接后写入预分配的 (n, dim) 数组。
+        JSON 编码的样本不包含在结果中。符合条件的样本存在多个 schema 时需指定 schema_id。
+
+        Returns:
+            Dict containing:
+            - features: float32 数组，形状 (n, dim)
+            - feature_names: 列顺序对应的特征名
+            - labels: 标签数组，形状 (n,)
+            - ids: TrainingData.id 数组，形状 (n,)
+            - schema_id: 使用的 schema
+        """
+        where, params = self._training_filters(dataset_id, label, game_id)
+        where += " AND feature_encoding = ?"
+        params.append(feature_codec.FEATURE_ENCODING_F32)
+
+        with self._read() as conn:
+            if schema_id is None:
+                schema_ids = [
+                    r[0] for r in conn.execute(
+                        f"SELECT DISTINCT schema_id FROM TrainingData WHERE {where}", params
+                    )
+                ]
+                if len(schema_ids) > 1:
+                    raise ValueError(f"Multiple feature schemas match, pass schema_id (one of {schema_ids})")
+                schema_id = schema_ids[0] if schema_ids else None
+            if schema_id is None:
+                return {
+                    "features": np.empty((0, 0), dtype=feature_codec.FEATURE_DTYPE),
+                    "feature_names": [],
+                    "labels": np.empty(0, dtype=object),
+                    "ids": np.empty(0, dtype=np.int64),
+                    "schema_id": None
+                }
+            where += " AND schema_id = ?"
+            params.append(schema_id)
+            total = conn.execute(f"SELECT COUNT(*) FROM TrainingData WHERE {where}", params).fetchone()[0]
+
+        names = self.get_feature_schema(schema_id)
+        features = np.empty((total, len(names)), dtype=feature_codec.FEATURE_DTYPE)
+        labels = np.empty(total, dtype=object)
+        ids = np.empty(total, dtype=np.int64)
+
+        query = f"SELECT id, label, feature_blob FROM TrainingData WHERE {where} AND id > ? ORDER BY id LIMIT ?"
+        filled = 0
+        last_id = 0
+        while filled < total:
+            with self._read() as conn:
+                rows = conn.execute(query, params + [last_id, chunk_size]).fetchall()
+            if not rows:
+                break
+            n = min(len(rows), total - filled)
+            row_ids, row_labels, blobs = zip(*rows[:n])
+            features[filled:filled + n] = np.frombuffer(
+                b"".join(blobs), dtype=feature_codec.FEATURE_DTYPE
+            ).reshape(n, len(names))
+            labels[filled:filled + n] = row_labels
+            ids[filled:filled + n] = row_ids
+            filled += n
+            last_id = row_ids[-1]
+
+        return {
+            "features": features[:filled],
+            "feature_names": list(names),
+            "labels": labels[:filled],
+            "ids": ids[:filled],
+            "schema_id": schema_id
+        }
+
+    @staticmethod
+    def _training_filters(
+        dataset_id: Optional[str],
+        label: Optional[str],
+        game_id: Optional[str]
+    ) -> tuple:
+        where = "1=1"
+        params: List[Any] = []
         if dataset_id:
-            query += " AND dataset_id = ?"
+            where += " AND dataset_id = ?"
             params.append(dataset_id)
         if label:
-            query += " AND label = ?"
+            where += " AND label = ?"
             params.append(label)
         if game_id:
-            query += " AND game_id = ?"
+            where += " AND game_id = ?"
             params.append(game_id)
-        query += " ORDER BY created_at DESC LIMIT ?"
-        params.append(limit)
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        # 解析JSON特征
-        result = []
-        for row in rows:
-            row_dict = dict(row)
-            row_dict["features"] = json.loads(row_dict["features"])
-            result.append(row_dict)
-        return result
+        return where, params
 
     # ========== 新增：ModelVersion表CRUD方法 ==========
     def create_model_version(
@@ -342,27 +1480,37 @@ class GameDatabase:
         created_at: Optional[str] = None
     ):
         """新增模型版本记录"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO ModelVersion (version_id, model_name, model_type, model_path, run_id, description, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            version_id,
-            model_name,
-            model_type,
-            model_path,
-            run_id,
-            description,
-            created_at or datetime.now().isoformat()
-        ))
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO ModelVersion (version_id, model_name, model_type, model_path, run_id, description, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                version_id,
+                model_name,
+                model_type,
+                model_path,
+                run_id,
+                description,
+                created_at or datetime.now().isoformat()
+            ))
 
     def get_model_version(self, version_id: str) -> Optional[Dict[str, Any]]:
         """查询单个模型版本"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM ModelVersion WHERE version_id = ?", (version_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM ModelVersion WHERE version_id = ?", (version_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_latest_model_version(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """查询指定类型最近创建的模型版本"""
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT * FROM ModelVersion WHERE model_type = ? ORDER BY created_at DESC, rowid DESC LIMIT 1",
+                (model_type,)
+            ).fetchone()
+            return dict(row) if row else None
 
     def update_model_version(
         self,
@@ -371,20 +1519,20 @@ class GameDatabase:
         last_evaluated: Optional[str] = None
     ):
         """更新模型指标和评估时间"""
-        cursor = self.conn.cursor()
-        updates = []
-        params = []
-        if metrics:
-            updates.append("metrics = ?")
-            params.append(metrics)
-        if last_evaluated:
-            updates.append("last_evaluated = ?")
-            params.append(last_evaluated)
-        if not updates:
-            return
-        params.append(version_id)
-        cursor.execute(f"UPDATE ModelVersion SET {', '.join(updates)} WHERE version_id = ?", params)
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.cursor()
+            updates = []
+            params = []
+            if metrics:
+                updates.append("metrics = ?")
+                params.append(metrics)
+            if last_evaluated:
+                updates.append("last_evaluated = ?")
+                params.append(last_evaluated)
+            if not updates:
+                return
+            params.append(version_id)
+            cursor.execute(f"UPDATE ModelVersion SET {', '.join(updates)} WHERE version_id = ?", params)
 
     # ========== 新增：TrainingRun表CRUD方法 ==========
     def create_training_run(
@@ -397,26 +1545,27 @@ class GameDatabase:
         status: str = "running"
     ):
         """新增训练任务记录"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO TrainingRun (run_id, model_type, dataset_id, hyper_params, start_time, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            run_id,
-            model_type,
-            dataset_id,
-            hyper_params,
-            start_time or datetime.now().isoformat(),
-            status
-        ))
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO TrainingRun (run_id, model_type, dataset_id, hyper_params, start_time, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                run_id,
+                model_type,
+                dataset_id,
+                hyper_params,
+                start_time or datetime.now().isoformat(),
+                status
+            ))
 
     def get_training_run(self, run_id: str) -> Optional[Dict[str, Any]]:
         """查询单个训练任务"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM TrainingRun WHERE run_id = ?", (run_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM TrainingRun WHERE run_id = ?", (run_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def update_training_run(
         self,
@@ -427,26 +1576,32 @@ class GameDatabase:
         model_version_id: Optional[str] = None
     ):
         """更新训练任务状态/进度/关联模型"""
-        cursor = self.conn.cursor()
-        updates = []
-        params = []
-        if status:
-            updates.append("status = ?")
-            params.append(status)
-        if end_time:
-            updates.append("end_time = ?")
-            params.append(end_time)
-        if progress is not None:
-            updates.append("progress = ?")
-            params.append(progress)
-        if model_version_id:
-            updates.append("model_version_id = ?")
-            params.append(model_version_id)
-        if not updates:
-            return
-        params.append(run_id)
-        cursor.execute(f"UPDATE TrainingRun SET {', '.join(updates)} WHERE run_id = ?", params)
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.cursor()
+            updates = []
+            params = []
+            if status:
+                updates.append("status = ?")
+                params.append(status)
+            if end_time:
+                updates.append("end_time = ?")
+                params.append(end_time)
+            if progress is not None:
+                updates.append("progress = ?")
+                params.append(progress)
+            if model_version_id:
+                updates.append("model_version_id = ?")
+                params.append(model_version_id)
+            if not updates:
+                return
+            params.append(run_id)
+            cursor.execute(f"UPDATE TrainingRun SET {', '.join(updates)} WHERE run_id = ?", params)
 
     def close(self):
-        self.conn.close()
+        self.router.close()
+        if self._readers is not None:
+            self._readers.close()
+        with self._write_lock:
+            if self._write_seq > self._committed_seq:
+                self._commit_pending()
+            self.conn.close()
@@ -0,0 +1,94 @@
+"""
+定长证据环形缓冲
+
+每个玩家在内存中只保留最近 capacity 条证据，更早的证据被覆盖；它们已在写入引擎前
+记入 SuspicionEvidence 表，需要时按 id 从数据库分页读取（GameDatabase.get_suspicion_evidence）。
+证据类型用 sys.intern 驻留，同类证据共享同一个字符串对象。
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class EvidenceRecord:
+    __slots__ = ("score", "type", "description", "id")
+
+    def __init__(self, score: float, evidence_type: str, description: str = "", evidence_id: Optional[int] = None):
+        self.score = score
+        self.type = sys.intern(evidence_type)
+        self.description = description
+        self.id = evidence_id
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {"score": self.score, "type": self.type, "description": self.description}
+        if self.id is not None:
+            record["id"] = self.id
+        return record
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "EvidenceRecord":
+        return cls(record["score"], record.get("type") or "general", record.get("description") or "", record.get("id"))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, EvidenceRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"EvidenceRecord({self.to_dict()!r})"
+
+
+class EvidenceBuffer:
+    """按时间顺序迭代（最旧在前）；len() 为内存中保留的条数，total 为累计条数"""
+
+    __slots__ = ("capacity", "total", "_items", "_start", "_size")
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = max(1, capacity)
+        self.total = 0
+        self._items: List[Optional[EvidenceRecord]] = [None] * self.capacity
+        self._start = 0
+        self._size = 0
+
+    def append(self, record: EvidenceRecord):
+        end = (self._start + self._size) % self.capacity
+        self._items[end] = record
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+        self.total += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[EvidenceRecord]:
+        for offset in range(self._size):
+            yield self._items[(self._start + offset) % self.capacity]
+
+    def __getitem__(self, index: int) -> EvidenceRecord:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("evidence index out of range")
+        return self._items[(self._start + index) % self.capacity]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, EvidenceBuffer) and self.total == other.total and list(self) == list(other)
+
+    @property
+    def oldest_id(self) -> Optional[int]:
+        """内存中最早一条证据的 id，更早的证据从数据库读取"""
+        return self[0].id if self._size else None
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"total": self.total, "items": [record.to_dict() for record in self]}
+
+    @classmethod
+    def from_state(cls, state: Any, capacity: int) -> "EvidenceBuffer":
+        """兼容旧检查点中的列表格式"""
+        buffer = cls(capacity)
+        items = state.get("items", []) if isinstance(state, dict) else state
+        for item in items:
+            buffer.append(EvidenceRecord.from_dict(item))
+        if isinstance(state, dict):
+            buffer.total = max(buffer.total, state.get("total", 0))
+        return buffer
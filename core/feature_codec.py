@@ -0,0 +1,61 @@
+"""
+训练特征编码
+
+TrainingData.features 原本一律以 JSON 文本存储，读取时每行都要 json.loads，
+数值向量的体积也是原生大小的数倍。这里定义带版本号的编码：
+
+- json：任意结构的特征（临时/非数值特征的兜底方案）
+- f32v1：固定 schema 的纯数值特征，按特征名排序后打包为小端 float32 BLOB，
+  特征名列表单独保存在 FeatureSchema 表中
+"""
+
+import json
+from numbers import Real
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+FEATURE_ENCODING_JSON = "json"
+FEATURE_ENCODING_F32 = "f32v1"
+
+FEATURE_DTYPE = np.dtype("<f4")
+
+# 配置中的可读名称 -> 存储编码
+_ENCODING_ALIASES = {
+    "json": FEATURE_ENCODING_JSON,
+    "float32": FEATURE_ENCODING_F32,
+    FEATURE_ENCODING_F32: FEATURE_ENCODING_F32,
+}
+
+
+def resolve_encoding(name: Optional[str]) -> str:
+    if name is None:
+        return FEATURE_ENCODING_JSON
+    try:
+        return _ENCODING_ALIASES[name]
+    except KeyError:
+        raise ValueError(f"Unknown feature encoding: {name}")
+
+
+def is_numeric_features(features: Dict[str, Any]) -> bool:
+    """只有非空、值全部为实数（不含 bool）的扁平字典才能用 float32 打包"""
+    return bool(features) and all(
+        isinstance(v, Real) and not isinstance(v, bool) for v in features.values()
+    )
+
+
+def feature_schema(features: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(sorted(features))
+
+
+def pack_features(features: Dict[str, Any], schema: Sequence[str]) -> bytes:
+    return np.asarray([features[name] for name in schema], dtype=FEATURE_DTYPE).tobytes()
+
+
+def unpack_features(blob: bytes, schema: Sequence[str]) -> Dict[str, float]:
+    values = np.frombuffer(blob, dtype=FEATURE_DTYPE)
+    return dict(zip(schema, values.tolist()))
+
+
+def encode_json(features: Dict[str, Any]) -> str:
+    return json.dumps(features, ensure_ascii=False)
@@ -0,0 +1,210 @@
+"""
+联合后验贝叶斯推理引擎
+
+独立模型把每个玩家的狼人概率分开计算，无法表达"恰好 k 名狼人"的约束，
+也无法利用预言家查验这类硬事实。本引擎枚举所有玩家中恰好 k 人为狼的组合，
+每个组合用一个位掩码表示（第 i 位为 1 表示第 i 名玩家是狼），权重以对数形式保存在数组中：
+
+    log w(S) += log L(wolf)      若证据针对的玩家在 S 中
+    log w(S) += log L(villager)  否则
+
+后者对所有组合相同，归一化后抵消，所以一批证据只需先按玩家累加对数似然比，
+再做一次 (组合数 x 玩家数) 的矩阵乘法。玩家的边缘概率 = 包含该玩家的组合的权重之和，
+在下次更新前缓存。硬事实把不一致组合的权重置为 -inf；其余组合的对数权重
+不低于最大值减 max_log_odds，证据再多也不会把某个组合的概率压成 0。
+
+出局但未翻牌的玩家仍可能是狼，因此保留在组合中；翻牌身份通过 observe_role 作为硬事实加入。
+5-12 人局组合数不超过几百，更新与求边缘概率都是微秒级；组合数超过
+inference.joint.max_subsets 时交给 inference.joint.fallback 指定的引擎
+（sampling：MCMC 近似同一联合后验；vectorized：逐玩家独立模型）。
+"""
+
+from itertools import combinations
+from math import comb
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from core.bayesian_inference import RosterInference, _combine_pairs
+from core.sampling_inference import SamplingBayesianInference
+from core.vectorized_inference import VectorizedBayesianInference
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("joint_inference")
+
+# 位掩码使用 int64
+_MAX_PLAYERS = 62
+
+# inference.joint.fallback 配置 -> 组合数超限的对局以及名单外玩家使用的引擎
+FALLBACK_ENGINES = {
+    "sampling": SamplingBayesianInference,
+    "vectorized": VectorizedBayesianInference,
+}
+
+
+def subset_masks(n: int, k: int) -> np.ndarray:
+    """n 名玩家中恰好 k 人为狼的所有组合，按字典序给出位掩码"""
+    return np.fromiter(
+        (sum(1 << i for i in subset) for subset in combinations(range(n), k)),
+        dtype=np.int64,
+        count=comb(n, k)
+    )
+
+
+class JointBayesianInference(RosterInference):
+    """在所有 k 人狼组合上维护联合后验，接口与 BayesianInference 相同
+
+    不在 initialize_priors 名单中的玩家以及组合数超限的对局交给后备引擎处理，后备引擎按需创建。
+    """
+
+    def __init__(self, max_subsets: Optional[int] = None, fallback: Optional[str] = None):
+        self.max_subsets = max_subsets if max_subsets is not None else int(
+            get_config("inference.joint.max_subsets", 50000)
+        )
+        fallback = fallback or get_config("inference.joint.fallback", "sampling")
+        if fallback not in FALLBACK_ENGINES:
+            raise ValueError(f"Unknown joint fallback engine: {fallback}")
+        self._clear_joint()
+        super().__init__(FALLBACK_ENGINES[fallback])
+
+    # ========== 存储 ==========
+    def _clear_joint(self):
+        self._players: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.total_wolves = 0
+        self._masks = np.zeros(0, dtype=np.int64)
+        self._member = np.zeros((0, 0), dtype=np.float64)
+        self._log_w = np.zeros(0, dtype=np.float64)
+        self._marginals: Optional[np.ndarray] = None
+
+    def _build(self, player_ids: List[str], total_wolves: int):
+        self._players = list(player_ids)
+        self._index = {player_id: slot for slot, player_id in enumerate(self._players)}
+        self.total_wolves = total_wolves
+        self._masks = subset_masks(len(self._players), total_wolves)
+        # 组合 x 玩家的 0/1 矩阵，由位掩码展开，用于批量乘似然与求边缘概率
+        self._member = ((self._masks[:, None] >> np.arange(len(self._players))) & 1).astype(np.float64)
+        self._log_w = np.zeros(len(self._masks), dtype=np.float64)
+        self._marginals = None
+
+    def _normalize(self):
+        # 最大权重归一为 0，其余有限权重不低于 -max_log_odds，任何组合都不会下溢为 0
+        self._log_w -= self._log_w.max()
+        np.maximum(self._log_w, -self.max_log_odds, out=self._log_w, where=np.isfinite(self._log_w))
+        self._marginals = None
+
+    def _joint_marginals(self) -> np.ndarray:
+        if self._marginals is None:
+            weights = np.exp(self._log_w)
+            self._marginals = (weights @ self._member) / weights.sum()
+        return self._marginals
+
+    @property
+    def prior_probabilities(self) -> Dict[str, float]:
+        probabilities = self._outside_suspicions()
+        probabilities.update(zip(self._players, self._joint_marginals().tolist()))
+        return probabilities
+
+    @prior_probabilities.setter
+    def prior_probabilities(self, priors: Dict[str, float]):
+        self._clear_joint()
+        self._set_outside_priors(priors)
+
+    # ========== 推理 ==========
+    def initialize_priors(self, player_ids: List[str], total_wolves: int = 2):
+        if not 0 < total_wolves <= len(player_ids):
+            raise ValueError(f"total_wolves must be between 1 and {len(player_ids)}")
+        self._set_outside_priors({})
+        subsets = comb(len(player_ids), total_wolves)
+        if len(player_ids) > _MAX_PLAYERS or subsets > self.max_subsets:
+            logger.info(
+                f"{subsets} wolf assignments exceed inference.joint.max_subsets={self.max_subsets}; "
+                f"using {type(self._fallback).__name__}"
+            )
+            self._clear_joint()
+            self._fallback.initialize_priors(player_ids, total_wolves)
+            return
+        self._build(player_ids, total_wolves)
+        for player_id in player_ids:
+            self._reset_evidence(player_id)
+        logger.info(f"Initialized joint priors for {len(player_ids)} players over {subsets} wolf assignments")
+
+    def _add_roster(self, evidence: List[Dict[str, Any]]):
+        """一次矩阵乘法把一批证据乘到所有组合上"""
+        slots = np.fromiter((self._index[item["player_id"]] for item in evidence), dtype=np.intp, count=len(evidence))
+        llr = np.zeros(len(self._players), dtype=np.float64)
+        np.add.at(llr, slots, self._log_likelihood_ratios(evidence))
+        self._log_w += self._member @ llr
+        self._normalize()
+        logger.debug(f"Applied {len(evidence)} evidence items to {len(self._masks)} wolf assignments")
+
+    def _consistent(self, slot: int, is_wolf: bool) -> np.ndarray:
+        return self._member[:, slot] == (1.0 if is_wolf else 0.0)
+
+    def _roster_role_possible(self, slot: int, is_wolf: bool) -> bool:
+        return bool(np.isfinite(self._log_w[self._consistent(slot, is_wolf)]).any())
+
+    def _set_roster_role(self, slot: int, is_wolf: bool):
+        self._log_w[~self._consistent(slot, is_wolf)] = -np.inf
+        self._normalize()
+
+    def _roster_suspicion(self, slot: int) -> float:
+        return float(self._joint_marginals()[slot])
+
+    def diagnostics(self) -> Dict[str, Any]:
+        if self._players or self._fallback_engine is None:
+            return {}
+        return self._fallback_engine.diagnostics()
+
+    def pair_marginals(self) -> Tuple[List[str], np.ndarray]:
+        # 名单内为精确的联合概率 Σ w(S)·[i∈S]·[j∈S]，名单外玩家视为独立
+        outside_players, outside = self._outside_pairs()
+        if not self._players:
+            return outside_players, outside
+        weights = np.exp(self._log_w)
+        weights /= weights.sum()
+        pairs = self._member.T @ (weights[:, None] * self._member)
+        return _combine_pairs(list(self._players), pairs, outside_players, outside)
+
+    def wolf_team_probability(self, player_ids: Iterable[str]) -> float:
+        """给定玩家全部为狼的联合概率（独立模型无法给出）"""
+        mask = 0
+        for player_id in player_ids:
+            if player_id not in self._index:
+                raise ValueError(f"Player {player_id} is not part of the joint model")
+            mask |= 1 << self._index[player_id]
+        weights = np.exp(self._log_w)
+        return float(weights[(self._masks & mask) == mask].sum() / weights.sum())
+
+    # ========== 状态 ==========
+    def to_state(self) -> Dict:
+        state = super().to_state()
+        fallback = self._outside_state()
+        if fallback is not None:
+            state["fallback"] = fallback
+        if self._players:
+            # 组合由玩家顺序与狼数确定，只需保存对数权重
+            state["joint"] = {
+                "players": list(self._players),
+                "wolves": self.total_wolves,
+                "log_weights": self._log_w.tolist()
+            }
+        return state
+
+    def load_state(self, state: Dict):
+        self._load_evidence(state)
+        joint = state.get("joint")
+        fallback = state.get("fallback")
+        if fallback is None and not joint:
+            # 其它引擎保存的检查点没有 joint 部分，整体交给后备引擎
+            fallback = state if state.get("priors") else None
+        self._load_outside(fallback)
+        self._clear_joint()
+        if joint:
+            self._build(joint["players"], joint["wolves"])
+            self._log_w = np.asarray(joint["log_weights"], dtype=np.float64)
+
+    def reset(self):
+        self._clear_joint()
+        self._set_outside_priors({})
+        self.evidence_history.clear()
+        logger.info("Bayesian inference model reset")
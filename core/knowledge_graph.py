@@ -1,22 +1,80 @@
-from typing import Dict, List, Set, Optional, Tuple
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Hashable, List, Set, Optional, Tuple
 from collections import defaultdict
+from core.community import SignedCommunities
+from core.graph_analytics import CENTRALITY_METRICS, CSRMatrix, centrality_scores
+from modules.YA_Common.utils.config import get_config
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("knowledge_graph")
 
 
 class KnowledgeGraph:
-    def __init__(self):
+    """玩家关系图
+
+    edges 以 (source, target) 为键；outgoing / incoming 是同一批边数据的邻接索引
+    （玩家 -> 邻居 -> 边数据），由 _insert_edge 维护，按玩家查询只需 O(度数)。
+    每条边另记 type_weights / type_counts（关系类型 -> 权重和 / 条数），统计支持/攻击比例时不必遍历每条关系。
+
+    version 在图每次变化时递增；模式检测（狼人对、串通分数、攻击/支持网络）的结果按 version 缓存，
+    两次事件之间重复查询直接返回缓存对象，调用方不应修改返回值。
+
+    to_csr 按关系类型导出 CSR 稀疏矩阵，centrality_scores / rank_players 在其上一次算出
+    所有玩家的 PageRank、特征向量与带符号影响力中心性（见 core.graph_analytics），同样按 version 缓存。
+
+    communities 在 support/attack 带符号图上增量维护社区划分（见 core.community），每次加边只从端点做局部移动，
+    candidate_teams 由此给出候选狼队。
+
+    时间维度：关系按 metadata 中的 round 建立轮次索引（没有 round 的记为第 0 轮），
+    relations_in_window 只访问窗口内的轮次；每条边另记 decay_sums（关系类型 -> Σ w·2^((round - 基准轮) / 半衰期)），
+    基准轮取已出现的最大轮次（指数不为正，不会溢出），基准轮前移时把所有和乘以同一系数重新归一。
+    decayed_weights 在查询时乘以 2^(-(当前轮 - 基准轮) / 半衰期) 即得指数衰减后的权重，不需要逐条重算；
+    snapshot(round_num) 返回只含该轮及之前关系的图，历史不会被丢弃。
+    """
+
+    def __init__(self, half_life: Optional[float] = None):
         self.nodes: Set[str] = set()
         self.edges: Dict[Tuple[str, str], Dict] = {}
+        self.outgoing: Dict[str, Dict[str, Dict]] = {}
+        self.incoming: Dict[str, Dict[str, Dict]] = {}
         self.node_attributes: Dict[str, Dict] = {}
+        self.communities = SignedCommunities()
+        # 轮次 -> 该轮的 (source, target, relation)，round_keys 为已出现的轮次（升序）
+        self.rounds: Dict[int, List[Tuple[str, str, Dict]]] = {}
+        self.round_keys: List[int] = []
+        self.half_life = float(
+            half_life if half_life is not None else get_config("knowledge_graph.temporal.half_life_rounds", 2)
+        )
+        if self.half_life <= 0:
+            raise ValueError(f"half_life_rounds must be positive, got {self.half_life}")
+        self.decay_anchor = 0
+        self.version = 0
+        self._cache: Dict[Hashable, Tuple[int, Any]] = {}
+    
+    def _cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == self.version:
+            return entry[1]
+        result = compute()
+        self._cache[key] = (self.version, result)
+        return result
+    
+    def _changed(self):
+        self.version += 1
+        self._cache.clear()
     
     def add_node(self, player_id: str, attributes: Optional[Dict] = None):
         self.nodes.add(player_id)
         if attributes:
             self.node_attributes[player_id] = attributes
+        self._changed()
         logger.debug(f"Added node: {player_id}")
     
+    def add_nodes(self, player_ids: List[str]):
+        if not self.nodes.issuperset(player_ids):
+            self.nodes.update(player_ids)
+            self._changed()
+    
     def add_edge(
         self,
         source: str,
@@ -25,51 +83,103 @@ class KnowledgeGraph:
         weight: float = 1.0,
         metadata: Optional[Dict] = None
     ):
-        if source not in self.nodes:
-            self.add_node(source)
-        if target not in self.nodes:
-            self.add_node(target)
+        if self._insert_edge(source, target, relation_type, weight, metadata):
+            self.communities.refine([source, target])
+        logger.debug(f"Added edge: {source} -> {target} ({relation_type})")
+    
+    def add_edges(self, edges: List[Dict]):
+        touched = []
+        for edge in edges:
+            if self._insert_edge(
+                edge["source"],
+                edge["target"],
+                edge["relation_type"],
+                edge.get("weight", 1.0),
+                edge.get("metadata")
+            ):
+                touched.extend((edge["source"], edge["target"]))
+        # 整批加完后再做一次局部移动
+        self.communities.refine(touched)
+        logger.debug(f"Added {len(edges)} edges")
+    
+    def _insert_edge(
+        self,
+        source: str,
+        target: str,
+        relation_type: str,
+        weight: float,
+        metadata: Optional[Dict]
+    ) -> bool:
+        """添加一条关系并维护派生统计，返回社区划分是否需要从两个端点重新调整"""
+        self.nodes.add(source)
+        self.nodes.add(target)
         
         edge_key = (source, target)
-        if edge_key not in self.edges:
-            self.edges[edge_key] = {
+        edge_data = self.edges.get(edge_key)
+        if edge_data is None:
+            edge_data = self.edges[edge_key] = {
                 "relations": [],
-                "total_weight": 0.0
+                "total_weight": 0.0,
+                "type_weights": {},
+                "type_counts": {},
+                "decay_sums": {}
             }
+            self.outgoing.setdefault(source, {})[target] = edge_data
+            self.incoming.setdefault(target, {})[source] = edge_data
         
         relation = {
             "type": relation_type,
             "weight": weight,
             "metadata": metadata or {}
         }
-        self.edges[edge_key]["relations"].append(relation)
-        self.edges[edge_key]["total_weight"] += weight
-        
-        logger.debug(f"Added edge: {source} -> {target} ({relation_type})")
+        edge_data["relations"].append(relation)
+        edge_data["total_weight"] += weight
+        edge_data["type_weights"][relation_type] = edge_data["type_weights"].get(relation_type, 0.0) + weight
+        edge_data["type_counts"][relation_type] = edge_data["type_counts"].get(relation_type, 0) + 1
+        round_num = int(relation["metadata"].get("round") or 0)
+        if round_num > self.decay_anchor:
+            self._move_decay_anchor(round_num)
+        edge_data["decay_sums"][relation_type] = (
+            edge_data["decay_sums"].get(relation_type, 0.0)
+            + weight * 2.0 ** ((round_num - self.decay_anchor) / self.half_life)
+        )
+        if round_num not in self.rounds:
+            self.rounds[round_num] = []
+            insort(self.round_keys, round_num)
+        self.rounds[round_num].append((source, target, relation))
+        self._changed()
+        return self.communities.add_relation(source, target, relation_type, weight)
+    
+    def _move_decay_anchor(self, round_num: int):
+        # 新基准轮更大，系数 <= 1，只会下溢为 0 而不会溢出
+        factor = 2.0 ** (-(round_num - self.decay_anchor) / self.half_life)
+        for edge_data in self.edges.values():
+            sums = edge_data["decay_sums"]
+            for relation_type in sums:
+                sums[relation_type] *= factor
+        self.decay_anchor = round_num
     
     def get_player_relations(self, player_id: str) -> Dict[str, List[Dict]]:
-        relations = defaultdict(list)
+        relations = {}
         
-        for (source, target), edge_data in self.edges.items():
-            if source == player_id:
-                relations["outgoing"].extend(edge_data["relations"])
-            if target == player_id:
-                relations["incoming"].extend(edge_data["relations"])
+        for direction, index in (("outgoing", self.outgoing), ("incoming", self.incoming)):
+            neighbors = index.get(player_id)
+            if neighbors:
+                relations[direction] = [
+                    relation for edge_data in neighbors.values() for relation in edge_data["relations"]
+                ]
         
-        return dict(relations)
+        return relations
     
     def detect_wolf_pair(self, threshold: float = 0.7) -> List[Tuple[str, str]]:
+        return self._cached(("wolf_pair", threshold), lambda: self._detect_wolf_pair(threshold))
+    
+    def _detect_wolf_pair(self, threshold: float) -> List[Tuple[str, str]]:
         suspicious_pairs = []
         
         for (source, target), edge_data in self.edges.items():
-            support_count = 0
-            attack_count = 0
-            
-            for relation in edge_data["relations"]:
-                if relation["type"] == "support":
-                    support_count += relation["weight"]
-                elif relation["type"] == "attack":
-                    attack_count += relation["weight"]
+            support_count = edge_data["type_weights"].get("support", 0)
+            attack_count = edge_data["type_weights"].get("attack", 0)
             
             if support_count > 0 and attack_count == 0:
                 support_ratio = support_count / edge_data["total_weight"]
@@ -80,16 +190,19 @@ class KnowledgeGraph:
         return suspicious_pairs
     
     def detect_collusion(self, player_ids: List[str]) -> Dict[str, float]:
+        player_ids = tuple(player_ids)
+        return self._cached(("collusion", player_ids), lambda: self._detect_collusion(player_ids))
+    
+    def _detect_collusion(self, player_ids: Tuple[str, ...]) -> Dict[str, float]:
         collusion_scores = {}
         
         for player_id in player_ids:
-            relations = self.get_player_relations(player_id)
-            outgoing = relations.get("outgoing", [])
+            outgoing = self.outgoing.get(player_id, {}).values()
             
             support_weight = sum(
-                r["weight"] for r in outgoing if r["type"] == "support"
+                edge_data["type_weights"].get("support", 0.0) for edge_data in outgoing
             )
-            total_weight = sum(r["weight"] for r in outgoing)
+            total_weight = sum(edge_data["total_weight"] for edge_data in outgoing)
             
             if total_weight > 0:
                 collusion_score = support_weight / total_weight
@@ -98,32 +211,25 @@ class KnowledgeGraph:
         return collusion_scores
     
     def get_attack_network(self) -> Dict[str, List[str]]:
-        attack_network = defaultdict(list)
-        
-        for (source, target), edge_data in self.edges.items():
-            for relation in edge_data["relations"]:
-                if relation["type"] == "attack":
-                    attack_network[source].append(target)
-        
-        return dict(attack_network)
+        return self._cached(("network", "attack"), lambda: self._relation_network("attack"))
     
     def get_support_network(self) -> Dict[str, List[str]]:
-        support_network = defaultdict(list)
+        return self._cached(("network", "support"), lambda: self._relation_network("support"))
+    
+    def _relation_network(self, relation_type: str) -> Dict[str, List[str]]:
+        # 每条该类型的关系对应一次目标（与逐条遍历关系的结果相同）
+        network = defaultdict(list)
         
         for (source, target), edge_data in self.edges.items():
-            for relation in edge_data["relations"]:
-                if relation["type"] == "support":
-                    support_network[source].append(target)
+            count = edge_data["type_counts"].get(relation_type, 0)
+            if count:
+                network[source].extend([target] * count)
         
-        return dict(support_network)
+        return dict(network)
     
     def calculate_centrality(self, player_id: str) -> float:
-        incoming_count = sum(
-            1 for (_, target) in self.edges.keys() if target == player_id
-        )
-        outgoing_count = sum(
-            1 for (source, _) in self.edges.keys() if source == player_id
-        )
+        incoming_count = len(self.incoming.get(player_id, {}))
+        outgoing_count = len(self.outgoing.get(player_id, {}))
         
         total_edges = len(self.edges)
         if total_edges == 0:
@@ -132,8 +238,177 @@ class KnowledgeGraph:
         centrality = (incoming_count + outgoing_count) / total_edges
         return centrality
     
+    def candidate_teams(self, team_size: int, top_k: Optional[int] = None) -> List[Dict]:
+        """由当前社区划分给出 team_size 人的候选狼队，按凝聚度排序"""
+        return self._cached(("teams", team_size, top_k), lambda: self.communities.candidate_teams(team_size, top_k))
+    
+    @property
+    def latest_round(self) -> int:
+        return self.round_keys[-1] if self.round_keys else 0
+    
+    def _rounds_between(self, start_round: Optional[int], end_round: Optional[int]) -> List[int]:
+        lo = 0 if start_round is None else bisect_left(self.round_keys, start_round)
+        hi = len(self.round_keys) if end_round is None else bisect_right(self.round_keys, end_round)
+        return self.round_keys[lo:hi]
+    
+    def relations_in_window(
+        self,
+        start_round: Optional[int] = None,
+        end_round: Optional[int] = None,
+        player_id: Optional[str] = None,
+        relation_type: Optional[str] = None
+    ) -> List[Dict]:
+        """返回 [start_round, end_round] 内的关系（含 source/target/round），只遍历窗口内的轮次"""
+        relations = []
+        for round_num in self._rounds_between(start_round, end_round):
+            for source, target, relation in self.rounds[round_num]:
+                if player_id is not None and player_id not in (source, target):
+                    continue
+                if relation_type is not None and relation["type"] != relation_type:
+                    continue
+                relations.append({"source": source, "target": target, "round": round_num, **relation})
+        return relations
+    
+    def decayed_weights(
+        self,
+        current_round: Optional[int] = None,
+        relation_type: Optional[str] = None,
+        player_id: Optional[str] = None
+    ) -> Dict[Tuple[str, str], float]:
+        """按半衰期指数衰减后的边权重：第 r 轮的关系在 current_round 时权重乘以 2^(-(current_round - r) / 半衰期)
+
+        current_round 早于基准轮时不计之后各轮的关系，按轮次索引逐条计算。
+        """
+        if current_round is None:
+            current_round = self.decay_anchor
+        if current_round < self.decay_anchor:
+            return self._decayed_weights_until(current_round, relation_type, player_id)
+        scale = 2.0 ** (-(current_round - self.decay_anchor) / self.half_life)
+        if player_id is None:
+            edges = self.edges.items()
+        else:
+            edges = [((player_id, target), edge_data) for target, edge_data in self.outgoing.get(player_id, {}).items()]
+            edges += [
+                ((source, player_id), edge_data) for source, edge_data in self.incoming.get(player_id, {}).items()
+                if source != player_id
+            ]
+        weights = {}
+        for edge_key, edge_data in edges:
+            sums = edge_data["decay_sums"]
+            total = sums.get(relation_type, 0.0) if relation_type is not None else sum(sums.values())
+            if total:
+                weights[edge_key] = total * scale
+        return weights
+    
+    def _decayed_weights_until(
+        self,
+        current_round: int,
+        relation_type: Optional[str],
+        player_id: Optional[str]
+    ) -> Dict[Tuple[str, str], float]:
+        weights: Dict[Tuple[str, str], float] = {}
+        for relation in self.relations_in_window(end_round=current_round, player_id=player_id, relation_type=relation_type):
+            edge_key = (relation["source"], relation["target"])
+            decayed = relation["weight"] * 2.0 ** (-(current_round - relation["round"]) / self.half_life)
+            weights[edge_key] = weights.get(edge_key, 0.0) + decayed
+        return {edge_key: weight for edge_key, weight in weights.items() if weight}
+    
+    def snapshot(self, round_num: int) -> "KnowledgeGraph":
+        """只包含第 round_num 轮及之前关系的图（按 version 缓存，调用方不应修改）"""
+        return self._cached(("snapshot", round_num), lambda: self._build_snapshot(round_num))
+    
+    def _build_snapshot(self, round_num: int) -> "KnowledgeGraph":
+        graph = KnowledgeGraph(half_life=self.half_life)
+        graph.add_nodes(sorted(self.nodes))
+        graph.node_attributes.update(self.node_attributes)
+        graph.add_edges([
+            {
+                "source": source,
+                "target": target,
+                "relation_type": relation["type"],
+                "weight": relation["weight"],
+                "metadata": relation["metadata"]
+            }
+            for key in self._rounds_between(None, round_num)
+            for source, target, relation in self.rounds[key]
+        ])
+        return graph
+    
+    def to_csr(self) -> Tuple[List[str], Dict[str, CSRMatrix]]:
+        """按关系类型导出 CSR 矩阵（"all" 为总权重），行列顺序为返回的玩家列表"""
+        return self._cached("csr", self._build_csr)
+    
+    def _build_csr(self) -> Tuple[List[str], Dict[str, CSRMatrix]]:
+        players = sorted(self.nodes)
+        position = {player_id: i for i, player_id in enumerate(players)}
+        entries: Dict[str, Tuple[List[int], List[int], List[float]]] = defaultdict(lambda: ([], [], []))
+        
+        for (source, target), edge_data in self.edges.items():
+            row, col = position[source], position[target]
+            for relation_type, weight in (("all", edge_data["total_weight"]), *edge_data["type_weights"].items()):
+                rows, cols, values = entries[relation_type]
+                rows.append(row)
+                cols.append(col)
+                values.append(weight)
+        
+        matrices = {
+            relation_type: CSRMatrix.from_coo(rows, cols, values, len(players))
+            for relation_type, (rows, cols, values) in entries.items()
+        }
+        matrices.setdefault("all", CSRMatrix.from_coo([], [], [], len(players)))
+        return players, matrices
+    
+    def centrality_scores(self) -> Dict[str, Dict[str, float]]:
+        """所有玩家的 pagerank / eigenvector / influence / degree 中心性"""
+        return self._cached("centrality", lambda: centrality_scores(*self.to_csr()))
+    
+    def rank_players(self, metric: str = "pagerank", top_k: Optional[int] = None) -> List[Dict]:
+        if metric not in CENTRALITY_METRICS:
+            raise ValueError(f"Unknown centrality metric: {metric}")
+        scores = self.centrality_scores()
+        ranking = sorted(scores, key=lambda player_id: (-scores[player_id][metric], player_id))
+        if top_k is not None:
+            ranking = ranking[:top_k]
+        return [{"player_id": player_id, **scores[player_id]} for player_id in ranking]
+    
+    def to_state(self) -> Dict:
+        return {
+            "nodes": sorted(self.nodes),
+            "node_attributes": dict(self.node_attributes),
+            "edges": [
+                [source, target, edge_data["relations"]]
+                for (source, target), edge_data in self.edges.items()
+            ]
+        }
+    
+    def load_state(self, state: Dict):
+        # 通过 _insert_edge 重建，保证派生的统计量与逐条添加时一致
+        self.nodes.clear()
+        self.edges.clear()
+        self.outgoing.clear()
+        self.incoming.clear()
+        self.node_attributes.clear()
+        self._changed()
+        self.nodes.update(state.get("nodes", []))
+        self.node_attributes.update(state.get("node_attributes", {}))
+        self.communities.clear()
+        self.rounds.clear()
+        self.round_keys.clear()
+        self.decay_anchor = 0
+        for source, target, relations in state.get("edges", []):
+            for relation in relations:
+                self._insert_edge(source, target, relation["type"], relation["weight"], relation["metadata"])
+        self.communities.refine(sorted(self.communities.labels))
+    
     def reset(self):
         self.nodes.clear()
         self.edges.clear()
+        self.outgoing.clear()
+        self.incoming.clear()
         self.node_attributes.clear()
+        self.communities.clear()
+        self.rounds.clear()
+        self.round_keys.clear()
+        self.decay_anchor = 0
+        self._changed()
         logger.info("Knowledge graph reset")
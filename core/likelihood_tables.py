@@ -0,0 +1,239 @@
+"""
+按证据类型学习的似然表
+
+默认似然对所有 evidence_type 相同：L(wolf) = 0.5 + 0.5 * s，L(villager) = 0.5 + 0.5 * (1 - s)，
+对数似然比为 log((1 + s) / (2 - s))。离线拟合器从带标签的数据中按类型估计：
+
+- TrainingData：features 中含 evidence_score（可选 evidence_type，缺省为 general），
+  label 属于 wolf_labels 视为狼人，其余视为好人
+- 已结束对局（game_status = 'finished'）：SuspicionEvidence 中的证据，以同局该玩家最后一条
+  role_fact 为标签
+
+分数按 bins 个等宽区间统计狼人/好人的直方图，并以默认线性似然作为 prior_strength 个样本的先验平滑，
+样本少的区间接近默认曲线。每个类型存一行 float32 的对数似然比，推理时按区间下标查表，
+每条证据 O(1)；表中没有的类型仍使用默认曲线。
+"""
+
+import json
+import os
+from itertools import chain
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("likelihood_tables")
+
+TABLE_FORMAT_VERSION = 1
+
+_DEFAULT_WOLF_LABELS = ["wolf", "werewolf"]
+
+
+def linear_log_ratio(scores) -> np.ndarray:
+    """证据分数 -> 默认对数似然比 log((1 + s) / (2 - s))"""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.log1p(scores) - np.log(2.0 - scores)
+
+
+class LikelihoodTables:
+    """evidence_type -> 各分数区间的对数似然比 log(L(wolf) / L(villager))"""
+
+    def __init__(
+        self,
+        bins: int = 20,
+        tables: Optional[Dict[str, Iterable[float]]] = None,
+        samples: Optional[Dict[str, Dict[str, int]]] = None,
+        fitted_at: Optional[str] = None
+    ):
+        self.bins = max(1, int(bins))
+        self._tables: Dict[str, np.ndarray] = {}
+        for evidence_type, log_ratio in (tables or {}).items():
+            table = np.asarray(log_ratio, dtype=np.float32)
+            if table.shape != (self.bins,):
+                raise ValueError(f"Likelihood table for {evidence_type!r} has {table.size} bins, expected {self.bins}")
+            self._tables[evidence_type] = table
+        self.samples = samples or {}
+        self.fitted_at = fitted_at
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def __contains__(self, evidence_type: str) -> bool:
+        return evidence_type in self._tables
+
+    @property
+    def evidence_types(self) -> List[str]:
+        return sorted(self._tables)
+
+    def _bin(self, score: float) -> int:
+        return min(self.bins - 1, max(0, int(score * self.bins)))
+
+    def log_ratio(self, evidence_type: str, score: float) -> float:
+        table = self._tables.get(evidence_type)
+        if table is None:
+            return float(linear_log_ratio(score))
+        return float(table[self._bin(score)])
+
+    def log_ratios(self, evidence_types: List[str], scores) -> np.ndarray:
+        """批量查表；按类型分组，每组一次花式索引"""
+        scores = np.asarray(scores, dtype=np.float64)
+        llr = linear_log_ratio(scores)
+        if not self._tables:
+            return llr
+        types = np.asarray(evidence_types, dtype=object)
+        for evidence_type in self._tables.keys() & set(evidence_types):
+            mask = types == evidence_type
+            slots = np.clip((scores[mask] * self.bins).astype(np.intp), 0, self.bins - 1)
+            llr[mask] = self._tables[evidence_type][slots]
+        return llr
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": TABLE_FORMAT_VERSION,
+            "bins": self.bins,
+            "fitted_at": self.fitted_at,
+            "types": {
+                evidence_type: {
+                    "log_ratio": [round(float(value), 4) for value in table],
+                    **self.samples.get(evidence_type, {})
+                }
+                for evidence_type, table in sorted(self._tables.items())
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LikelihoodTables":
+        if data.get("version", TABLE_FORMAT_VERSION) != TABLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported likelihood table version: {data.get('version')}")
+        types = data.get("types", {})
+        return cls(
+            bins=data.get("bins", 20),
+            tables={evidence_type: entry["log_ratio"] for evidence_type, entry in types.items()},
+            samples={
+                evidence_type: {key: value for key, value in entry.items() if key != "log_ratio"}
+                for evidence_type, entry in types.items()
+            },
+            fitted_at=data.get("fitted_at")
+        )
+
+    def save(self, path: str):
+        # 先写临时文件再替换，加载方不会读到写了一半的文件
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LikelihoodTables":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# ========== 离线拟合 ==========
+def fit_likelihood_tables(
+    samples: Iterable[Tuple[str, float, bool]],
+    bins: Optional[int] = None,
+    prior_strength: Optional[float] = None,
+    min_samples: Optional[int] = None
+) -> LikelihoodTables:
+    """由 (evidence_type, evidence_score, is_wolf) 样本拟合似然表
+
+    样本数不足 min_samples 的类型不生成表，推理时继续使用默认曲线。
+    """
+    config = get_config("inference.likelihood_tables", {}) or {}
+    bins = max(1, int(bins if bins is not None else config.get("bins", 20)))
+    prior_strength = float(prior_strength if prior_strength is not None else config.get("prior_strength", 20))
+    min_samples = int(min_samples if min_samples is not None else config.get("min_samples", 50))
+
+    counts: Dict[str, np.ndarray] = {}
+    for evidence_type, score, is_wolf in samples:
+        if evidence_type not in counts:
+            counts[evidence_type] = np.zeros((2, bins), dtype=np.float64)
+        slot = min(bins - 1, max(0, int(score * bins)))
+        counts[evidence_type][0 if is_wolf else 1, slot] += 1
+
+    # 默认线性似然在各区间中点的概率质量，作为平滑先验
+    centers = (np.arange(bins) + 0.5) / bins
+    prior_wolf = (1.0 + centers) / np.sum(1.0 + centers)
+    prior_good = (2.0 - centers) / np.sum(2.0 - centers)
+
+    tables: Dict[str, np.ndarray] = {}
+    sample_counts: Dict[str, Dict[str, int]] = {}
+    for evidence_type, (wolf, good) in counts.items():
+        total = int(wolf.sum() + good.sum())
+        if total < min_samples:
+            logger.info(f"Skipped likelihood table for {evidence_type}: {total} samples < {min_samples}")
+            continue
+        wolf_density = (wolf + prior_strength * prior_wolf) / (wolf.sum() + prior_strength)
+        good_density = (good + prior_strength * prior_good) / (good.sum() + prior_strength)
+        tables[evidence_type] = np.log(wolf_density) - np.log(good_density)
+        sample_counts[evidence_type] = {"samples": total, "wolf_samples": int(wolf.sum())}
+
+    logger.info(f"Fitted likelihood tables for {len(tables)} evidence types")
+    return LikelihoodTables(bins, tables, sample_counts, datetime.now().isoformat())
+
+
+def training_samples(
+    db,
+    dataset_id: Optional[str] = None,
+    wolf_labels: Optional[Iterable[str]] = None
+) -> Iterator[Tuple[str, float, bool]]:
+    """TrainingData 中带 evidence_score 特征的样本"""
+    if wolf_labels is None:
+        wolf_labels = (get_config("inference.likelihood_tables", {}) or {}).get("wolf_labels", _DEFAULT_WOLF_LABELS)
+    wolf_labels = frozenset(wolf_labels)
+    for row in db.iter_training_data(dataset_id=dataset_id):
+        features = row["features"]
+        if not isinstance(features, dict) or features.get("evidence_score") is None:
+            continue
+        yield (
+            features.get("evidence_type") or "general",
+            float(features["evidence_score"]),
+            row["label"] in wolf_labels
+        )
+
+
+def finished_game_samples(db) -> Iterator[Tuple[str, float, bool]]:
+    """已结束对局中以身份事实为标签的证据"""
+    for row in db.iter_labeled_evidence():
+        yield row["evidence_type"], float(row["evidence_score"]), bool(row["is_wolf"])
+
+
+def fit_from_database(
+    db,
+    dataset_id: Optional[str] = None,
+    include_finished_games: bool = True,
+    **kwargs
+) -> LikelihoodTables:
+    samples = training_samples(db, dataset_id)
+    if include_finished_games:
+        samples = chain(samples, finished_game_samples(db))
+    return fit_likelihood_tables(samples, **kwargs)
+
+
+# ========== 进程级共享表 ==========
+_tables: Optional[LikelihoodTables] = None
+
+
+def get_likelihood_tables() -> LikelihoodTables:
+    """启动时从 inference.likelihood_tables.path 加载一次；文件不存在时为空表（全部使用默认曲线）"""
+    global _tables
+    if _tables is None:
+        path = (get_config("inference.likelihood_tables", {}) or {}).get("path", "data/likelihood_tables.json")
+        _tables = LikelihoodTables()
+        if path and os.path.exists(path):
+            try:
+                _tables = LikelihoodTables.load(path)
+                logger.info(f"Loaded likelihood tables for {len(_tables)} evidence types from {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Failed to load likelihood tables from {path}: {e}")
+    return _tables
+
+
+def set_likelihood_tables(tables: LikelihoodTables):
+    """替换进程级共享表；之后创建的引擎使用新表，已有引擎保留创建时的表"""
+    global _tables
+    _tables = tables
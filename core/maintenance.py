@@ -0,0 +1,159 @@
+"""
+数据库后台维护任务
+
+在服务进程内按固定间隔运行：
+- 已结束且超过保留期的对局：历史与证据归档到月度文件（archive）或整体删除（delete），
+  并移出会话注册表
+- 各表按保留期清理：未归属对局的 GameHistory、长期未更新的 PlayerProfile、已结束的 TrainingRun
+- 增量 VACUUM 回收空闲页，最后执行 PRAGMA optimize
+
+所有删除都分块进行，每块一个短事务，块之间暂停 chunk_pause_ms，保证在线写入不会被长时间阻塞。
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from core.database import GameDatabase
+from core.session import SessionRegistry
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("maintenance")
+
+FINISHED_GAME_ACTIONS = ("archive", "delete")
+
+# 表 -> (时间列, 额外条件)；保留期在 database.maintenance.retention_days 中按表配置，
+# 已结束对局的保留期使用 finished_games 键
+_RETENTION_RULES = {
+    "GameHistory": ("timestamp", "game_id IS NULL"),
+    "PlayerProfile": ("updated_at", "1=1"),
+    "TrainingRun": ("end_time", "status IN ('finished', 'stopped', 'failed')"),
+}
+
+
+class MaintenanceJob:
+    """周期性的保留期清理与压缩任务"""
+
+    def __init__(
+        self,
+        db: GameDatabase,
+        interval_seconds: Optional[float] = None,
+        finished_game_action: Optional[str] = None,
+        retention_days: Optional[Dict[str, float]] = None,
+        chunk_size: Optional[int] = None,
+        chunk_pause_ms: Optional[float] = None,
+        vacuum_pages: Optional[int] = None,
+        registry: Optional[SessionRegistry] = None
+    ):
+        self.db = db
+        self.registry = registry
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(
+            get_config("database.maintenance.interval_seconds", 3600)
+        )
+        self.finished_game_action = finished_game_action or get_config(
+            "database.maintenance.finished_game_action", "archive"
+        )
+        if self.finished_game_action not in FINISHED_GAME_ACTIONS:
+            raise ValueError(f"Unknown finished_game_action: {self.finished_game_action}")
+        self.retention_days: Dict[str, float] = dict(
+            retention_days if retention_days is not None
+            else get_config("database.maintenance.retention_days", {}) or {}
+        )
+        self.chunk_size = chunk_size if chunk_size is not None else int(
+            get_config("database.maintenance.chunk_size", 200)
+        )
+        self.chunk_pause = (chunk_pause_ms if chunk_pause_ms is not None else float(
+            get_config("database.maintenance.chunk_pause_ms", 5)
+        )) / 1000
+        self.vacuum_pages = vacuum_pages if vacuum_pages is not None else int(
+            get_config("database.maintenance.vacuum_pages", 256)
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._warned_auto_vacuum = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(f"Database maintenance scheduled every {self.interval_seconds:.0f}s")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Database maintenance failed: {e}")
+
+    def _cutoff(self, table: str) -> Optional[str]:
+        days = self.retention_days.get(table)
+        if days is None or days <= 0:
+            return None
+        return (datetime.now() - timedelta(days=days)).isoformat()
+
+    def run_once(self) -> Dict[str, Any]:
+        """执行一轮维护，返回各步骤的统计"""
+        start = time.perf_counter()
+        stats: Dict[str, Any] = {"games": 0, "purged": {}, "vacuumed_pages": 0}
+
+        cutoff = self._cutoff("finished_games")
+        if cutoff:
+            while not self._stop.is_set():
+                game_ids = self.db.get_expired_games(cutoff, limit=self.chunk_size)
+                for game_id in game_ids:
+                    # 处理前移出注册表，期间会话不会被淘汰并保存检查点；处理后再移出一次，
+                    # 丢弃期间被重新加载的会话，内存中不再保留已归档/删除的对局
+                    self._drop_session(game_id)
+                    if self.finished_game_action == "archive":
+                        self.db.archive_game(game_id, chunk_size=self.chunk_size, pause_seconds=self.chunk_pause)
+                    else:
+                        self.db.delete_game(game_id, self.chunk_size, self.chunk_pause)
+                    self._drop_session(game_id)
+                    stats["games"] += 1
+                    time.sleep(self.chunk_pause)
+                if len(game_ids) < self.chunk_size:
+                    break
+
+        for table, (column, condition) in _RETENTION_RULES.items():
+            cutoff = self._cutoff(table)
+            if cutoff:
+                stats["purged"][table] = self.db.purge_rows(
+                    table,
+                    f"{condition} AND {column} < ?",
+                    [cutoff],
+                    self.chunk_size,
+                    self.chunk_pause
+                )
+
+        stats["vacuumed_pages"] = self._vacuum()
+        self.db.optimize()
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Database maintenance done: {stats}")
+        return stats
+
+    def _drop_session(self, game_id: str):
+        if self.registry is not None:
+            self.registry.drop(game_id)
+
+    def _vacuum(self) -> int:
+        """分步增量 VACUUM，每步最多 vacuum_pages 页"""
+        total = 0
+        while not self._stop.is_set() and self.db.freelist_pages() > 0:
+            freed = self.db.incremental_vacuum(self.vacuum_pages)
+            if freed <= 0:
+                if not self._warned_auto_vacuum:
+                    logger.warning("auto_vacuum is not INCREMENTAL for this database; run VACUUM offline once to enable it")
+                    self._warned_auto_vacuum = True
+                break
+            total += freed
+            time.sleep(self.chunk_pause)
+        return total
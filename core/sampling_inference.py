@@ -0,0 +1,347 @@
+"""
+基于采样的贝叶斯推理引擎（大房间）
+
+精确枚举的组合数随人数指数增长，15 人以上且多名狼人时不再可行。本引擎只保存
+每个玩家的累计对数似然比与已确定的身份（硬事实），需要后验时用 Metropolis
+交换链在"恰好 k 名狼人"的分配上采样：
+
+    π(S) ∝ exp(Σ_{i∈S} llr_i)，S 满足所有硬事实
+
+每步在一条链中随机交换一名狼人与一名好人，按 min(1, exp(llr_好人 - llr_狼人)) 接受，
+狼人数保持为 k。多条链在一个进程内按 NumPy 向量化推进，链组分到进程池并行运行。
+
+- 随时可停：达到 time_budget_ms 或 max_sweeps 即返回，工具延迟有上界
+- 每次采样报告各玩家的有效样本量（ESS，Geyer 初始正序列估计），通过 diagnostics() 获取
+- 每个证据版本只采样一次：同一次采样同时统计两两同为狼的次数，边缘后验（对角线）与
+  pair_marginals 共用这一结果，在下次更新前缓存；重放事件日志时只累加证据，不触发采样
+- async 工具在读取后验前 await refresh()，采样在线程池中运行，不阻塞事件循环
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from core.bayesian_inference import RosterInference, _combine_pairs
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("sampling_inference")
+
+# 硬事实编码
+_UNKNOWN, _GOOD, _WOLF = -1, 0, 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def effective_sample_size(trace: np.ndarray) -> np.ndarray:
+    """trace 形状为 (迭代数, 序列数)，逐列估计 ESS；常数序列返回迭代数"""
+    steps = len(trace)
+    centered = trace - trace.mean(axis=0)
+    variance = (centered ** 2).mean(axis=0)
+    spectrum = np.fft.rfft(centered, n=2 * steps, axis=0)
+    autocov = np.fft.irfft(spectrum * np.conj(spectrum), axis=0)[:steps] / steps
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rho = autocov / variance
+    # Geyer：相邻自相关两两求和，截断到第一个非正的和
+    pairs = rho[0:steps - 1:2] + rho[1:steps:2]
+    positive = np.cumprod(pairs > 0, axis=0).astype(bool)
+    tau = -1.0 + 2.0 * np.where(positive, pairs, 0.0).sum(axis=0)
+    ess = np.where(variance > 0, steps / np.maximum(tau, 1.0), steps)
+    return ess.astype(np.float64)
+
+
+def run_chains(
+    weights: np.ndarray,
+    wolves: int,
+    chains: int,
+    seed: Any,
+    deadline: float,
+    max_sweeps: int,
+    burn_in: int,
+    pairs: bool = False
+) -> Tuple[np.ndarray, int, np.ndarray]:
+    """在当前进程推进一组交换链，返回 (各玩家为狼的样本计数, 样本数, 各玩家 ESS 之和)
+
+    weights 为未确定身份玩家的对数似然比，wolves 为其中的狼人数；每轮（sweep）
+    每条链提议 len(weights) 次交换，每轮末记录一次样本。deadline 为 time.time() 时刻。
+    pairs 为 True 时计数为 玩家 x 玩家 矩阵（两人同为狼的样本数，对角线即单人计数）。
+    """
+    rng = np.random.default_rng(seed)
+    size = len(weights)
+    rows = np.arange(chains)
+    order = np.argsort(rng.random((chains, size)), axis=1)
+    wolf_slots = order[:, :wolves].copy()
+    good_slots = order[:, wolves:].copy()
+
+    trace = []
+    while len(trace) < max_sweeps:
+        pick_wolf = rng.integers(wolves, size=(size, chains))
+        pick_good = rng.integers(size - wolves, size=(size, chains))
+        log_u = np.log(rng.random((size, chains)))
+        for step in range(size):
+            ia, ib = pick_wolf[step], pick_good[step]
+            a, b = wolf_slots[rows, ia], good_slots[rows, ib]
+            accept = log_u[step] < weights[b] - weights[a]
+            wolf_slots[rows[accept], ia[accept]] = b[accept]
+            good_slots[rows[accept], ib[accept]] = a[accept]
+        sample = np.zeros((chains, size), dtype=np.float32)
+        sample[rows[:, None], wolf_slots] = 1.0
+        trace.append(sample)
+        if time.time() >= deadline:
+            break
+
+    # 预算不足时最多丢弃前一半作为预热
+    trace = np.stack(trace[min(burn_in, len(trace) // 2):])
+    steps = len(trace)
+    if pairs:
+        flat = trace.reshape(steps * chains, size)
+        counts = (flat.T @ flat).astype(np.float64)
+    else:
+        counts = trace.sum(axis=(0, 1)).astype(np.float64)
+    ess = effective_sample_size(trace.reshape(steps, chains * size)).reshape(chains, size).sum(axis=0)
+    return counts, steps * chains, ess
+
+
+class SamplingBayesianInference(RosterInference):
+    """用 MCMC 估计"恰好 k 名狼人"约束下各玩家的后验，接口与 BayesianInference 相同
+
+    不在 initialize_priors 名单中的玩家按标量模型独立更新。
+    """
+
+    def __init__(
+        self,
+        chains: Optional[int] = None,
+        workers: Optional[int] = None,
+        time_budget_ms: Optional[float] = None,
+        max_sweeps: Optional[int] = None,
+        burn_in: Optional[int] = None,
+        seed: Optional[int] = None
+    ):
+        self.chains = max(1, chains if chains is not None else int(get_config("inference.sampling.chains", 64)))
+        workers = workers if workers is not None else int(get_config("inference.sampling.workers", 0))
+        # 0 表示按 CPU 数自动选择；1 表示在当前进程内运行
+        self.workers = max(1, min(self.chains, workers or min(4, os.cpu_count() or 1)))
+        self.time_budget = (time_budget_ms if time_budget_ms is not None else float(
+            get_config("inference.sampling.time_budget_ms", 50)
+        )) / 1000
+        self.max_sweeps = max(1, max_sweeps if max_sweeps is not None else int(
+            get_config("inference.sampling.max_sweeps", 1000)
+        ))
+        self.burn_in = burn_in if burn_in is not None else int(get_config("inference.sampling.burn_in", 50))
+        self._seeds = np.random.SeedSequence(seed)
+        self._version = 0
+        self._clear_roster()
+        super().__init__()
+
+    # ========== 存储 ==========
+    def _clear_roster(self):
+        self._players: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.total_wolves = 0
+        self._llr = np.zeros(0, dtype=np.float64)
+        self._roles = np.zeros(0, dtype=np.int8)
+        self._invalidate()
+        self._diagnostics: Dict[str, Any] = {}
+
+    def _invalidate(self):
+        # 证据版本：采样结果只在版本未变时写入缓存
+        self._version += 1
+        self._marginals: Optional[np.ndarray] = None
+        self._pairs: Optional[np.ndarray] = None
+
+    @property
+    def prior_probabilities(self) -> Dict[str, float]:
+        probabilities = self._outside_suspicions()
+        if self._players:
+            probabilities.update(zip(self._players, self._roster_marginals().tolist()))
+        return probabilities
+
+    @prior_probabilities.setter
+    def prior_probabilities(self, priors: Dict[str, float]):
+        self._clear_roster()
+        self._set_outside_priors(priors)
+
+    # ========== 采样 ==========
+    def _roster_marginals(self) -> np.ndarray:
+        if self._marginals is None:
+            self._store(self._version, self._compute(self._roles.copy(), self._llr.copy()))
+        return self._marginals
+
+    def _roster_pairs(self) -> np.ndarray:
+        self._roster_marginals()
+        return self._pairs
+
+    async def refresh(self):
+        if self._marginals is not None or not self._players:
+            return
+        version = self._version
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self._compute, self._roles.copy(), self._llr.copy())
+        self._store(version, result)
+
+    def _store(self, version: int, result: Tuple[np.ndarray, np.ndarray, Dict[str, Any]]):
+        # 采样期间证据又有更新时丢弃结果，下次读取重新采样
+        if version == self._version:
+            self._marginals, self._pairs, self._diagnostics = result
+
+    def _compute(self, roles: np.ndarray, llr: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+        """一次采样得到 (边缘后验, 名单内两两同为狼的概率, 诊断信息)，只读取传入的副本"""
+        start = time.perf_counter()
+        fixed = (roles == _WOLF).astype(np.float64)
+        # 身份已确定的玩家是常数，与任何人的联合概率都等于边缘概率之积
+        pairs = np.outer(fixed, fixed)
+        free = np.flatnonzero(roles == _UNKNOWN)
+        wolves = self.total_wolves - int(fixed.sum())
+        weights = llr[free]
+        stats: Dict[str, Any] = {"engine": "sampling", "chains": 0, "samples": 0}
+
+        if 0 < wolves < len(free) and np.ptp(weights) > 0:
+            counts, samples, ess = self._sample(weights, wolves, pairs=True)
+            block = counts / samples
+            stats.update({
+                "chains": self.chains,
+                "samples": samples,
+                "ess_min": round(float(ess.min()), 1),
+                "ess": {self._players[slot]: round(float(value), 1) for slot, value in zip(free, ess)}
+            })
+        else:
+            # 没有可区分的证据（或全部确定）时后验均匀，无需采样
+            both = wolves * (wolves - 1) / (len(free) * (len(free) - 1)) if len(free) > 1 else 0.0
+            block = np.full((len(free), len(free)), both)
+            np.fill_diagonal(block, wolves / len(free) if len(free) else 0.0)
+
+        wolf_slots = np.flatnonzero(fixed)
+        pairs[np.ix_(free, free)] = block
+        pairs[np.ix_(wolf_slots, free)] = np.diag(block)
+        pairs[np.ix_(free, wolf_slots)] = np.diag(block)[:, None]
+        stats["seconds"] = round(time.perf_counter() - start, 4)
+        return np.diag(pairs).copy(), pairs, stats
+
+    def _sample(self, weights: np.ndarray, wolves: int, pairs: bool = False) -> Tuple[np.ndarray, int, np.ndarray]:
+        deadline = time.time() + self.time_budget
+        sizes = [len(group) for group in np.array_split(np.arange(self.chains), self.workers) if len(group)]
+        seeds = self._seeds.spawn(len(sizes))
+        jobs = [
+            (weights, wolves, size, seed, deadline, self.max_sweeps, self.burn_in, pairs)
+            for size, seed in zip(sizes, seeds)
+        ]
+        if len(jobs) == 1:
+            results = [run_chains(*jobs[0])]
+        else:
+            try:
+                pool = _get_pool(self.workers)
+                results = [future.result() for future in [pool.submit(run_chains, *job) for job in jobs]]
+            except BrokenProcessPool as e:
+                logger.error(f"Sampling process pool failed, running chains in-process: {e}")
+                shutdown_pool()
+                results = [run_chains(*job) for job in jobs]
+        counts = sum(result[0] for result in results)
+        samples = sum(result[1] for result in results)
+        ess = sum(result[2] for result in results)
+        return counts, samples, ess
+
+    # ========== 推理 ==========
+    def initialize_priors(self, player_ids: List[str], total_wolves: int = 2):
+        if not 0 < total_wolves <= len(player_ids):
+            raise ValueError(f"total_wolves must be between 1 and {len(player_ids)}")
+        self._clear_roster()
+        self._players = list(player_ids)
+        self._index = {player_id: slot for slot, player_id in enumerate(self._players)}
+        self.total_wolves = total_wolves
+        self._llr = np.zeros(len(self._players), dtype=np.float64)
+        self._roles = np.full(len(self._players), _UNKNOWN, dtype=np.int8)
+        self._set_outside_priors({
+            player_id: p for player_id, p in self._outside_suspicions().items() if player_id not in self._index
+        })
+        for player_id in player_ids:
+            self._reset_evidence(player_id)
+        logger.info(f"Initialized sampling priors for {len(player_ids)} players ({total_wolves} wolves)")
+
+    def _add_roster(self, evidence: List[Dict[str, Any]]):
+        # 只累加对数似然比，后验在下次读取或 refresh 时采样
+        slots = np.fromiter((self._index[item["player_id"]] for item in evidence), dtype=np.intp, count=len(evidence))
+        np.add.at(self._llr, slots, self._log_likelihood_ratios(evidence))
+        np.clip(self._llr, -self.max_log_odds, self.max_log_odds, out=self._llr)
+        self._invalidate()
+
+    def _roster_role_possible(self, slot: int, is_wolf: bool) -> bool:
+        if self._roles[slot] != _UNKNOWN:
+            return bool(self._roles[slot] == (_WOLF if is_wolf else _GOOD))
+        if is_wolf:
+            return int((self._roles == _WOLF).sum()) < self.total_wolves
+        return int((self._roles == _GOOD).sum()) < len(self._players) - self.total_wolves
+
+    def _set_roster_role(self, slot: int, is_wolf: bool):
+        self._roles[slot] = _WOLF if is_wolf else _GOOD
+        self._invalidate()
+
+    def _roster_suspicion(self, slot: int) -> float:
+        return float(self._roster_marginals()[slot])
+
+    def diagnostics(self) -> Dict[str, Any]:
+        return dict(self._diagnostics)
+
+    def pair_marginals(self) -> Tuple[List[str], np.ndarray]:
+        """名单内的两两联合概率取自与边缘后验同一次的采样，名单外玩家视为独立"""
+        outside_players, outside = self._outside_pairs()
+        if not self._players:
+            return outside_players, outside
+        return _combine_pairs(list(self._players), self._roster_pairs(), outside_players, outside)
+
+    # ========== 状态 ==========
+    def to_state(self) -> Dict:
+        # 只保存充分统计量（对数似然比与硬事实），恢复后重新采样
+        state = {
+            "priors": self._outside_suspicions(),
+            "evidence": self._evidence_state()
+        }
+        if self._players:
+            state["sampling"] = {
+                "players": list(self._players),
+                "wolves": self.total_wolves,
+                "llr": self._llr.tolist(),
+                "roles": self._roles.tolist()
+            }
+        return state
+
+    def load_state(self, state: Dict):
+        self.prior_probabilities = state.get("priors", {})
+        self._load_evidence(state)
+        roster = state.get("sampling")
+        if roster:
+            self._players = list(roster["players"])
+            self._index = {player_id: slot for slot, player_id in enumerate(self._players)}
+            self.total_wolves = roster["wolves"]
+            self._llr = np.asarray(roster["llr"], dtype=np.float64)
+            self._roles = np.asarray(roster["roles"], dtype=np.int8)
+
+    def reset(self):
+        self._clear_roster()
+        self._set_outside_priors({})
+        self.evidence_history.clear()
+        logger.info("Bayesian inference model reset")
@@ -0,0 +1,400 @@
+import asyncio
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from core.database import GameDatabase
+from core.async_database import AsyncGameDatabase
+from core.bayesian_inference import ROLE_FACT, BayesianInference
+from core.vectorized_inference import VectorizedBayesianInference
+from core.joint_inference import JointBayesianInference
+from core.sampling_inference import SamplingBayesianInference
+from core.knowledge_graph import KnowledgeGraph
+from core.contradiction_index import ContradictionIndex
+from core.game_tree import GameTreeSearch
+from modules.YA_Common.utils.config import get_config
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("session")
+
+# 未指定 game_id 的工具调用共享的会话
+DEFAULT_GAME_ID = "default"
+
+# inference.engine 配置 -> 贝叶斯引擎实现
+INFERENCE_ENGINES = {
+    "scalar": BayesianInference,
+    "vectorized": VectorizedBayesianInference,
+    "joint": JointBayesianInference,
+    "sampling": SamplingBayesianInference,
+}
+
+
+def create_inference_engine(name: Optional[str] = None) -> BayesianInference:
+    name = name or get_config("inference.engine", "vectorized")
+    try:
+        return INFERENCE_ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown inference engine: {name}")
+
+
+# 内存估算用的近似单价（字节），只用于淘汰决策，不追求精确
+_EVIDENCE_BYTES = 320
+_RELATION_BYTES = 360
+_NODE_BYTES = 120
+_FEATURE_BYTES = 90
+
+
+class GameSession:
+    """单局游戏的内存状态：贝叶斯推理、知识图谱和博弈树引擎"""
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.bayesian = create_inference_engine()
+        self.knowledge_graph = KnowledgeGraph()
+        self.contradictions = ContradictionIndex()
+        self.game_tree = GameTreeSearch()
+        # initialize_game 设置的狼人数，与引擎无关（独立模型引擎不保存该值）
+        self.total_wolves: Optional[int] = None
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # 事件溯源水位：已应用到引擎的最大 GameHistory / SuspicionEvidence ID
+        self.history_id = 0
+        self.evidence_id = 0
+        # 恢复时重放到的位置，不大于该位置的事件已包含在状态中，不再重复应用
+        self.replayed_history_id = 0
+        self.replayed_evidence_id = 0
+        # 新建或重置对局时的证据水位，不大于该 ID 的证据属于之前的对局
+        self.reset_evidence_id = 0
+        # 上次检查点之后应用的事件数
+        self.pending_events = 0
+
+    def touch(self):
+        self.last_access = time.time()
+
+    def apply_history_events(self, events: List[Dict[str, Any]]) -> int:
+        """把已写入 GameHistory 的事件应用到知识图谱和矛盾索引，返回实际应用的条数
+
+        事件需包含 id/round_num/speaker/content/action_type，可选 target_player/relation_type；
+        同时给出目标和关系类型的事件会添加一条关系边，有内容的事件按发言人写入矛盾索引。
+        """
+        players = set()
+        edges = []
+        applied = 0
+        for event in events:
+            event_id = event.get("id") or 0
+            if event_id and event_id <= self.replayed_history_id:
+                continue
+            target = event.get("target_player")
+            players.add(event["speaker"])
+            if event_id and event.get("content"):
+                self.contradictions.add(event["speaker"], event_id, event["content"])
+            if target:
+                players.add(target)
+                if event.get("relation_type"):
+                    edges.append({
+                        "source": event["speaker"],
+                        "target": target,
+                        "relation_type": event["relation_type"],
+                        "metadata": {
+                            "round": event["round_num"],
+                            "action_type": event["action_type"],
+                            "content": event["content"]
+                        }
+                    })
+            self.history_id = max(self.history_id, event_id)
+            applied += 1
+        self.knowledge_graph.add_nodes(list(players))
+        self.knowledge_graph.add_edges(edges)
+        self.pending_events += applied
+        return applied
+
+    def apply_evidence(self, evidence: Dict[str, Any]) -> float:
+        """把已写入 SuspicionEvidence 的证据应用到贝叶斯引擎，返回该玩家的后验"""
+        self.apply_evidence_batch([evidence])
+        return self.bayesian.get_suspicion(evidence["player_id"])
+
+    def apply_evidence_batch(self, evidence: List[Dict[str, Any]]) -> int:
+        """批量应用证据（一次引擎更新），返回实际应用的条数
+
+        evidence_type 为 role_fact 的条目是硬事实，按 evidence_score 是否为 1 记为狼人/好人。
+        evidence_score 不在 [0, 1] 内（包括 NaN）的条目跳过，不进入引擎，但仍推进水位。
+        """
+        fresh = [
+            item for item in evidence
+            if not (item.get("id") and item["id"] <= self.replayed_evidence_id)
+        ]
+        if not fresh:
+            return 0
+        valid = [item for item in fresh if 0.0 <= item["evidence_score"] <= 1.0]
+        if len(valid) < len(fresh):
+            logger.warning(
+                f"Skipped {len(fresh) - len(valid)} evidence items with evidence_score outside [0, 1] "
+                f"in game {self.game_id}"
+            )
+        for item in valid:
+            if item.get("evidence_type") == ROLE_FACT:
+                self.bayesian.observe_role(
+                    item["player_id"], item["evidence_score"] >= 0.5, item.get("description") or "", item.get("id")
+                )
+        self.bayesian.add_evidence_batch([item for item in valid if item.get("evidence_type") != ROLE_FACT])
+        self.evidence_id = max([self.evidence_id] + [item.get("id") or 0 for item in fresh])
+        self.pending_events += len(fresh)
+        return len(fresh)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "total_wolves": self.total_wolves,
+            "reset_evidence_id": self.reset_evidence_id,
+            "bayesian": self.bayesian.to_state(),
+            "knowledge_graph": self.knowledge_graph.to_state(),
+            "contradictions": self.contradictions.to_state()
+        }
+
+    def load_state(self, state: Dict[str, Any]):
+        self.total_wolves = state.get("total_wolves")
+        self.reset_evidence_id = state.get("reset_evidence_id", 0)
+        self.bayesian.load_state(state.get("bayesian", {}))
+        self.knowledge_graph.load_state(state.get("knowledge_graph", {}))
+        self.contradictions.load_state(state.get("contradictions", {}))
+
+    def approx_memory_bytes(self) -> int:
+        evidence = sum(len(items) for items in self.bayesian.evidence_history.values())
+        relations = 0
+        content_bytes = 0
+        for edge_data in self.knowledge_graph.edges.values():
+            relations += len(edge_data["relations"])
+            for relation in edge_data["relations"]:
+                content_bytes += len(relation["metadata"].get("content", ""))
+        return (
+            sys.getsizeof(self)
+            + evidence * _EVIDENCE_BYTES
+            + relations * _RELATION_BYTES
+            + len(self.knowledge_graph.nodes) * _NODE_BYTES
+            + self.contradictions.entries * _FEATURE_BYTES
+            + content_bytes
+        )
+
+
+class SessionRegistry:
+    """进程级会话注册表
+
+    所有工具、资源和 Prompt 通过它共享同一个数据库句柄和按 game_id 划分的推理引擎。
+    会话按 LRU 顺序保存；超过数量上限、内存上限或空闲超时的会话会被淘汰。
+
+    锁只保护会话表本身：未命中时的加载（解压检查点、读库、重放事件）和淘汰回调都在锁外执行，
+    async 调用方使用 get_async，加载在数据库读线程池中进行，不阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        db: AsyncGameDatabase,
+        max_sessions: Optional[int] = None,
+        max_memory_mb: Optional[float] = None,
+        idle_ttl_seconds: Optional[float] = None
+    ):
+        self.db = db
+        self.max_sessions = max_sessions if max_sessions is not None else int(
+            get_config("session.max_games", 500)
+        )
+        self.max_memory_bytes = int(
+            (max_memory_mb if max_memory_mb is not None else float(get_config("session.max_memory_mb", 256)))
+            * 1024 * 1024
+        )
+        self.idle_ttl_seconds = idle_ttl_seconds if idle_ttl_seconds is not None else float(
+            get_config("session.idle_ttl_seconds", 3600)
+        )
+        self._check_interval = int(get_config("session.check_interval", 100))
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._accesses = 0
+        self._evict_listeners: List[Callable[[GameSession], None]] = []
+        self._loader: Optional[Callable[[str], Optional[GameSession]]] = None
+        # 正在异步加载的对局，同一局的并发请求共享一次加载
+        self._loading: Dict[str, "asyncio.Future[Optional[GameSession]]"] = {}
+        # 每局"写日志 + 应用到会话"的互斥锁，无人持有时自动释放
+        self._journal_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # 由 CheckpointManager.attach 设置
+        self.checkpoints = None
+
+    def get(self, game_id: Optional[str] = None) -> GameSession:
+        """获取会话，不存在时自动创建（在当前线程加载，用于启动恢复等同步场景）"""
+        key = game_id or DEFAULT_GAME_ID
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                evicted = self._hit(key, session)
+        if session is None:
+            session, evicted = self._publish(key, self._loader(key) if self._loader else None)
+        self._notify_evicted(evicted)
+        return session
+
+    async def get_async(self, game_id: Optional[str] = None) -> GameSession:
+        """获取会话，未命中时在数据库读线程池中加载，只在发布结果时持有锁"""
+        key = game_id or DEFAULT_GAME_ID
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                evicted = self._hit(key, session)
+            elif self._loader is not None:
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = asyncio.ensure_future(self.db.run_read(self._loader, key))
+            else:
+                loading = None
+        if session is None:
+            loaded = None
+            if loading is not None:
+                try:
+                    loaded = await asyncio.shield(loading)
+                finally:
+                    with self._lock:
+                        if self._loading.get(key) is loading:
+                            del self._loading[key]
+            session, evicted = self._publish(key, loaded)
+        self._notify_evicted(evicted)
+        return session
+
+    @asynccontextmanager
+    async def journal(self, *game_ids: Optional[str]) -> AsyncIterator[None]:
+        """持有这些对局的日志锁：写入事件/证据并应用到会话的整个过程在锁内完成
+
+        同一局的事件因此按 ID 顺序应用，会话水位之前的事件都已包含在状态中，
+        检查点不会记下越过未应用事件的水位。多局时按 game_id 排序加锁，避免死锁。
+        """
+        async with AsyncExitStack() as stack:
+            for key in sorted({game_id or DEFAULT_GAME_ID for game_id in game_ids}):
+                with self._lock:
+                    lock = self._journal_locks.get(key)
+                    if lock is None:
+                        lock = self._journal_locks[key] = asyncio.Lock()
+                await stack.enter_async_context(lock)
+            yield
+
+    def create(self, game_id: Optional[str] = None) -> GameSession:
+        """为新对局创建全新的会话，替换同 game_id 的旧状态（不经过加载器）"""
+        key = game_id or DEFAULT_GAME_ID
+        with self._lock:
+            session = self._sessions[key] = GameSession(key)
+            self._sessions.move_to_end(key)
+            evicted = self._enforce_limits(protect=key)
+        self._notify_evicted(evicted)
+        return session
+
+    def _hit(self, key: str, session: GameSession) -> List[GameSession]:
+        """命中：更新 LRU 顺序，每 check_interval 次访问检查一次上限（调用方持有锁）"""
+        self._sessions.move_to_end(key)
+        session.touch()
+        self._accesses += 1
+        if self._accesses % self._check_interval == 0:
+            return self._enforce_limits(protect=key)
+        return []
+
+    def _publish(self, key: str, loaded: Optional[GameSession]) -> Tuple[GameSession, List[GameSession]]:
+        """加载完成后登记会话；期间已有其他调用方登记（或 create）时以已登记的为准"""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session, self._hit(key, session)
+            session = self._sessions[key] = loaded or GameSession(key)
+            session.touch()
+            return session, self._enforce_limits(protect=key)
+
+    def _notify_evicted(self, sessions: List[GameSession]):
+        for session in sessions:
+            for listener in self._evict_listeners:
+                try:
+                    listener(session)
+                except Exception as e:
+                    logger.error(f"Evict listener failed for game {session.game_id}: {e}")
+
+    def peek(self, game_id: Optional[str] = None) -> Optional[GameSession]:
+        """查看会话但不更新 LRU 顺序，也不创建"""
+        with self._lock:
+            return self._sessions.get(game_id or DEFAULT_GAME_ID)
+
+    def drop(self, game_id: Optional[str] = None) -> bool:
+        with self._lock:
+            return self._sessions.pop(game_id or DEFAULT_GAME_ID, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def game_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def set_loader(self, loader: Optional[Callable[[str], Optional[GameSession]]]):
+        """设置会话加载器：get() 未命中时调用，返回 None 表示创建空会话"""
+        self._loader = loader
+
+    def add_evict_listener(self, listener: Callable[[GameSession], None]):
+        """注册淘汰回调（例如在会话被淘汰前保存检查点）"""
+        self._evict_listeners.append(listener)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            memory = sum(s.approx_memory_bytes() for s in self._sessions.values())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "approx_memory_mb": round(memory / 1024 / 1024, 3),
+                "max_memory_mb": round(self.max_memory_bytes / 1024 / 1024, 3),
+            }
+
+    def _enforce_limits(self, protect: Optional[str] = None) -> List[GameSession]:
+        """移除超限的会话并返回它们，淘汰回调由调用方在释放锁后执行"""
+        now = time.time()
+        evicted = []
+
+        if self.idle_ttl_seconds > 0:
+            idle = [
+                key for key, session in self._sessions.items()
+                if key != protect and now - session.last_access > self.idle_ttl_seconds
+            ]
+            for key in idle:
+                evicted.append(self._evict(key, "idle"))
+
+        while len(self._sessions) > self.max_sessions:
+            key = next(iter(self._sessions))
+            if key == protect:
+                break
+            evicted.append(self._evict(key, "lru"))
+
+        if self.max_memory_bytes > 0:
+            sizes = {key: s.approx_memory_bytes() for key, s in self._sessions.items()}
+            total = sum(sizes.values())
+            for key in list(self._sessions.keys()):
+                if total <= self.max_memory_bytes:
+                    break
+                if key == protect:
+                    continue
+                total -= sizes[key]
+                evicted.append(self._evict(key, "memory"))
+        return evicted
+
+    def _evict(self, key: str, reason: str) -> GameSession:
+        session = self._sessions.pop(key)
+        logger.info(f"Evicted game session {key} ({reason})")
+        return session
+
+
+_registry: Optional[SessionRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> SessionRegistry:
+    """进程级单例：首次调用时打开数据库并创建注册表"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from core.checkpoint import CheckpointManager
+
+                registry = SessionRegistry(AsyncGameDatabase(GameDatabase()))
+                CheckpointManager(registry).attach()
+                _registry = registry
+    return _registry
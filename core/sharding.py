@@ -0,0 +1,254 @@
+"""
+GameHistory 分片与归档路由
+
+- single：所有对局的历史写入主库（默认，与旧行为一致）
+- per_game：每个对局的历史写入独立的分片文件 shard_dir/<game_id>.db，
+  已结束对局的 VACUUM/备份不会锁住进行中的对局
+
+两种模式下都可以把已结束对局移入按月归档文件 archive_dir/history-YYYY-MM.db，
+归档位置记录在主库的 GameArchive 表中，读取时由路由器自动定位。
+SuspicionEvidence 不分片，归档时随历史一起移入归档文件；
+GameState、PlayerProfile 以及训练相关表始终保存在主库。
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+STORAGE_SINGLE = "single"
+STORAGE_PER_GAME = "per_game"
+
+# SQLite 默认最多 ATTACH 10 个库，留一个余量
+_MAX_ATTACH = 9
+
+_UNSAFE_CHARS = re.compile(r"[^0-9A-Za-z_.-]")
+
+
+def shard_file_name(game_id: str) -> str:
+    """game_id -> 分片文件名；非常规字符以十六进制转义，保证可逆且不会越出目录"""
+    return _UNSAFE_CHARS.sub(lambda m: f"%{ord(m.group()):04x}", game_id) + ".db"
+
+
+class _Handle:
+    __slots__ = ("db", "in_use")
+
+    def __init__(self, db):
+        self.db = db
+        self.in_use = 0
+
+
+class ShardRouter:
+    """按 game_id 选择 GameHistory 所在的数据库文件
+
+    打开的分片/归档句柄按 LRU 缓存，超过 max_open 时关闭最久未用且未被占用的句柄。
+    """
+
+    def __init__(
+        self,
+        owner,
+        mode: str,
+        shard_dir: str,
+        archive_dir: str,
+        max_open: int,
+        factory: Callable[[str], Any]
+    ):
+        if mode not in (STORAGE_SINGLE, STORAGE_PER_GAME):
+            raise ValueError(f"Unknown storage mode: {mode}")
+        self.owner = owner
+        self.mode = mode
+        self.shard_dir = shard_dir
+        self.archive_dir = archive_dir
+        self.max_open = max(1, max_open)
+        self._factory = factory
+        self._handles: "OrderedDict[str, _Handle]" = OrderedDict()
+        self._archived: Dict[str, str] = {}
+        self._archived_loaded = False
+        self._lock = threading.RLock()
+
+    # ========== 路径 ==========
+    def shard_path(self, game_id: str) -> str:
+        return os.path.join(self.shard_dir, shard_file_name(game_id))
+
+    def archive_path(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"history-{month}.db")
+
+    def archive_location(self, game_id: str) -> Optional[str]:
+        with self._lock:
+            if not self._archived_loaded:
+                with self.owner._read() as conn:
+                    self._archived = {
+                        row["game_id"]: row["archive_path"]
+                        for row in conn.execute("SELECT game_id, archive_path FROM GameArchive")
+                    }
+                self._archived_loaded = True
+            return self._archived.get(game_id)
+
+    def mark_archived(self, game_id: str, archive_path: str):
+        with self._lock:
+            self.archive_location(game_id)
+            self._archived[game_id] = archive_path
+
+    def forget_archive(self, game_id: str):
+        with self._lock:
+            self._archived.pop(game_id, None)
+
+    # ========== 路由 ==========
+    def check_writable(self, game_id: Optional[str]):
+        if game_id and self.archive_location(game_id):
+            raise ValueError(f"Game {game_id} is archived and read-only")
+
+    @contextmanager
+    def writer_for(self, game_id: Optional[str]) -> Iterator[Any]:
+        """写入目标：single 模式或未指定 game_id 时为主库，per_game 模式为该对局分片"""
+        self.check_writable(game_id)
+        if self.mode == STORAGE_SINGLE or not game_id:
+            yield self.owner
+            return
+        with self.acquire(self.shard_path(game_id)) as db:
+            yield db
+
+    @contextmanager
+    def reader_for(self, game_id: Optional[str]) -> Iterator[Any]:
+        """读取来源：归档文件 > 分片文件 > 主库"""
+        if game_id:
+            archive = self.archive_location(game_id)
+            if archive:
+                with self.acquire(archive) as db:
+                    yield db
+                return
+            if self.mode == STORAGE_PER_GAME and os.path.exists(self.shard_path(game_id)):
+                with self.acquire(self.shard_path(game_id)) as db:
+                    yield db
+                return
+        yield self.owner
+
+    @contextmanager
+    def evidence_reader_for(self, game_id: Optional[str]) -> Iterator[Any]:
+        """证据读取来源：SuspicionEvidence 不分片，已归档对局在归档文件，其余在主库"""
+        archive = self.archive_location(game_id) if game_id else None
+        if archive:
+            with self.acquire(archive) as db:
+                yield db
+            return
+        yield self.owner
+
+    @contextmanager
+    def acquire(self, path: str) -> Iterator[Any]:
+        """借出某个分片/归档文件的 GameDatabase 句柄（不存在时创建）"""
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                handle = _Handle(self._factory(path))
+                self._handles[path] = handle
+                self._close_idle()
+            else:
+                self._handles.move_to_end(path)
+            handle.in_use += 1
+        try:
+            yield handle.db
+        finally:
+            with self._lock:
+                handle.in_use -= 1
+
+    def _close_idle(self):
+        for path in list(self._handles.keys()):
+            if len(self._handles) <= self.max_open:
+                break
+            handle = self._handles[path]
+            if handle.in_use == 0:
+                del self._handles[path]
+                handle.db.close()
+
+    def release(self, path: str) -> bool:
+        """关闭某个文件的句柄（例如删除分片前）；仍被占用时返回 False"""
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None:
+                return True
+            if handle.in_use:
+                return False
+            del self._handles[path]
+            handle.db.close()
+            return True
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                handle.db.close()
+            self._handles.clear()
+
+    # ========== 跨分片读取 ==========
+    def history_sources(self) -> List[Tuple[str, str]]:
+        """所有保存 GameHistory 的文件：(来源名, 路径)，主库排在第一位"""
+        sources = [] if self.owner.db_path == ":memory:" else [("main", self.owner.db_path)]
+        for directory, prefix in ((self.shard_dir, "shard"), (self.archive_dir, "archive")):
+            for name, path in self._db_files(directory):
+                sources.append((f"{prefix}:{name}", path))
+        return sources
+
+    def archive_files(self) -> List[str]:
+        """所有月度归档文件的路径"""
+        return [path for _, path in self._db_files(self.archive_dir)]
+
+    @staticmethod
+    def _db_files(directory: str) -> List[Tuple[str, str]]:
+        if not os.path.isdir(directory):
+            return []
+        return [
+            (name[:-3], os.path.join(directory, name))
+            for name in sorted(os.listdir(directory)) if name.endswith(".db")
+        ]
+
+    def iter_all_history(
+        self,
+        where: str = "1=1",
+        params: Optional[List[Any]] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """ATTACH 各分片/归档文件，用 UNION ALL 流式读取所有 GameHistory 记录
+
+        使用独立的只读连接，迭代期间不占用连接池。每行附带 source 字段标明来源文件。
+        """
+        params = params or []
+        sources = self.history_sources()
+        conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            for start in range(0, len(sources), _MAX_ATTACH):
+                batch = sources[start:start + _MAX_ATTACH]
+                selects = []
+                query_params: List[Any] = []
+                aliases = []
+                try:
+                    for index, (source, path) in enumerate(batch):
+                        schema = f"s{index}"
+                        conn.execute(
+                            f"ATTACH DATABASE ? AS {schema}",
+                            (f"{Path(path).resolve().as_uri()}?mode=ro",)
+                        )
+                        aliases.append(schema)
+                        selects.append(
+                            f"SELECT ? AS source, id, round_num, speaker, content, action_type, timestamp, game_id "
+                            f"FROM {schema}.GameHistory WHERE {where}"
+                        )
+                        query_params.extend([source] + list(params))
+                    cursor = conn.execute(" UNION ALL ".join(selects), query_params)
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        for row in rows:
+                            yield dict(row)
+                    cursor.close()
+                finally:
+                    for schema in aliases:
+                        conn.execute(f"DETACH DATABASE {schema}")
+        finally:
+            conn.close()
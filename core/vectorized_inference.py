@@ -0,0 +1,142 @@
+"""
+数组化的贝叶斯推理引擎
+
+所有玩家的狼人后验以对数几率（log-odds）存放在一个连续的 float64 数组中。
+每条证据的似然比与标量实现完全一致（按证据类型查似然表，没有表的类型为线性似然）：
+
+    L(wolf) = 0.5 + 0.5 * s,  L(villager) = 0.5 + 0.5 * (1 - s)
+    logit(posterior) = logit(prior) + log(L(wolf) / L(villager))
+
+因此同一玩家的多条证据只需把对数似然比相加，一批 (玩家, 分数, 类型) 证据
+用一次 np.add.at 完成更新，结果与逐条调用 update_suspicion 相同（浮点误差内；
+对数几率限制在 ±max_log_odds 内，批量更新在整批累加后才做限制）。
+"""
+
+from typing import Any, Dict, Iterable, List
+import numpy as np
+from core.bayesian_inference import BayesianInference
+from modules.YA_Common.utils.logger import get_logger
+
+logger = get_logger("vectorized_inference")
+
+# 与 BayesianInference 中未知玩家的默认先验一致
+_DEFAULT_PRIOR = 0.4
+
+
+def _logit(p):
+    with np.errstate(divide="ignore"):
+        return np.log(p) - np.log1p(-p)
+
+
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+class VectorizedBayesianInference(BayesianInference):
+    """BayesianInference 的 NumPy 实现，接口与标量版本相同，另支持批量更新"""
+
+    def __init__(self, capacity: int = 16):
+        self._index: Dict[str, int] = {}
+        self._players: List[str] = []
+        self._log_odds = np.zeros(max(1, capacity), dtype=np.float64)
+        super().__init__()
+
+    # ========== 存储 ==========
+    def _slots(self, player_ids: Iterable[str]) -> np.ndarray:
+        """玩家ID -> 数组下标，未知玩家以默认先验登记"""
+        slots = []
+        for player_id in player_ids:
+            slot = self._index.get(player_id)
+            if slot is None:
+                slot = len(self._players)
+                if slot >= len(self._log_odds):
+                    grown = np.zeros(len(self._log_odds) * 2, dtype=np.float64)
+                    grown[:slot] = self._log_odds[:slot]
+                    self._log_odds = grown
+                self._index[player_id] = slot
+                self._players.append(player_id)
+                self._log_odds[slot] = _logit(_DEFAULT_PRIOR)
+            slots.append(slot)
+        return np.asarray(slots, dtype=np.intp)
+
+    @property
+    def prior_probabilities(self) -> Dict[str, float]:
+        n = len(self._players)
+        return dict(zip(self._players, _sigmoid(self._log_odds[:n]).tolist()))
+
+    @prior_probabilities.setter
+    def prior_probabilities(self, priors: Dict[str, float]):
+        self._index = {}
+        self._players = []
+        self._log_odds = np.zeros(max(16, len(priors)), dtype=np.float64)
+        slots = self._slots(priors.keys())
+        self._log_odds[slots] = _logit(np.asarray(list(priors.values()), dtype=np.float64))
+
+    # ========== 推理 ==========
+    def initialize_priors(self, player_ids: List[str], total_wolves: int = 2):
+        wolf_prior = total_wolves / len(player_ids)
+        self._log_odds[self._slots(player_ids)] = _logit(wolf_prior)
+        for player_id in player_ids:
+            self._reset_evidence(player_id)
+        logger.info(f"Initialized priors for {len(player_ids)} players")
+
+    def update_suspicion_batch(self, evidence: List[Dict[str, Any]]) -> Dict[str, float]:
+        """一次向量化更新一批证据，返回涉及玩家的最新后验
+
+        evidence 中每项包含 player_id、evidence_score，可选 evidence_type、description；
+        同一玩家的多条证据按顺序累加。
+        """
+        if not evidence:
+            return {}
+        slots = self._slots(item["player_id"] for item in evidence)
+        llr = self._log_likelihood_ratios(evidence)
+        np.add.at(self._log_odds, slots, llr)
+        touched = np.unique(slots)
+        self._clamp_slots(touched)
+
+        for item in evidence:
+            self._record_evidence(item)
+
+        posteriors = _sigmoid(self._log_odds[touched])
+        logger.debug(f"Applied {len(evidence)} evidence items to {len(touched)} players")
+        return {self._players[slot]: float(p) for slot, p in zip(touched, posteriors)}
+
+    def _clamp_slots(self, slots: np.ndarray):
+        # 批量更新在整批累加后限制一次；硬事实的 ±inf 保持不变
+        values = self._log_odds[slots]
+        finite = np.isfinite(values)
+        values[finite] = np.clip(values[finite], -self.max_log_odds, self.max_log_odds)
+        self._log_odds[slots] = values
+
+    def _set_role(self, player_id: str, is_wolf: bool):
+        self._log_odds[self._slots([player_id])] = np.inf if is_wolf else -np.inf
+
+    def get_suspicion(self, player_id: str) -> float:
+        slot = self._index.get(player_id)
+        if slot is None:
+            return _DEFAULT_PRIOR
+        return float(_sigmoid(self._log_odds[slot]))
+
+    def get_all_suspicions(self) -> Dict[str, float]:
+        return self.prior_probabilities
+
+    # ========== 状态 ==========
+    def to_state(self) -> Dict:
+        # 额外保存对数几率原值，恢复后继续累加时与不间断运行的结果逐位一致
+        state = super().to_state()
+        n = len(self._players)
+        state["log_odds"] = dict(zip(self._players, self._log_odds[:n].tolist()))
+        return state
+
+    def load_state(self, state: Dict):
+        super().load_state(state)
+        log_odds = state.get("log_odds")
+        if log_odds:
+            self._log_odds[self._slots(log_odds.keys())] = list(log_odds.values())
+
+    def reset(self):
+        self._index = {}
+        self._players = []
+        self._log_odds = np.zeros(16, dtype=np.float64)
+        self.evidence_history.clear()
+        logger.info("Bayesian inference model reset")
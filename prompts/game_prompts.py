@@ -1,16 +1,13 @@
 import json
 from typing import Any, Dict
 from prompts import YA_MCPServer_Prompt
-from core.database import GameDatabase
-from core.bayesian_inference import BayesianInference
-from core.knowledge_graph import KnowledgeGraph
+from core.session import get_registry
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("game_prompts")
 
-db = GameDatabase()
-bayesian = BayesianInference()
-knowledge_graph = KnowledgeGraph()
+registry = get_registry()
+db = registry.db
 
 
 @YA_MCPServer_Prompt(
@@ -35,7 +32,7 @@ async def analyze_game_situation_prompt(
         A detailed analysis prompt string
     """
     try:
-        game_state = db.get_game_state(game_id)
+        game_state = await db.get_game_state(game_id)
         if not game_state:
             return f"Game {game_id} not found. Please initialize the game first."
         
@@ -43,7 +40,7 @@ async def analyze_game_situation_prompt(
         current_round = game_state.get("current_round", 1)
         
         # Get all player profiles
-        profiles = db.get_all_player_profiles(game_id=game_id)
+        profiles = await db.get_all_player_profiles(game_id=game_id)
         suspicion_scores = {
             p["player_id"]: p.get("suspicion_score", 0.0)
             for p in profiles
@@ -51,7 +48,7 @@ async def analyze_game_situation_prompt(
         }
         
         # Get recent history
-        recent_history = db.get_game_history(game_id=game_id, limit=10)
+        recent_history = await db.get_game_history(game_id=game_id, limit=10)
         
         # Build analysis prompt
         prompt = f"""# Game Situation Analysis - Round {current_round}
@@ -70,7 +67,7 @@ async def analyze_game_situation_prompt(
                 prompt += f"- **Round {event['round_num']}** - {event['speaker']} ({event['action_type']}): {event['content'][:100]}\n"
         
         if focus_player:
-            relations = knowledge_graph.get_player_relations(focus_player)
+            relations = (await registry.get_async(game_id)).knowledge_graph.get_player_relations(focus_player)
             prompt += f"\n## Focus Player: {focus_player}\n"
             if relations.get("outgoing"):
                 prompt += f"**Attacks/Supports**: {len(relations['outgoing'])} outgoing relations\n"
@@ -120,14 +117,14 @@ async def decision_making_guide_prompt(
         A decision-making prompt string
     """
     try:
-        game_state = db.get_game_state(game_id)
+        game_state = await db.get_game_state(game_id)
         if not game_state:
             return f"Game {game_id} not found."
         
         alive_players = game_state.get("alive_players", [])
         current_round = game_state.get("current_round", 1)
         
-        profiles = db.get_all_player_profiles(game_id=game_id)
+        profiles = await db.get_all_player_profiles(game_id=game_id)
         suspicion_scores = {
             p["player_id"]: p.get("suspicion_score", 0.0)
             for p in profiles
@@ -232,11 +229,12 @@ async def player_investigation_prompt(
         An investigation prompt string
     """
     try:
-        profile = db.get_player_profile(player_id)
+        profile = await db.get_player_profile(player_id)
         if not profile:
             return f"Player {player_id} not found in game {game_id}."
         
-        history = db.get_game_history(game_id=game_id, speaker=player_id, limit=20)
+        history = await db.get_game_history(game_id=game_id, speaker=player_id, limit=20)
+        knowledge_graph = (await registry.get_async(game_id)).knowledge_graph
         relations = knowledge_graph.get_player_relations(player_id)
         
         prompt = f"""# Player Investigation: {player_id}
@@ -309,7 +307,7 @@ async def game_strategy_guide_prompt(
         A strategy guide prompt string
     """
     try:
-        game_state = db.get_game_state(game_id)
+        game_state = await db.get_game_state(game_id)
         if not game_state:
             return f"Game {game_id} not found."
         
@@ -317,7 +315,7 @@ async def game_strategy_guide_prompt(
         current_round = game_state.get("current_round", 1)
         alive_count = len(alive_players)
         
-        profiles = db.get_all_player_profiles(game_id=game_id)
+        profiles = await db.get_all_player_profiles(game_id=game_id)
         high_suspicion = [
             p["player_id"] for p in profiles
             if p.get("suspicion_score", 0.0) > 0.7 and p["player_id"] in alive_players
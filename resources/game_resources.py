@@ -1,13 +1,13 @@
 import os
 import json
 from resources import YA_MCPServer_Resource
-from typing import Any
-from core.database import GameDatabase
+from typing import Any, Optional
+from core.session import get_registry
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("game_resources")
 
-db = GameDatabase()
+db = get_registry().db
 
 
 @YA_MCPServer_Resource(
@@ -16,7 +16,7 @@ db = GameDatabase()
     title="Game State Resource",
     description="Get current game state including alive players, round number, and game status"
 )
-def get_game_state_resource(game_id: str) -> Any:
+async def get_game_state_resource(game_id: str) -> Any:
     """
     Get current game state as a resource.
     
@@ -27,7 +27,7 @@ def get_game_state_resource(game_id: str) -> Any:
         JSON string containing game state information
     """
     try:
-        game_state = db.get_game_state(game_id)
+        game_state = await db.get_game_state(game_id)
         if not game_state:
             return json.dumps({"error": "Game not found", "game_id": game_id}, ensure_ascii=False)
         
@@ -51,7 +51,7 @@ def get_game_state_resource(game_id: str) -> Any:
     title="Player Profile Resource",
     description="Get player profile including suspicion score, assumed role, and personality"
 )
-def get_player_profile_resource(player_id: str) -> Any:
+async def get_player_profile_resource(player_id: str) -> Any:
     """
     Get player profile as a resource.
     
@@ -62,7 +62,7 @@ def get_player_profile_resource(player_id: str) -> Any:
         JSON string containing player profile information
     """
     try:
-        profile = db.get_player_profile(player_id)
+        profile = await db.get_player_profile(player_id)
         if not profile:
             return json.dumps({"error": "Player not found", "player_id": player_id}, ensure_ascii=False)
         
@@ -87,7 +87,7 @@ def get_player_profile_resource(player_id: str) -> Any:
     title="Game History Resource",
     description="Get game history for a specific game (last 50 records). Use the recall_memory tool for filtered queries."
 )
-def get_game_history_resource(game_id: str) -> Any:
+async def get_game_history_resource(game_id: str) -> Any:
     """
     Get game history as a resource.
     
@@ -97,16 +97,46 @@ def get_game_history_resource(game_id: str) -> Any:
     Returns:
         JSON string containing game history (last 50 records)
     """
+    return await _game_history_page(game_id)
+
+
+@YA_MCPServer_Resource(
+    "game://game_history/{game_id}/before/{before_id}",
+    name="game_history_page_resource",
+    title="Game History Page Resource",
+    description="Get the next 50 game history records older than before_id. Use next_before_id from the previous page as the cursor."
+)
+async def get_game_history_page_resource(game_id: str, before_id: str) -> Any:
+    """
+    Get one page of game history older than a record ID.
+    
+    Args:
+        game_id: The game identifier
+        before_id: Record ID cursor from the previous page's next_before_id
+        
+    Returns:
+        JSON string containing up to 50 records older than before_id
+    """
     try:
-        history = db.get_game_history(
+        cursor_id = int(before_id)
+    except ValueError:
+        return json.dumps({"error": "before_id must be an integer", "before_id": before_id}, ensure_ascii=False)
+    return await _game_history_page(game_id, before_id=cursor_id)
+
+
+async def _game_history_page(game_id: str, before_id: Optional[int] = None, limit: int = 50) -> str:
+    try:
+        history = await db.get_game_history(
             game_id=game_id,
-            limit=50
+            limit=limit,
+            before_id=before_id
         )
         
         result = {
             "game_id": game_id,
-            "round_num": round_num,
+            "before_id": before_id,
             "count": len(history),
+            "next_before_id": history[-1]["id"] if len(history) == limit else None,
             "history": [
                 {
                     "id": record.get("id"),
@@ -126,6 +156,50 @@ def get_game_history_resource(game_id: str) -> Any:
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
 
+@YA_MCPServer_Resource(
+    "game://suspicion_evidence/{game_id}/{player_id}",
+    name="suspicion_evidence_resource",
+    title="Suspicion Evidence Resource",
+    description="Get the full suspicion evidence log for a player (last 50 records). The inference engine only keeps the most recent evidence in memory."
+)
+async def get_suspicion_evidence_resource(game_id: str, player_id: str) -> Any:
+    """
+    Get a player's suspicion evidence as a resource.
+
+    Args:
+        game_id: The game identifier
+        player_id: The player identifier
+
+    Returns:
+        JSON string containing the player's evidence records, newest first
+    """
+    try:
+        limit = 50
+        evidence = await db.get_suspicion_evidence(game_id, player_id=player_id, limit=limit)
+
+        result = {
+            "game_id": game_id,
+            "player_id": player_id,
+            "count": len(evidence),
+            "next_before_id": evidence[-1]["id"] if len(evidence) == limit else None,
+            "evidence": [
+                {
+                    "id": record["id"],
+                    "evidence_score": record["evidence_score"],
+                    "evidence_type": record["evidence_type"],
+                    "description": record["description"],
+                    "created_at": record["created_at"]
+                }
+                for record in evidence
+            ]
+        }
+
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"Error getting suspicion evidence resource: {e}")
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
+
+
 @YA_MCPServer_Resource(
     "file:///docs/GAME_USAGE.md",
     name="game_usage_guide",
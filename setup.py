@@ -1,3 +1,4 @@
+from modules.YA_Common.utils.config import get_config
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("setup")
@@ -6,6 +7,18 @@ logger = get_logger("setup")
 def setup():
     """Setup your environment and dependencies here."""
     try:
+        # 延迟导入：打开数据库前先完成配置/日志初始化
+        from core.calibration import get_calibration
+        from core.session import get_registry
+
+        # 启动时加载在线校准映射，工具调用时不再读库
+        get_calibration(get_registry().db.db)
+        if get_config("session.checkpoint.warm_restart", True):
+            get_registry().checkpoints.warm_restart()
+        if get_config("database.maintenance.enabled", False):
+            from core.maintenance import MaintenanceJob
+
+            MaintenanceJob(get_registry().db.db, registry=get_registry()).start()
         logger.info("Setup complete.")
     except Exception as e:
         logger.error(f"Setup failed: {e}")
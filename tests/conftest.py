@@ -0,0 +1,53 @@
+"""
+共享测试夹具：随机关系图（KnowledgeGraph 邻接索引与图中心性测试共用）、会话注册表工厂
+"""
+
+import random
+
+import pytest
+
+from core.async_database import AsyncGameDatabase
+from core.checkpoint import CheckpointManager
+from core.database import GameDatabase
+from core.knowledge_graph import KnowledgeGraph
+from core.session import SessionRegistry
+
+
+@pytest.fixture(params=[(3, 8, 200), (5, 10, 120)], ids=lambda param: "seed{}-players{}-relations{}".format(*param))
+def graph(request):
+    """(随机种子, 玩家数, 关系数) 生成的随机关系图，另含一个孤立玩家、一条默认权重的边和一个自环"""
+    seed, player_count, relation_count = request.param
+    rng = random.Random(seed)
+    players = [f"p{i}" for i in range(player_count)]
+    graph = KnowledgeGraph()
+    graph.add_nodes(players + ["idle"])
+    for _ in range(relation_count):
+        graph.add_edge(rng.choice(players), rng.choice(players), rng.choice(["support", "attack", "vote"]), rng.random())
+    graph.add_edges([
+        {"source": "p0", "target": "p1", "relation_type": "support"},
+        {"source": "p0", "target": "p0", "relation_type": "support", "weight": 0.5},
+    ])
+    return graph
+
+
+@pytest.fixture
+def make_registry(tmp_path):
+    """会话注册表工厂，同一测试中创建的注册表共用 tmp_path 下的数据库文件（用于模拟重启）
+
+    checkpoints 为每隔多少个事件保存一次检查点，None 表示不挂载 CheckpointManager。
+    """
+    created = []
+
+    def factory(pooled=True, checkpoints=None, storage_mode="single", **kwargs):
+        database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=pooled, storage_mode=storage_mode)
+        adb = AsyncGameDatabase(database, reader_threads=1)
+        created.append(adb)
+        kwargs.setdefault("idle_ttl_seconds", 0)
+        registry = SessionRegistry(adb, **kwargs)
+        if checkpoints is not None:
+            CheckpointManager(registry, every_events=checkpoints).attach()
+        return registry
+
+    yield factory
+    for adb in created:
+        adb.close()
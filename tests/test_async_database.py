@@ -0,0 +1,97 @@
+"""
+AsyncGameDatabase 单元测试：验证数据库调用不阻塞事件循环
+"""
+
+import asyncio
+import threading
+import time
+
+from core.async_database import AsyncGameDatabase
+from core.database import GameDatabase
+
+
+def _make(tmp_path) -> AsyncGameDatabase:
+    return AsyncGameDatabase(GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True), reader_threads=2)
+
+
+def test_async_round_trip(tmp_path):
+    adb = _make(tmp_path)
+
+    async def scenario():
+        event_id = await adb.record_event(1, "player1", "hello", "speak", game_id="g1")
+        await adb.update_game_state("g1", current_round=1, alive_players=["player1"], game_status="active")
+        history = await adb.get_game_history(game_id="g1")
+        state = await adb.get_game_state("g1")
+        return event_id, history, state
+
+    event_id, history, state = asyncio.run(scenario())
+    adb.close()
+    assert history[0]["id"] == event_id
+    assert state["alive_players"] == ["player1"]
+
+
+def test_slow_query_does_not_block_event_loop(tmp_path):
+    adb = _make(tmp_path)
+    main_thread = threading.get_ident()
+    seen_threads = []
+
+    def slow_query():
+        seen_threads.append(threading.get_ident())
+        time.sleep(0.2)
+        return "done"
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await adb.run_read(slow_query)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    adb.close()
+    assert result == "done"
+    assert seen_threads and seen_threads[0] != main_thread
+    # 慢查询期间事件循环仍在调度其他协程
+    assert ticks >= 5
+
+
+def test_group_commit_sizes_writer_pool(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, group_commit_window_ms=20)
+    adb = AsyncGameDatabase(database, reader_threads=1, writer_threads=0)
+    assert adb._writers._max_workers > 1
+    commits = []
+    original = database._commit_pending
+
+    def counting_commit():
+        commits.append(1)
+        original()
+
+    database._commit_pending = counting_commit
+
+    async def scenario():
+        return await asyncio.gather(*[
+            adb.record_event(1, f"p{i}", "x", "speak", game_id="g1") for i in range(8)
+        ])
+
+    ids = asyncio.run(scenario())
+    adb.close()
+    assert len(set(ids)) == 8
+    # 并发写入落在同一窗口内，共享 commit
+    assert len(commits) < 8
+
+
+def test_auto_writer_pool_stays_single_without_group_commit(tmp_path):
+    adb = AsyncGameDatabase(
+        GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, group_commit_window_ms=0),
+        reader_threads=1,
+        writer_threads=0
+    )
+    assert adb._writers._max_workers == 1
+    adb.close()
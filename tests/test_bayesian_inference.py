@@ -0,0 +1,150 @@
+"""
+BayesianInference 单元测试：对数几率累加与限幅、证据环形缓冲、状态兼容、证据日志分页与逐条去掉证据的敏感度分析
+"""
+
+import math
+import sys
+
+import numpy as np
+import pytest
+
+from core.bayesian_inference import ROLE_FACT, BayesianInference
+from core.database import GameDatabase
+from core.evidence_buffer import EvidenceBuffer, EvidenceRecord
+from core.joint_inference import JointBayesianInference
+from core.sampling_inference import SamplingBayesianInference
+from core.vectorized_inference import VectorizedBayesianInference
+
+
+@pytest.mark.parametrize("engine_cls", [BayesianInference, VectorizedBayesianInference, JointBayesianInference])
+def test_confident_evidence_does_not_saturate(engine_cls):
+    engine = engine_cls()
+    engine.initialize_priors(["a", "b", "c"], total_wolves=1)
+    for _ in range(2000):
+        engine.update_suspicion("a", 1.0)
+
+    saturated = engine.get_suspicion("a")
+    assert saturated < 1.0
+    engine.update_suspicion("a", 0.0)
+    assert engine.get_suspicion("a") < saturated
+
+    engine.observe_role("b", is_wolf=True)
+    assert engine.get_suspicion("b") == 1.0
+    engine.update_suspicion("b", 0.0)
+    assert engine.get_suspicion("b") == 1.0
+
+
+def test_scalar_updates_accumulate_log_odds():
+    engine = BayesianInference()
+    engine.initialize_priors(["a", "b"], total_wolves=1)
+    for score in (0.9, 0.2, 0.7):
+        engine.update_suspicion("a", score)
+    expected = sum(math.log((1 + s) / (2 - s)) for s in (0.9, 0.2, 0.7))
+    assert math.log(engine.get_suspicion("a") / (1 - engine.get_suspicion("a"))) == pytest.approx(expected)
+
+
+def test_evidence_history_is_a_bounded_ring_buffer():
+    engine = VectorizedBayesianInference()
+    engine.evidence_capacity = 4
+    engine.initialize_priors(["a", "b"], total_wolves=1)
+    engine.update_suspicion_batch([
+        {"id": i, "player_id": "a", "evidence_score": 0.5, "evidence_type": "vote_" + "pattern", "description": str(i)}
+        for i in range(1, 11)
+    ])
+
+    history = engine.evidence_history["a"]
+    assert len(history) == 4 and history.total == 10
+    assert engine.evidence_count("a") == 10
+    assert [record.id for record in history] == [7, 8, 9, 10]
+    assert history.oldest_id == 7 and history[-1].description == "10"
+    assert history[0].type is history[1].type is sys.intern("vote_pattern")
+
+    restored = VectorizedBayesianInference()
+    restored.evidence_capacity = 4
+    restored.load_state(engine.to_state())
+    assert restored.evidence_history == engine.evidence_history
+
+
+def test_buffer_loads_legacy_list_state():
+    buffer = EvidenceBuffer.from_state(
+        [{"score": 0.1 * i, "type": "general", "description": ""} for i in range(5)], capacity=3
+    )
+    assert len(buffer) == 3 and buffer.total == 5
+    assert buffer[0] == EvidenceRecord(0.2, "general")
+    with pytest.raises(IndexError):
+        buffer[3]
+
+
+def test_older_evidence_is_paged_from_the_log(tmp_path):
+    db = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=False)
+    try:
+        db.record_suspicion_evidence_many("g1", [
+            {"player_id": "a" if i % 2 else "b", "evidence_score": 0.5, "description": str(i)} for i in range(10)
+        ])
+        page = db.get_suspicion_evidence("g1", player_id="a", limit=3)
+        assert [row["description"] for row in page] == ["9", "7", "5"]
+        older = db.get_suspicion_evidence("g1", player_id="a", limit=3, before_id=page[-1]["id"])
+        assert [row["description"] for row in older] == ["3", "1"]
+    finally:
+        db.close()
+
+
+def _replay(engine_factory, evidence):
+    engine = engine_factory()
+    engine.initialize_priors(["a", "b", "c", "d", "e"], total_wolves=2)
+    for item in evidence:
+        if item["evidence_type"] == ROLE_FACT:
+            engine.observe_role(item["player_id"], item["evidence_score"] == 1.0)
+        else:
+            engine.update_suspicion_batch([item])
+    return engine
+
+
+_LOO_EVIDENCE = [
+    {"player_id": "a", "evidence_score": 0.9, "evidence_type": "vote"},
+    {"player_id": "b", "evidence_score": 0.2, "evidence_type": "speech"},
+    {"player_id": "a", "evidence_score": 0.7, "evidence_type": "speech"},
+    {"player_id": "c", "evidence_score": 0.0, "evidence_type": ROLE_FACT},
+    {"player_id": "d", "evidence_score": 0.95, "evidence_type": "vote"},
+]
+
+
+@pytest.mark.parametrize(
+    "engine_factory",
+    [BayesianInference, VectorizedBayesianInference, lambda: JointBayesianInference(fallback="vectorized")],
+    ids=["scalar", "vectorized", "joint"]
+)
+def test_leave_one_out_matches_replay_without_each_item(engine_factory):
+    engine = _replay(engine_factory, _LOO_EVIDENCE)
+    players, current, without = engine.leave_one_out(_LOO_EVIDENCE)
+    assert np.allclose(current, [engine.get_suspicion(player_id) for player_id in players])
+    for row, item in enumerate(_LOO_EVIDENCE):
+        if item["evidence_type"] == ROLE_FACT:
+            # 硬事实不可去掉
+            assert np.allclose(without[row], current)
+            continue
+        expected = _replay(engine_factory, _LOO_EVIDENCE[:row] + _LOO_EVIDENCE[row + 1:])
+        assert np.allclose(without[row], [expected.get_suspicion(player_id) for player_id in players])
+
+
+def test_leave_one_out_in_joint_model_moves_other_players():
+    engine = _replay(lambda: JointBayesianInference(fallback="vectorized"), _LOO_EVIDENCE)
+    players, current, without = engine.leave_one_out(_LOO_EVIDENCE[:1])
+    # 去掉指向 a 的证据后 a 下降，其余玩家上升（狼人数固定）
+    delta = dict(zip(players, without[0] - current))
+    assert delta["a"] < 0
+    assert all(delta[player_id] > 0 for player_id in ("b", "d", "e"))
+    assert delta["c"] == 0.0
+
+
+def test_sampling_leave_one_out_approximates_joint():
+    exact = _replay(lambda: JointBayesianInference(fallback="vectorized"), _LOO_EVIDENCE)
+    sampled = _replay(
+        lambda: SamplingBayesianInference(chains=32, workers=1, time_budget_ms=2000, max_sweeps=1500, seed=5),
+        _LOO_EVIDENCE
+    )
+    exact_players, exact_current, exact_without = exact.leave_one_out(_LOO_EVIDENCE)
+    players, current, without = sampled.leave_one_out(_LOO_EVIDENCE)
+    order = [players.index(player_id) for player_id in exact_players]
+    assert np.allclose(current[order], exact_current, atol=0.03)
+    assert np.allclose(without[:, order], exact_without, atol=0.03)
@@ -0,0 +1,125 @@
+"""
+后验校准：保序回归与 Platt 拟合、在线二分查表、文件往返，以及从已结束对局读取样本
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from core import calibration as calibration_module
+from core.calibration import (
+    CALIBRATION_MODEL_TYPE,
+    Calibration,
+    calibration_metrics,
+    finished_game_samples,
+    fit_calibration,
+    fit_isotonic,
+    load_calibration,
+)
+from core.async_database import AsyncGameDatabase
+from core.database import GameDatabase
+
+
+@pytest.fixture
+def overconfident():
+    # 引擎给出的后验 p 偏自信：真实狼人比例为 0.5 + (p - 0.5) / 2
+    rng = np.random.default_rng(11)
+    p = rng.uniform(0.0, 1.0, 4000)
+    y = rng.uniform(0.0, 1.0, 4000) < 0.5 + (p - 0.5) / 2
+    return list(zip(p.tolist(), y.tolist()))
+
+
+def test_isotonic_is_monotone_and_pools_violations():
+    x, y = fit_isotonic(np.array([0.1, 0.2, 0.3, 0.4]), np.array([0.0, 1.0, 0.0, 1.0]))
+    assert np.allclose(x, [0.1, 0.25, 0.4])
+    assert np.allclose(y, [0.0, 0.5, 1.0])
+
+
+@pytest.mark.parametrize("method", ["isotonic", "platt"])
+def test_fit_reduces_calibration_error(overconfident, method):
+    fitted = fit_calibration(overconfident, method=method, version="v1", min_samples=10)
+    metrics = calibration_metrics(overconfident, fitted)
+    assert metrics["samples"] == 4000
+    assert metrics["ece"] < metrics["ece_raw"] / 2
+    assert metrics["brier"] < metrics["brier_raw"]
+    assert fitted.apply(0.9) == pytest.approx(0.7, abs=0.05)
+    assert fitted.apply(0.1) == pytest.approx(0.3, abs=0.05)
+    if method == "platt":
+        assert fitted.params["a"] == pytest.approx(0.5, abs=0.15)
+
+
+def test_apply_interpolates_between_knots_and_clamps_ends():
+    calibration = Calibration("v", "isotonic", [0.2, 0.6], [0.1, 0.5])
+    assert calibration.apply(0.0) == 0.1
+    assert calibration.apply(0.4) == pytest.approx(0.3)
+    assert calibration.apply(1.0) == 0.5
+    assert np.allclose(calibration.apply_many([0.0, 0.4, 1.0]), [0.1, 0.3, 0.5])
+
+
+def test_fit_rejects_small_samples_and_unknown_methods():
+    with pytest.raises(ValueError):
+        fit_calibration([(0.5, True)], min_samples=2)
+    with pytest.raises(ValueError):
+        fit_calibration([(0.5, True)] * 5, method="beta", min_samples=1)
+
+
+def test_samples_and_versions_come_from_the_database(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    try:
+        for game_id, status in (("done", "finished"), ("live", "active")):
+            database.update_game_state(game_id, game_status=status)
+            database.record_suspicion_evidence(game_id, "w", 0.6, "vote")
+            database.record_suspicion_evidence(game_id, "w", 1.0, "role_fact", suspicion_before=0.7)
+            database.record_suspicion_evidence(game_id, "v", 0.0, "role_fact", suspicion_before=0.4)
+            # 已确定身份后重复写入的事实不是样本
+            database.record_suspicion_evidence(game_id, "w", 1.0, "role_fact", suspicion_before=1.0)
+        assert finished_game_samples(database) == [(0.7, True), (0.4, False)]
+
+        assert load_calibration(database, "latest") is None
+        fitted = fit_calibration([(0.7, True), (0.4, False)], version="calib_1", min_samples=1)
+        path = str(tmp_path / "calibration" / "calib_1.json")
+        fitted.save(path)
+        database.create_model_version("calib_1", "suspicion_calibration", CALIBRATION_MODEL_TYPE, path)
+        database.create_model_version("model_1", "lstm", "LSTM", str(tmp_path / "model.pth"))
+
+        loaded = load_calibration(database, "latest")
+        assert loaded.info() == {"version": "calib_1", "method": "isotonic"}
+        assert loaded.apply(0.55) == pytest.approx(fitted.apply(0.55))
+        assert load_calibration(database, None) is None
+        with pytest.raises(ValueError):
+            load_calibration(database, "model_1")
+    finally:
+        database.close()
+
+
+def test_active_calibration_is_cached_until_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration_module, "_active", None)
+    monkeypatch.setattr(calibration_module, "_loaded", False)
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    try:
+        assert calibration_module.get_calibration(database) is None
+        replacement = Calibration("v2", "platt", [0.0, 1.0], [0.2, 0.8])
+        calibration_module.set_calibration(replacement)
+        assert calibration_module.get_calibration(database) is replacement
+    finally:
+        database.close()
+
+
+def test_async_lookup_loads_off_the_event_loop_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration_module, "_active", None)
+    monkeypatch.setattr(calibration_module, "_loaded", False)
+    adb = AsyncGameDatabase(GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True), reader_threads=1)
+    threads = []
+    load = calibration_module.load_calibration
+    monkeypatch.setattr(
+        calibration_module, "load_calibration",
+        lambda db, version: threads.append(threading.current_thread()) or load(db, version)
+    )
+    try:
+        for _ in range(2):
+            assert asyncio.run(calibration_module.get_calibration_async(adb)) is None
+        assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    finally:
+        adb.close()
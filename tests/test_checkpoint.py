@@ -0,0 +1,230 @@
+"""
+检查点与热重启单元测试：检查点 + 增量重放恢复的状态与持续运行的状态一致
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from core.checkpoint import decode_state, encode_state
+
+
+async def _play(registry, game_id, events, evidence):
+    db = registry.db
+    session = registry.get(game_id)
+    for event in events:
+        event = {**event, "game_id": game_id}
+        event["id"] = await db.record_event(**event)
+        session.apply_history_events([event])
+        await registry.checkpoints.maybe_checkpoint(session)
+    for item in evidence:
+        item = dict(item)
+        item["id"] = await db.record_suspicion_evidence(game_id=game_id, **item)
+        session.apply_evidence(item)
+        await registry.checkpoints.maybe_checkpoint(session)
+    return session
+
+
+def _events(n):
+    return [
+        {
+            "round_num": i // 4 + 1,
+            "speaker": f"p{i % 4}",
+            "content": f"statement {i}",
+            "action_type": "speak",
+            "target_player": f"p{(i + 1) % 4}",
+            "relation_type": "attack" if i % 3 else "support",
+        }
+        for i in range(n)
+    ]
+
+
+def _evidence(n):
+    return [
+        {"player_id": f"p{i % 4}", "evidence_score": (i % 10) / 10, "evidence_type": "behavior", "description": str(i)}
+        for i in range(n)
+    ]
+
+
+def test_state_codec_round_trip():
+    state = {"bayesian": {"priors": {"p1": 0.25}}, "knowledge_graph": {"nodes": ["p1"]}}
+    assert decode_state(encode_state(state)) == state
+
+
+def test_restart_restores_checkpoint_plus_tail(make_registry):
+    registry = make_registry(checkpoints=4)
+
+    async def scenario():
+        session = registry.create("g1")
+        session.bayesian.initialize_priors(["p0", "p1", "p2", "p3"], total_wolves=1)
+        await registry.checkpoints.save_fresh(session)
+        return await _play(registry, "g1", _events(10), _evidence(7))
+
+    live = asyncio.run(scenario())
+    checkpoint = registry.db.db.get_engine_checkpoint("g1")
+    # 最后一个检查点之后仍有未保存的事件，需要增量重放
+    assert 0 < live.pending_events < 4
+    assert checkpoint["history_id"] <= live.history_id
+
+    restored = make_registry(checkpoints=3).checkpoints.restore("g1")
+
+    assert restored.to_state() == live.to_state()
+    assert restored.history_id == live.history_id
+    assert restored.evidence_id == live.evidence_id
+
+
+def test_checkpoint_keeps_total_wolves(make_registry):
+    registry = make_registry(checkpoints=1)
+    session = registry.create("g1")
+    session.bayesian.initialize_priors(["p0", "p1", "p2"], total_wolves=1)
+    session.total_wolves = 1
+    asyncio.run(registry.checkpoints.save_fresh(session))
+
+    assert make_registry(checkpoints=3).checkpoints.restore("g1").total_wolves == 1
+
+
+def test_reset_watermark_separates_old_evidence(make_registry):
+    registry = make_registry(checkpoints=2)
+
+    async def scenario():
+        await _play(registry, "g1", [], _evidence(3))
+        session = registry.create("g1")
+        session.bayesian.initialize_priors(["p0", "p1", "p2", "p3"], total_wolves=1)
+        await registry.checkpoints.save_fresh(session)
+        return await _play(registry, "g1", [], _evidence(5))
+
+    live = asyncio.run(scenario())
+    restored = make_registry(checkpoints=3).checkpoints.restore("g1")
+    current = list(registry.db.db.iter_suspicion_evidence("g1", after_id=restored.reset_evidence_id))
+
+    assert restored.reset_evidence_id == live.reset_evidence_id > 0
+    assert [item["id"] for item in current] == list(range(live.reset_evidence_id + 1, live.evidence_id + 1))
+
+
+def test_restore_without_checkpoint_replays_full_log(make_registry):
+    registry = make_registry(checkpoints=0)
+    live = asyncio.run(_play(registry, "g1", _events(5), _evidence(3)))
+    assert registry.db.db.get_engine_checkpoint("g1") is None
+
+    restored = make_registry(checkpoints=3).checkpoints.restore("g1")
+
+    assert restored.to_state() == live.to_state()
+
+
+def test_evicted_session_is_restored_on_next_access(make_registry):
+    registry = make_registry(checkpoints=100, max_sessions=1, max_memory_mb=64)
+    live_state = asyncio.run(_play(registry, "g1", _events(6), _evidence(2))).to_state()
+
+    registry.get("g2")  # 淘汰 g1，淘汰回调异步保存检查点
+    assert registry.peek("g1") is None
+
+    assert registry.get("g1").to_state() == live_state
+
+
+def test_async_get_restores_off_the_event_loop_once(make_registry):
+    registry = make_registry(checkpoints=100, max_sessions=1, max_memory_mb=64)
+    live_state = asyncio.run(_play(registry, "g1", _events(6), _evidence(2))).to_state()
+    registry.drop("g1")
+
+    restore = registry.checkpoints.restore
+    threads = []
+
+    def tracking_restore(game_id):
+        threads.append(threading.current_thread())
+        return restore(game_id)
+
+    registry.set_loader(tracking_restore)
+
+    async def concurrent():
+        return await asyncio.gather(registry.get_async("g1"), registry.get_async("g1"))
+
+    first, second = asyncio.run(concurrent())
+    assert first is second
+    assert first.to_state() == live_state
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+
+
+def test_events_written_before_restore_are_not_applied_twice(make_registry):
+    registry = make_registry(checkpoints=3)
+    asyncio.run(_play(registry, "g1", _events(2), []))
+    registry.drop("g1")
+
+    event = {**_events(3)[2], "game_id": "g1"}
+    event["id"] = registry.db.db.record_event(**event)
+    session = registry.get("g1")  # 恢复时已重放该事件
+    assert session.apply_history_events([event]) == 0
+    assert sum(len(e["relations"]) for e in session.knowledge_graph.edges.values()) == 3
+
+
+def test_warm_restart_restores_active_games(make_registry):
+    registry = make_registry(checkpoints=3)
+    for game_id in ("g1", "g2"):
+        registry.db.db.update_game_state(game_id, current_round=1, alive_players=["p0"], game_status="active")
+    registry.db.db.update_game_state("done", current_round=3, alive_players=[], game_status="finished")
+    states = {g: asyncio.run(_play(registry, g, _events(5), _evidence(2))).to_state() for g in ("g1", "g2")}
+
+    restarted = make_registry(checkpoints=3)
+    result = restarted.checkpoints.warm_restart()
+
+    assert result["games"] == 2
+    assert sorted(restarted.game_ids()) == ["g1", "g2"]
+    assert {g: restarted.peek(g).to_state() for g in ("g1", "g2")} == states
+
+
+@pytest.mark.parametrize("storage_mode", ["single", "per_game"])
+def test_archiving_in_reverse_order_keeps_checkpoint_replay_consistent(make_registry, storage_mode):
+    registry = make_registry(checkpoints=4, storage_mode=storage_mode)
+
+    async def scenario():
+        live = {}
+        for game_id in ("a", "b"):
+            session = registry.create(game_id)
+            session.bayesian.initialize_priors(["p0", "p1", "p2", "p3"], total_wolves=1)
+            await registry.checkpoints.save_fresh(session)
+        for _ in range(2):
+            for game_id in ("a", "b"):
+                live[game_id] = await _play(registry, game_id, _events(3), _evidence(2))
+        return live
+
+    live = asyncio.run(scenario())
+    database = registry.db.db
+    ids = {game_id: [h["id"] for h in database.get_game_history(game_id=game_id)] for game_id in live}
+    for game_id in ("b", "a"):
+        database.archive_game(game_id, month="2024-05")
+        registry.drop(game_id)
+
+    restarted = make_registry(checkpoints=3, storage_mode=storage_mode)
+    for game_id, session in live.items():
+        restored = restarted.checkpoints.restore(game_id)
+        assert restored.knowledge_graph.to_state() == session.knowledge_graph.to_state()
+        # 证据随历史移入归档文件，恢复时仍能重放到最后一条
+        assert restored.evidence_id == session.evidence_id
+        if storage_mode == "single":
+            # 事件ID原样保留：检查点水位与分页游标仍然有效
+            assert [h["id"] for h in database.get_game_history(game_id=game_id)] == ids[game_id]
+            assert restored.to_state() == session.to_state()
+
+
+def test_journal_applies_concurrent_writes_in_id_order(make_registry):
+    registry = make_registry(checkpoints=1)
+    watermarks = []
+
+    async def write(event, delay):
+        async with registry.journal("g1"):
+            event = {**event, "game_id": "g1"}
+            event["id"] = await registry.db.record_event(**event)
+            # 先写入的调用晚恢复执行：没有日志锁时后一个事件会先被应用并写入检查点
+            await asyncio.sleep(delay)
+            session = await registry.get_async("g1")
+            session.apply_history_events([event])
+            await registry.checkpoints.maybe_checkpoint(session)
+            watermarks.append((event["id"], registry.db.db.get_engine_checkpoint("g1")["history_id"]))
+
+    async def scenario():
+        first, second = _events(2)
+        await asyncio.gather(write(first, 0.05), write(second, 0.0))
+
+    asyncio.run(scenario())
+
+    assert watermarks == [(1, 1), (2, 2)]
@@ -0,0 +1,89 @@
+"""
+增量社区划分：间接协作的狼队被聚为一个社区，增量更新收敛到局部最优，候选队伍按人数修整
+"""
+
+import random
+
+import pytest
+
+from core.community import SignedCommunities
+from core.knowledge_graph import KnowledgeGraph
+
+
+def _objective(communities):
+    total = 0.0
+    for members in communities.members.values():
+        members = sorted(members)
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                total += communities._weight(a, b) - communities.resolution
+    return total
+
+
+@pytest.fixture
+def graph():
+    graph = KnowledgeGraph()
+    # 狼队 w1-w2-w3 通过链式支持协作，w1 与 w3 之间没有直接关系
+    graph.add_edge("w1", "w2", "support")
+    graph.add_edge("w2", "w3", "support")
+    graph.add_edge("w3", "w2", "support")
+    graph.add_edge("w2", "w1", "support")
+    graph.add_edge("g1", "w1", "attack")
+    graph.add_edge("w3", "g1", "attack")
+    graph.add_edge("g1", "g2", "support")
+    graph.add_edge("g2", "g1", "support", 0.5)
+    graph.add_edge("g2", "w2", "vote")
+    return graph
+
+
+def test_indirect_team_is_one_community(graph):
+    assert graph.detect_wolf_pair(threshold=0.7) == [
+        ("w1", "w2"), ("w2", "w3"), ("w3", "w2"), ("w2", "w1"), ("g1", "g2"), ("g2", "g1")
+    ]
+    communities = sorted(sorted(c) for c in graph.communities.communities())
+    assert communities == [["g1", "g2"], ["w1", "w2", "w3"]]
+
+    teams = graph.candidate_teams(3)
+    assert teams[0]["players"] == ["w1", "w2", "w3"]
+    assert teams[0]["cohesion"] == pytest.approx(4 / 3)
+    # g1/g2 没有其他正权重邻居，队伍不足 3 人
+    assert teams[1]["players"] == ["g1", "g2"]
+    assert graph.candidate_teams(2, top_k=1)[0]["cohesion"] == pytest.approx(2.0)
+    assert graph.candidate_teams(3) is teams
+
+
+def test_attack_splits_a_community(graph):
+    for _ in range(3):
+        graph.add_edge("w1", "w3", "attack")
+    communities = sorted(sorted(c) for c in graph.communities.communities())
+    assert ["w1", "w2", "w3"] not in communities
+
+
+def test_incremental_updates_reach_a_local_optimum():
+    rng = random.Random(7)
+    players = [f"p{i}" for i in range(30)]
+    graph = KnowledgeGraph()
+    for _ in range(600):
+        graph.add_edge(rng.choice(players), rng.choice(players), rng.choice(["support", "support", "attack"]), rng.random())
+    communities = graph.communities
+    before = _objective(communities)
+    # 预算足够时增量结果已经稳定：再做一轮全量局部移动没有可改进的玩家
+    assert communities.refine(sorted(communities.labels)) == 0
+    assert _objective(communities) == pytest.approx(before)
+
+    restored = KnowledgeGraph()
+    restored.load_state(graph.to_state())
+    for player_id, neighbors in communities.weights.items():
+        assert restored.communities.weights[player_id] == pytest.approx(neighbors)
+    assert restored.communities.refine(sorted(restored.communities.labels)) == 0
+
+
+def test_teams_are_trimmed_to_size():
+    communities = SignedCommunities(resolution=0.1)
+    for a, b, weight in [("a", "b", 3.0), ("b", "c", 3.0), ("a", "c", 3.0), ("c", "d", 0.5), ("a", "d", 0.5)]:
+        communities.add_relation(a, b, "support", weight)
+    communities.refine("abcd")
+    assert communities.communities() == [{"a", "b", "c", "d"}]
+    assert communities.candidate_teams(3) == [{"players": ["a", "b", "c"], "cohesion": 3.0, "community_size": 4}]
+    assert not communities.add_relation("a", "a", "support", 1.0)
+    assert not communities.add_relation("a", "e", "vote", 1.0)
@@ -0,0 +1,66 @@
+"""
+矛盾索引单元测试：完整词匹配、否定范围、倒排索引查询与会话集成
+"""
+
+import pytest
+
+from core.bayesian_inference import BayesianInference
+from core.contradiction_index import ContradictionIndex, ContradictionLexicon
+from core.session import GameSession
+
+
+def test_keywords_match_whole_words_and_longest_phrase():
+    lexicon = ContradictionLexicon()
+    assert "kw:is" not in lexicon.features("this thing")
+    assert not lexicon.contradicts("this thing", "not sure")
+    assert lexicon.features("I didn't see p3") >= {"kw:didn't see", "-p3"}
+    assert "kw:didn't" not in lexicon.features("I didn't see p3")
+    assert lexicon.contradicts("I saw p3 last night", "I didn't see anyone")
+
+
+def test_negation_scope_polarity():
+    lexicon = ContradictionLexicon(keyword_pairs=[])
+    assert lexicon.contradicts("I am the seer", "I am not the seer")
+    assert not lexicon.contradicts("I am the seer", "p2 is not a wolf")
+    assert lexicon.contradicts("我是预言家", "我不是预言家")
+    assert lexicon.features("I am not the seer but I trust p2") >= {"-seer", "+trust", "+p2"}
+
+
+def test_configurable_lexicon():
+    lexicon = ContradictionLexicon(keyword_pairs=[["guard", "witch"]], polarity=False)
+    assert lexicon.contradicts("I am the guard", "I am the witch")
+    assert not lexicon.contradicts("I am the seer", "I am not the seer")
+
+
+def test_index_finds_contradicting_statements():
+    index = ContradictionIndex(ContradictionLexicon())
+    index.add("p1", 1, "I am the seer")
+    index.add("p1", 2, "p3 was quiet")
+    index.add("p1", 3, "I will vote p4")
+    index.add("p2", 4, "I am not the seer")
+
+    hits = index.find("p1", "I am not the seer and p3 wasn't quiet")
+    assert set(hits) == {1, 2}
+    assert "+seer" in hits[1]
+    assert index.find("p1", "I am not the seer", exclude_id=1) == {}
+    assert index.score("p1", "I never said that") == 0.0
+    assert index.score("p1", "I am not the seer") == pytest.approx(0.1)
+
+    restored = ContradictionIndex(ContradictionLexicon())
+    restored.load_state(index.to_state())
+    assert restored.find("p1", "I am not the seer and p3 wasn't quiet") == hits
+
+
+def test_session_indexes_history_and_legacy_api():
+    session = GameSession("g1")
+    session.apply_history_events([
+        {"id": 1, "round_num": 1, "speaker": "p1", "content": "I am the seer", "action_type": "speak"},
+        {"id": 2, "round_num": 1, "speaker": "p2", "content": "p1 is lying", "action_type": "speak"},
+    ])
+    assert set(session.contradictions.find("p1", "I am not the seer")) == {1}
+    assert session.contradictions.statement_count("p2") == 1
+
+    engine = BayesianInference()
+    history = [{"content": "I am the seer"}, {"content": "this is fine"}]
+    assert engine.analyze_contradiction("p1", "I am not the seer", history) == pytest.approx(0.3)
+    assert not engine._detect_contradiction("this", "not today")
@@ -0,0 +1,315 @@
+"""
+GameDatabase 单元测试（直接操作临时 SQLite 文件，无需启动 MCP 服务）
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from core.database import GameDatabase
+
+
+@pytest.fixture(params=[False, True], ids=["single", "pooled"])
+def db(request, tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=request.param, reader_pool_size=2)
+    yield database
+    database.close()
+
+
+def test_record_and_query_history(db):
+    db.record_event(1, "player1", "I am the seer", "speak", game_id="g1")
+    db.record_event(1, "player2", "player1 is lying", "speak", game_id="g1")
+    db.record_event(1, "player1", "other game", "speak", game_id="g2")
+
+    history = db.get_game_history(game_id="g1")
+    assert len(history) == 2
+    assert {h["speaker"] for h in history} == {"player1", "player2"}
+    assert len(db.get_game_history(game_id="g1", speaker="player1")) == 1
+
+
+def test_pooled_mode_uses_wal(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    mode = database.conn.execute("PRAGMA journal_mode").fetchone()[0]
+    database.close()
+    assert mode.lower() == "wal"
+
+
+def test_pooled_readers_are_read_only(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    with database._read() as conn:
+        with pytest.raises(Exception):
+            conn.execute("DELETE FROM GameHistory")
+    database.close()
+
+
+def test_concurrent_reads_and_writes(db):
+    errors = []
+
+    def writer():
+        try:
+            for i in range(50):
+                db.record_event(1, f"player{i % 5}", f"event {i}", "speak", game_id="g1")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(50):
+                db.get_game_history(game_id="g1", limit=10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert len(db.get_game_history(game_id="g1", limit=1000)) == 50
+
+
+def test_record_events_batch_returns_ordered_ids(db):
+    first = db.record_event(1, "player1", "before", "speak", game_id="g1")
+    ids = db.record_events([
+        {"round_num": 1, "speaker": "player2", "content": "a", "action_type": "speak", "game_id": "g1"},
+        {"round_num": 1, "speaker": "player3", "content": "b", "action_type": "vote", "game_id": "g1"},
+        {"round_num": 2, "speaker": "player4", "content": "c", "action_type": "speak", "game_id": "g1"},
+    ])
+    assert ids == [first + 1, first + 2, first + 3]
+    rows = {h["id"]: h for h in db.get_game_history(game_id="g1")}
+    assert rows[ids[1]]["speaker"] == "player3"
+    assert db.record_events([]) == []
+
+
+def test_group_commit_shares_commits(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, group_commit_window_ms=20)
+    commits = []
+    original = database._commit_pending
+
+    def counting_commit():
+        commits.append(1)
+        original()
+
+    database._commit_pending = counting_commit
+
+    ids = []
+    threads = [
+        threading.Thread(target=lambda i=i: ids.append(database.record_event(1, f"p{i}", "x", "speak", game_id="g1")))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(ids) == 8
+    assert len(commits) < 8
+    # 所有写入在返回前都已提交，只读连接可见
+    assert len(database.get_game_history(game_id="g1")) == 8
+    database.close()
+
+
+def test_history_keyset_pagination(db):
+    ids = db.record_events([
+        {"round_num": 1, "speaker": "player1", "content": f"s{i}", "action_type": "speak", "game_id": "g1"}
+        for i in range(7)
+    ])
+
+    page1 = db.get_game_history(game_id="g1", speaker="player1", limit=3)
+    assert [h["id"] for h in page1] == ids[::-1][:3]
+    page2 = db.get_game_history(game_id="g1", speaker="player1", limit=3, before_id=page1[-1]["id"])
+    assert [h["id"] for h in page2] == ids[::-1][3:6]
+    page3 = db.get_game_history(game_id="g1", speaker="player1", limit=3, before_id=page2[-1]["id"])
+    assert [h["id"] for h in page3] == ids[:1]
+
+
+def test_migrations_create_history_indexes(db):
+    with db._read() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('GameHistory')")}
+    assert version == GameDatabase.SCHEMA_VERSION
+    assert {"idx_history_game_speaker_round", "idx_history_game_action"} <= indexes
+
+
+def test_profile_upsert_keeps_unspecified_fields(db):
+    db.update_player_profile("player1", role_assumed="seer", game_id="g1")
+    assert db.get_player_profile("player1")["suspicion_score"] == 0.0
+
+    db.update_player_profile("player1", suspicion_score=0.8)
+    profile = db.get_player_profile("player1")
+    assert profile["role_assumed"] == "seer"
+    assert profile["suspicion_score"] == 0.8
+    assert profile["game_id"] == "g1"
+
+
+def test_profile_bulk_upsert(db):
+    db.update_player_profile("player1", role_assumed="seer", game_id="g1")
+    db.update_player_profiles_many(
+        [{"player_id": f"player{i}", "suspicion_score": i / 10} for i in range(1, 6)],
+        game_id="g1"
+    )
+    profiles = {p["player_id"]: p for p in db.get_all_player_profiles(game_id="g1")}
+    assert len(profiles) == 5
+    assert profiles["player1"]["role_assumed"] == "seer"
+    assert profiles["player3"]["suspicion_score"] == pytest.approx(0.3)
+
+
+def test_game_state_upsert(db):
+    db.update_game_state("g1", alive_players=["a", "b", "c"], game_status="active")
+    state = db.get_game_state("g1")
+    assert state["current_round"] == 1
+    db.update_game_state("g1", current_round=2)
+    state = db.get_game_state("g1")
+    assert state["current_round"] == 2
+    assert state["alive_players"] == ["a", "b", "c"]
+    assert state["game_status"] == "active"
+
+
+def test_iter_training_data_streams_all_rows_in_chunks(db):
+    for i in range(7):
+        db.create_training_data("ds1", {"score": i / 10}, "wolf" if i % 2 else "villager")
+    db.create_training_data("ds2", {"score": 1.0}, "wolf")
+
+    rows = list(db.iter_training_data(dataset_id="ds1", chunk_size=3))
+    assert [r["features"]["score"] for r in rows] == pytest.approx([i / 10 for i in range(7)])
+    assert db.count_training_data(dataset_id="ds1") == 7
+    assert db.count_training_data(dataset_id="ds1", label="wolf") == 3
+    assert db.has_training_data(dataset_id="ds2")
+    assert not db.has_training_data(dataset_id="missing")
+
+
+def test_iter_game_history_is_chronological(db):
+    ids = db.record_events([
+        {"round_num": 1, "speaker": f"player{i % 2}", "content": str(i), "action_type": "speak", "game_id": "g1"}
+        for i in range(5)
+    ])
+    assert [r["id"] for r in db.iter_game_history(game_id="g1", chunk_size=2)] == ids
+    assert [r["id"] for r in db.iter_game_history(game_id="g1", speaker="player0", chunk_size=2)] == ids[::2]
+    assert [r["id"] for r in db.iter_game_history(game_id="g1", after_id=ids[2])] == ids[3:]
+
+
+def test_float32_features_round_trip_and_json_fallback(db):
+    db.create_training_data("ds", {"b": 2.5, "a": 1}, "wolf", feature_encoding="float32")
+    db.create_training_data("ds", {"note": "ad-hoc", "a": 1}, "villager", feature_encoding="float32")
+    db.create_training_data("ds", {"a": 3.0, "b": 4.0}, "villager", feature_encoding="json")
+
+    rows = list(db.iter_training_data(dataset_id="ds"))
+    assert rows[0]["features"] == {"a": 1.0, "b": 2.5}
+    assert rows[1]["features"] == {"note": "ad-hoc", "a": 1}
+    assert rows[2]["features"] == {"a": 3.0, "b": 4.0}
+    assert "feature_blob" not in rows[0]
+
+    with db._read() as conn:
+        encodings = [r[0] for r in conn.execute("SELECT feature_encoding FROM TrainingData ORDER BY id")]
+    assert encodings == ["f32v1", "json", "json"]
+
+
+def test_load_training_matrix_is_contiguous(db):
+    for i in range(10):
+        db.create_training_data("ds", {"x": float(i), "y": float(-i)}, "wolf" if i % 2 else "villager",
+                                feature_encoding="float32")
+    db.create_training_data("ds", {"x": 1.0, "z": 2.0}, "wolf", feature_encoding="float32")
+
+    with pytest.raises(ValueError):
+        db.load_training_matrix(dataset_id="ds")
+
+    first_schema = db._schema_ids[("x", "y")]
+    data = db.load_training_matrix(dataset_id="ds", schema_id=first_schema, chunk_size=3)
+    assert data["feature_names"] == ["x", "y"]
+    assert data["features"].dtype == np.float32
+    assert data["features"].flags["C_CONTIGUOUS"]
+    assert data["features"].shape == (10, 2)
+    assert data["features"][:, 0].tolist() == [float(i) for i in range(10)]
+    assert list(data["labels"][:2]) == ["villager", "wolf"]
+
+    assert db.load_training_matrix(dataset_id="missing")["features"].shape == (0, 0)
+
+
+def _event(game_id, content):
+    return {"round_num": 1, "speaker": "player1", "content": content, "action_type": "speak", "game_id": game_id}
+
+
+def test_per_game_storage_routes_history_to_shards(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, storage_mode="per_game")
+    database.record_event(1, "player1", "hello", "speak", game_id="g1")
+    ids = database.record_events([_event("g2", "a"), _event("g1", "b"), _event("g2", "c")])
+
+    assert ids == [1, 2, 2]
+    assert sorted(p.name for p in (tmp_path / "shards").glob("*.db")) == ["g1.db", "g2.db"]
+    assert [h["content"] for h in database.iter_game_history(game_id="g1")] == ["hello", "b"]
+    assert [h["id"] for h in database.get_game_history(game_id="g2")] == [2, 1]
+    with database._read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM GameHistory").fetchone()[0] == 0
+    database.close()
+
+
+@pytest.mark.parametrize("storage_mode", ["single", "per_game"])
+def test_archive_game_moves_history_and_keeps_it_readable(tmp_path, storage_mode):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, storage_mode=storage_mode)
+    database.record_events([_event("g1", f"event {i}") for i in range(5)] + [_event("g2", "live")])
+
+    result = database.archive_game("g1", month="2024-05", chunk_size=2)
+
+    assert result["events"] == 5
+    assert result["archive_path"].endswith("history-2024-05.db")
+    assert not (tmp_path / "shards" / "g1.db").exists()
+    assert [h["content"] for h in database.iter_game_history(game_id="g1")] == [f"event {i}" for i in range(5)]
+    with pytest.raises(ValueError):
+        database.record_event(2, "player1", "too late", "speak", game_id="g1")
+    with pytest.raises(ValueError):
+        database.archive_game("g1")
+    database.close()
+
+    # 重新打开后仍能通过 GameArchive 找到归档位置
+    reopened = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, storage_mode=storage_mode)
+    assert len(reopened.get_game_history(game_id="g1")) == 5
+    assert [h["content"] for h in reopened.get_game_history(game_id="g2")] == ["live"]
+    reopened.close()
+
+
+def test_iter_all_history_spans_main_shards_and_archives(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True, storage_mode="per_game")
+    database.record_event(1, "player1", "no game", "speak")
+    # 超过单次 ATTACH 上限的分片数，验证分批读取
+    database.record_events([_event(f"g{i}", f"event {i}") for i in range(12)])
+    database.archive_game("g0", month="2024-05")
+
+    rows = list(database.iter_all_history(chunk_size=3))
+
+    assert len(rows) == 13
+    assert {r["source"] for r in rows if r["game_id"] == "g0"} == {"archive:history-2024-05"}
+    assert {r["source"] for r in rows if r["game_id"] is None} == {"main"}
+    assert [r["content"] for r in database.iter_all_history(game_id="g5")] == ["event 5"]
+    database.close()
+
+
+def test_search_game_history_ranks_matches_with_snippets(db):
+    db.record_event(1, "player1", "I am the seer and player3 is a wolf", "speak", game_id="g1")
+    db.record_event(1, "player2", "player3 claimed seer yesterday, player3 is suspicious", "speak", game_id="g1")
+    db.record_event(1, "player3", "I am a villager", "speak", game_id="g1")
+    ids = db.record_events([
+        {"round_num": 2, "speaker": "player4", "content": "seer seer player3", "action_type": "speak", "game_id": "g2"}
+    ])
+
+    results = db.search_game_history("player3 seer", game_id="g1")
+
+    assert {r["speaker"] for r in results} == {"player1", "player2"}
+    assert results[0]["score"] >= results[1]["score"]
+    assert "[seer]" in results[0]["snippet"]
+    assert db.search_game_history("player3 seer", game_id="g1", speaker="player1")[0]["speaker"] == "player1"
+    assert db.search_game_history('wolf"') == db.search_game_history("wolf")
+    # 触发器同步了批量写入，且不影响返回的事件ID
+    assert [r["id"] for r in db.search_game_history("seer", game_id="g2")] == ids
+
+
+def test_search_index_follows_archive_deletes(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    database.record_event(1, "player1", "wolf hunting", "speak", game_id="g1")
+    database.archive_game("g1", month="2024-05")
+
+    with database._read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM GameHistoryFTS WHERE GameHistoryFTS MATCH 'wolf'").fetchone()[0] == 0
+    assert [r["content"] for r in database.search_game_history("wolf", game_id="g1")] == ["wolf hunting"]
+    database.close()
@@ -0,0 +1,83 @@
+"""
+图中心性：CSR 导出与稠密矩阵一致，PageRank / 特征向量与稠密参考解一致，影响力符号与排名
+"""
+
+import numpy as np
+import pytest
+
+from core.graph_analytics import CSRMatrix, eigenvector_centrality, pagerank
+from core.knowledge_graph import KnowledgeGraph
+
+
+def _dense(graph, relation_type):
+    players = sorted(graph.nodes)
+    dense = np.zeros((len(players), len(players)))
+    for (source, target), edge_data in graph.edges.items():
+        for relation in edge_data["relations"]:
+            if relation_type in ("all", relation["type"]):
+                dense[players.index(source), players.index(target)] += relation["weight"]
+    return dense
+
+
+def test_csr_export_matches_dense_adjacency(graph):
+    players, matrices = graph.to_csr()
+    assert players == sorted(graph.nodes)
+    assert set(matrices) == {"all", "support", "attack", "vote"}
+    x = np.arange(len(players), dtype=float)
+    for relation_type, matrix in matrices.items():
+        dense = _dense(graph, relation_type)
+        assert np.allclose(matrix.toarray(), dense)
+        assert np.allclose(matrix.matvec(x), dense @ x)
+        assert np.allclose(matrix.rmatvec(x), dense.T @ x)
+
+
+def test_pagerank_and_eigenvector_match_dense_reference(graph):
+    _, matrices = graph.to_csr()
+    dense = _dense(graph, "all")
+    n = len(dense)
+
+    out_weight = dense.sum(axis=1, keepdims=True)
+    transition = np.where(out_weight > 0, dense / np.where(out_weight > 0, out_weight, 1), 1.0 / n)
+    google = 0.85 * transition + 0.15 / n
+    values, vectors = np.linalg.eig(google.T)
+    expected = np.real(vectors[:, np.argmax(np.real(values))])
+    expected /= expected.sum()
+    ranks = pagerank(matrices["all"])
+    assert ranks.sum() == pytest.approx(1.0)
+    assert np.allclose(ranks, expected, atol=1e-8)
+
+    values, vectors = np.linalg.eigh(dense + dense.T)
+    expected = np.abs(vectors[:, -1])
+    assert np.allclose(eigenvector_centrality(matrices["all"], max_iter=1000), expected / expected.max(), atol=1e-6)
+
+
+def test_influence_signs_ranking_and_cache():
+    graph = KnowledgeGraph()
+    graph.add_nodes(["a", "b", "c", "d"])
+    graph.add_edge("a", "b", "support")
+    graph.add_edge("c", "b", "support")
+    graph.add_edge("d", "a", "attack")
+    graph.add_edge("b", "c", "vote")
+
+    scores = graph.centrality_scores()
+    assert scores["b"]["influence"] == 1.0
+    assert scores["a"]["influence"] < 0
+    assert scores["d"]["influence"] == 0.0
+    assert scores["b"]["degree"] == pytest.approx(graph.calculate_centrality("b"))
+    assert [entry["player_id"] for entry in graph.rank_players("pagerank", top_k=2)] == ["b", "c"]
+    assert graph.centrality_scores() is scores
+
+    graph.add_edge("d", "b", "attack")
+    refreshed = graph.centrality_scores()
+    assert refreshed is not scores
+    assert refreshed["a"]["influence"] > scores["a"]["influence"]
+    with pytest.raises(ValueError):
+        graph.rank_players("closeness")
+
+
+def test_empty_graph_has_no_scores():
+    graph = KnowledgeGraph()
+    assert graph.centrality_scores() == {}
+    graph.add_nodes(["a", "b"])
+    assert graph.centrality_scores()["a"] == {"pagerank": 0.5, "eigenvector": 0.0, "influence": 0.0, "degree": 0.0}
+    assert CSRMatrix.from_coo([], [], [], 0).nnz == 0
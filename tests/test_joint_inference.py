@@ -0,0 +1,135 @@
+"""
+联合后验引擎单元测试：与暴力枚举一致、硬事实、批量更新、状态往返与退回独立模型
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from core.bayesian_inference import ROLE_FACT
+from core.joint_inference import JointBayesianInference
+from core.sampling_inference import SamplingBayesianInference
+from core.session import GameSession
+
+
+def _evidence(n, players, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"player_id": players[int(rng.integers(len(players)))], "evidence_score": float(rng.random())}
+        for _ in range(n)
+    ]
+
+
+def _brute_force(players, wolves, evidence):
+    totals = dict.fromkeys(players, 0.0)
+    norm = 0.0
+    for subset in combinations(players, wolves):
+        weight = 1.0
+        for item in evidence:
+            s = item["evidence_score"]
+            weight *= 0.5 + 0.5 * s if item["player_id"] in subset else 0.5 + 0.5 * (1 - s)
+        norm += weight
+        for player in subset:
+            totals[player] += weight
+    return {player: total / norm for player, total in totals.items()}
+
+
+def test_marginals_match_brute_force_and_sum_to_wolf_count():
+    players = [f"p{i}" for i in range(7)]
+    evidence = _evidence(40, players)
+    engine = JointBayesianInference()
+    engine.initialize_priors(players, total_wolves=2)
+    assert engine.get_all_suspicions() == pytest.approx(dict.fromkeys(players, 2 / 7))
+
+    for item in evidence:
+        engine.update_suspicion(**item)
+
+    suspicions = engine.get_all_suspicions()
+    assert suspicions == pytest.approx(_brute_force(players, 2, evidence), abs=1e-12)
+    assert sum(suspicions.values()) == pytest.approx(2.0)
+
+
+def test_batch_update_equals_sequential_updates():
+    players = [f"p{i}" for i in range(12)]
+    evidence = _evidence(300, players, seed=1)
+    sequential, batched = JointBayesianInference(), JointBayesianInference()
+    for engine in (sequential, batched):
+        engine.initialize_priors(players, total_wolves=4)
+
+    for item in evidence:
+        sequential.update_suspicion(**item)
+    batched.update_suspicion_batch(evidence)
+
+    assert batched.get_all_suspicions() == pytest.approx(sequential.get_all_suspicions(), abs=1e-9)
+    assert batched.evidence_history == sequential.evidence_history
+
+
+def test_role_facts_constrain_everyone():
+    engine = JointBayesianInference()
+    engine.initialize_priors(["a", "b", "c", "d"], total_wolves=1)
+
+    assert engine.observe_role("a", is_wolf=False)
+    assert engine.get_suspicion("a") == 0.0
+    assert engine.get_suspicion("b") == pytest.approx(1 / 3)
+
+    assert engine.observe_role("b", is_wolf=True, description="seer_check")
+    assert engine.get_all_suspicions() == {"a": 0.0, "b": 1.0, "c": 0.0, "d": 0.0}
+    assert engine.evidence_history["b"][-1].type == ROLE_FACT
+
+    # 只有一名狼人，第二个狼人事实与已有事实矛盾
+    assert not engine.role_possible("c", is_wolf=True)
+    assert not engine.observe_role("c", is_wolf=True)
+    assert engine.get_suspicion("b") == 1.0
+    assert engine.wolf_team_probability(["b"]) == pytest.approx(1.0)
+
+
+def test_state_round_trip_and_session_replay_of_role_facts():
+    session = GameSession("g1")
+    session.bayesian = JointBayesianInference()
+    session.bayesian.initialize_priors(["a", "b", "c", "d", "e"], total_wolves=2)
+    session.apply_evidence_batch([
+        {"id": 1, "player_id": "a", "evidence_score": 0.8},
+        {"id": 2, "player_id": "b", "evidence_score": 1.0, "evidence_type": ROLE_FACT},
+    ])
+
+    restored = JointBayesianInference()
+    restored.load_state(session.bayesian.to_state())
+    for engine in (session.bayesian, restored):
+        engine.update_suspicion("c", 0.3)
+
+    assert restored.to_state() == session.bayesian.to_state()
+    assert restored.get_suspicion("b") == 1.0
+    assert session.evidence_id == 2
+
+
+def test_unknown_players_and_large_games_use_fallback_engine():
+    engine = JointBayesianInference(max_subsets=100, fallback="vectorized")
+    assert engine.get_suspicion("ghost") == 0.4
+    engine.update_suspicion("ghost", 0.5)
+    assert engine.get_suspicion("ghost") == pytest.approx(0.4)
+
+    players = [f"p{i}" for i in range(12)]
+    engine.initialize_priors(players, total_wolves=4)
+    assert engine.get_all_suspicions() == pytest.approx(dict.fromkeys(players, 4 / 12))
+    assert engine.observe_role("p0", is_wolf=True)
+    assert engine.get_suspicion("p0") == 1.0
+
+    engine.reset()
+    assert engine.get_all_suspicions() == {}
+
+
+def test_fallback_engine_is_created_only_for_outside_players():
+    engine = JointBayesianInference(fallback="sampling")
+    engine.initialize_priors(["a", "b", "c", "d"], total_wolves=1)
+    engine.update_suspicion_batch([{"player_id": "a", "evidence_score": 0.9}])
+    engine.observe_role("b", is_wolf=False)
+    assert engine._fallback_engine is None
+    assert "fallback" not in engine.to_state()
+
+    engine.update_suspicion("ghost", 0.9)
+    assert isinstance(engine._fallback_engine, SamplingBayesianInference)
+    restored = JointBayesianInference(fallback="sampling")
+    restored.load_state(engine.to_state())
+    assert restored.get_all_suspicions() == pytest.approx(engine.get_all_suspicions())
+    assert restored.evidence_count("ghost") == 1
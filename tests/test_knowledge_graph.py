@@ -0,0 +1,171 @@
+"""
+KnowledgeGraph 邻接索引：按玩家查询与全表扫描结果一致，状态往返后索引重建
+"""
+
+import random
+
+import pytest
+
+from core.knowledge_graph import KnowledgeGraph
+
+
+def _scan_relations(graph, player_id):
+    relations = {}
+    for (source, target), edge_data in graph.edges.items():
+        if source == player_id:
+            relations.setdefault("outgoing", []).extend(edge_data["relations"])
+        if target == player_id:
+            relations.setdefault("incoming", []).extend(edge_data["relations"])
+    return relations
+
+
+def test_adjacency_queries_match_full_scan(graph):
+    for player_id in graph.nodes:
+        assert graph.get_player_relations(player_id) == _scan_relations(graph, player_id)
+        degree = sum(1 for source, target in graph.edges if source == player_id) + sum(
+            1 for source, target in graph.edges if target == player_id
+        )
+        assert graph.calculate_centrality(player_id) == pytest.approx(degree / len(graph.edges))
+    assert graph.get_player_relations("idle") == {}
+    assert graph.calculate_centrality("idle") == 0.0
+
+
+def test_collusion_and_wolf_pairs_use_per_edge_type_weights(graph):
+    scores = graph.detect_collusion(sorted(graph.nodes))
+    for player_id, score in scores.items():
+        outgoing = _scan_relations(graph, player_id)["outgoing"]
+        support = sum(r["weight"] for r in outgoing if r["type"] == "support")
+        assert score == pytest.approx(support / sum(r["weight"] for r in outgoing))
+    assert "idle" not in scores
+
+    graph.reset()
+    graph.add_edge("a", "b", "support")
+    graph.add_edge("a", "b", "vote", 0.2)
+    graph.add_edge("c", "d", "support")
+    graph.add_edge("c", "d", "attack")
+    assert graph.detect_wolf_pair(threshold=0.8) == [("a", "b")]
+
+
+def test_load_state_rebuilds_adjacency(graph):
+    restored = KnowledgeGraph()
+    restored.load_state(graph.to_state())
+    assert restored.outgoing.keys() == graph.outgoing.keys()
+    for player_id in graph.nodes:
+        assert restored.get_player_relations(player_id) == graph.get_player_relations(player_id)
+
+    restored.reset()
+    assert restored.outgoing == {} and restored.incoming == {}
+
+
+def _scan_network(graph, relation_type):
+    network = {}
+    for (source, target), edge_data in graph.edges.items():
+        for relation in edge_data["relations"]:
+            if relation["type"] == relation_type:
+                network.setdefault(source, []).append(target)
+    return network
+
+
+def test_networks_use_per_edge_type_counts(graph):
+    assert graph.get_attack_network() == _scan_network(graph, "attack")
+    assert graph.get_support_network() == _scan_network(graph, "support")
+
+
+def test_pattern_results_are_cached_until_the_graph_changes(graph):
+    version = graph.version
+    pairs = graph.detect_wolf_pair(threshold=0.6)
+    scores = graph.detect_collusion(sorted(graph.nodes))
+    attack = graph.get_attack_network()
+    assert graph.detect_wolf_pair(threshold=0.6) is pairs
+    assert graph.detect_collusion(sorted(graph.nodes)) is scores
+    assert graph.get_attack_network() is attack
+    assert graph.version == version
+
+    graph.add_edge("p1", "p2", "attack")
+    assert graph.version > version
+    refreshed = graph.get_attack_network()
+    assert refreshed is not attack
+    assert refreshed == _scan_network(graph, "attack")
+    assert graph.detect_collusion(sorted(graph.nodes)) is not scores
+
+    graph.add_nodes(["p1"])
+    assert graph.get_attack_network() is refreshed
+
+
+@pytest.fixture
+def timeline():
+    rng = random.Random(9)
+    players = [f"p{i}" for i in range(6)]
+    graph = KnowledgeGraph(half_life=2.0)
+    for _ in range(150):
+        graph.add_edge(
+            rng.choice(players), rng.choice(players), rng.choice(["support", "attack"]), rng.random(),
+            {"round": rng.randint(1, 8)}
+        )
+    graph.add_edge("p0", "p1", "vote")
+    return graph
+
+
+def _all_relations(graph):
+    for (source, target), edge_data in graph.edges.items():
+        for relation in edge_data["relations"]:
+            yield source, target, relation, relation["metadata"].get("round") or 0
+
+
+def test_window_queries_match_full_scan(timeline):
+    assert timeline.latest_round == 8
+    window = timeline.relations_in_window(7, 8, player_id="p2", relation_type="attack")
+    expected = [
+        (source, target, relation["weight"]) for source, target, relation, round_num in _all_relations(timeline)
+        if 7 <= round_num <= 8 and "p2" in (source, target) and relation["type"] == "attack"
+    ]
+    assert sorted((r["source"], r["target"], r["weight"]) for r in window) == sorted(expected)
+    assert all(r["round"] in (7, 8) for r in window)
+    assert len(timeline.relations_in_window()) == 151
+    assert [r["type"] for r in timeline.relations_in_window(end_round=0)] == ["vote"]
+
+
+def test_lazy_decay_matches_direct_computation(timeline):
+    for current_round, relation_type in ((8, None), (5, "attack")):
+        expected = {}
+        for source, target, relation, round_num in _all_relations(timeline):
+            if relation_type in (None, relation["type"]) and round_num <= current_round:
+                key = (source, target)
+                expected[key] = expected.get(key, 0.0) + relation["weight"] * 0.5 ** ((current_round - round_num) / 2.0)
+        decayed = timeline.decayed_weights(current_round, relation_type)
+        assert decayed.keys() == {key for key, weight in expected.items() if weight}
+        for key, weight in decayed.items():
+            assert weight == pytest.approx(expected[key])
+    by_player = timeline.decayed_weights(player_id="p3")
+    assert by_player == pytest.approx({key: w for key, w in timeline.decayed_weights().items() if "p3" in key})
+
+
+def test_snapshot_keeps_only_earlier_rounds(timeline):
+    snapshot = timeline.snapshot(4)
+    assert snapshot.nodes == timeline.nodes
+    assert snapshot.latest_round == 4
+    assert len(snapshot.relations_in_window()) == len(timeline.relations_in_window(end_round=4))
+    assert snapshot.detect_collusion(["p1"]) == timeline.snapshot(4).detect_collusion(["p1"])
+    assert timeline.snapshot(4) is snapshot
+
+    timeline.add_edge("p1", "p2", "support", metadata={"round": 3})
+    assert timeline.snapshot(4) is not snapshot
+    assert len(timeline.snapshot(4).relations_in_window()) == len(snapshot.relations_in_window()) + 1
+
+
+def test_decay_handles_large_rounds_and_rejects_bad_half_life():
+    graph = KnowledgeGraph(half_life=2.0)
+    graph.add_edge("a", "b", "attack", 1.0, {"round": 3000})
+    graph.add_edge("a", "b", "attack", 1.0, {"round": 2998})
+    graph.add_edge("b", "c", "support", 2.0, {"round": 5})
+    assert graph.decayed_weights() == pytest.approx({("a", "b"): 1.5})
+    assert graph.decayed_weights(3002) == pytest.approx({("a", "b"): 0.75})
+    # 早于基准轮的查询只计之前的关系
+    assert graph.decayed_weights(7) == pytest.approx({("b", "c"): 1.0})
+
+    restored = KnowledgeGraph(half_life=2.0)
+    restored.load_state(graph.to_state())
+    assert restored.decayed_weights() == pytest.approx(graph.decayed_weights())
+
+    with pytest.raises(ValueError):
+        KnowledgeGraph(half_life=0)
@@ -0,0 +1,124 @@
+"""
+按证据类型的似然表：拟合、查表、文件往返，以及各推理引擎使用同一张表
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from core import likelihood_tables as lt
+from core.bayesian_inference import BayesianInference
+from core.database import GameDatabase
+from core.joint_inference import JointBayesianInference
+from core.likelihood_tables import LikelihoodTables, fit_from_database, fit_likelihood_tables, linear_log_ratio
+from core.sampling_inference import SamplingBayesianInference
+from core.vectorized_inference import VectorizedBayesianInference
+
+
+@pytest.fixture
+def tables():
+    # vote 类证据：狼人分数集中在高区间，好人集中在低区间
+    rng = random.Random(7)
+    samples = [("vote", rng.uniform(0.5, 1.0), True) for _ in range(500)]
+    samples += [("vote", rng.uniform(0.0, 0.5), False) for _ in range(500)]
+    samples += [("rare", 0.9, True)] * 5
+    return fit_likelihood_tables(samples, bins=10, prior_strength=10, min_samples=50)
+
+
+@pytest.fixture
+def shared_tables(tables):
+    previous = lt._tables
+    lt.set_likelihood_tables(tables)
+    yield tables
+    lt.set_likelihood_tables(previous)
+
+
+def test_fit_separates_classes_and_skips_sparse_types(tables):
+    assert tables.evidence_types == ["vote"]
+    assert tables.samples["vote"] == {"samples": 1000, "wolf_samples": 500}
+    assert tables.log_ratio("vote", 0.95) > 2.0
+    assert tables.log_ratio("vote", 0.05) < -2.0
+    # 没有表的类型使用线性似然
+    assert tables.log_ratio("rare", 0.9) == pytest.approx(math.log(1.9 / 1.1))
+
+
+def test_without_data_the_table_follows_the_linear_curve():
+    fitted = fit_likelihood_tables([("vote", 0.5, True)], bins=4, prior_strength=1e6, min_samples=1)
+    centers = (np.arange(4) + 0.5) / 4
+    expected = np.log((1 + centers) / np.sum(1 + centers)) - np.log((2 - centers) / np.sum(2 - centers))
+    assert np.allclose([fitted.log_ratio("vote", c) for c in centers], expected, atol=1e-4)
+
+
+def test_batch_lookup_matches_scalar_lookup(tables):
+    types = ["vote", "general", "vote", "vote"]
+    scores = [0.0, 0.3, 0.55, 1.0]
+    batch = tables.log_ratios(types, scores)
+    assert np.allclose(batch, [tables.log_ratio(t, s) for t, s in zip(types, scores)])
+    assert batch[1] == pytest.approx(float(linear_log_ratio([0.3])[0]))
+
+
+def test_save_and_load_round_trip(tables, tmp_path):
+    path = str(tmp_path / "tables" / "likelihood.json")
+    tables.save(path)
+    loaded = LikelihoodTables.load(path)
+    assert loaded.bins == tables.bins
+    assert loaded.samples == tables.samples
+    assert abs(loaded.log_ratio("vote", 0.95) - tables.log_ratio("vote", 0.95)) < 1e-4
+
+    with pytest.raises(ValueError):
+        LikelihoodTables(bins=3, tables={"vote": [0.0, 1.0]})
+
+
+@pytest.mark.parametrize(
+    "engine_factory",
+    [
+        BayesianInference,
+        VectorizedBayesianInference,
+        lambda: JointBayesianInference(fallback="vectorized"),
+        lambda: SamplingBayesianInference(workers=1, seed=3),
+    ],
+    ids=["scalar", "vectorized", "joint", "sampling"]
+)
+def test_engines_use_shared_tables(shared_tables, engine_factory):
+    engine = engine_factory()
+    assert engine.likelihood_tables is shared_tables
+    engine.initialize_priors(["a", "b", "c", "d"], total_wolves=1)
+    engine.update_suspicion_batch([
+        {"player_id": "a", "evidence_score": 0.9, "evidence_type": "vote"},
+        {"player_id": "b", "evidence_score": 0.9, "evidence_type": "general"},
+    ])
+    # 学习到的 vote 曲线比线性似然更有区分度
+    assert engine.get_suspicion("a") > engine.get_suspicion("b")
+
+
+def test_fit_from_database_reads_training_data_and_finished_games(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    try:
+        for _ in range(30):
+            database.create_training_data("ds", {"evidence_type": "speech", "evidence_score": 0.9}, "wolf")
+            database.create_training_data("ds", {"evidence_type": "speech", "evidence_score": 0.1}, "villager")
+        database.create_training_data("ds", {"other": 1.0}, "wolf")
+
+        for game_id, status in (("done", "finished"), ("live", "active")):
+            database.update_game_state(game_id, game_status=status)
+            database.record_suspicion_evidence_many(game_id, [
+                {"player_id": "w", "evidence_score": 0.8, "evidence_type": "vote"},
+                {"player_id": "v", "evidence_score": 0.2, "evidence_type": "vote"},
+                {"player_id": "u", "evidence_score": 0.5, "evidence_type": "vote"},
+                {"player_id": "w", "evidence_score": 1.0, "evidence_type": "role_fact"},
+                {"player_id": "v", "evidence_score": 0.0, "evidence_type": "role_fact"},
+            ])
+
+        labeled = list(database.iter_labeled_evidence(chunk_size=1))
+        assert [(row["player_id"], row["is_wolf"]) for row in labeled] == [("w", 1), ("v", 0)]
+
+        fitted = fit_from_database(database, dataset_id="ds", bins=5, prior_strength=1, min_samples=2)
+        assert fitted.samples == {
+            "speech": {"samples": 60, "wolf_samples": 30},
+            "vote": {"samples": 2, "wolf_samples": 1},
+        }
+        assert fitted.log_ratio("speech", 0.9) > fitted.log_ratio("speech", 0.1)
+    finally:
+        database.close()
@@ -0,0 +1,167 @@
+"""
+后台维护任务单元测试：保留期清理、归档/删除已结束对局、增量 VACUUM
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.async_database import AsyncGameDatabase
+from core.database import GameDatabase
+from core.maintenance import MaintenanceJob
+from core.session import SessionRegistry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True)
+    yield database
+    database.close()
+
+
+def _days_ago(days):
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+def _finished_game(db, game_id, days_ago, events=3):
+    db.record_events([
+        {"round_num": 1, "speaker": "p1", "content": f"{game_id} {i}", "action_type": "speak", "game_id": game_id}
+        for i in range(events)
+    ])
+    db.record_suspicion_evidence(game_id, "p1", 0.7)
+    db.update_game_state(game_id, current_round=3, alive_players=["p1"], game_status="finished")
+    with db._write() as conn:
+        conn.execute("UPDATE GameState SET updated_at = ? WHERE game_id = ?", (_days_ago(days_ago), game_id))
+
+
+def _job(db, **kwargs):
+    kwargs.setdefault("retention_days", {"finished_games": 7})
+    kwargs.setdefault("chunk_pause_ms", 0)
+    return MaintenanceJob(db, interval_seconds=3600, chunk_size=2, **kwargs)
+
+
+def test_new_databases_use_incremental_auto_vacuum(db):
+    assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_expired_finished_games_are_archived(db):
+    _finished_game(db, "old", days_ago=30)
+    _finished_game(db, "recent", days_ago=1)
+    db.update_game_state("live", current_round=1, alive_players=["p1"], game_status="active")
+
+    stats = _job(db, finished_game_action="archive").run_once()
+
+    assert stats["games"] == 1
+    assert db.router.archive_location("old") is not None
+    assert db.router.archive_location("recent") is None
+    assert len(db.get_game_history(game_id="old")) == 3
+    assert _job(db, finished_game_action="archive").run_once()["games"] == 0
+
+
+def test_archive_moves_evidence_with_history(db):
+    _finished_game(db, "old", days_ago=30)
+    db.record_suspicion_evidence("old", "p1", 1.0, "role_fact", suspicion_before=0.4)
+    evidence_ids = [e["id"] for e in db.get_suspicion_evidence("old")]
+
+    _job(db, finished_game_action="archive").run_once()
+
+    assert db.count_rows("SuspicionEvidence", "game_id = ?", ["old"]) == 0
+    assert [e["id"] for e in db.get_suspicion_evidence("old")] == evidence_ids
+    assert [e["id"] for e in db.iter_suspicion_evidence("old")] == sorted(evidence_ids)
+    assert db.get_latest_evidence_id("old") == max(evidence_ids)
+    # 归档的证据仍是离线拟合的样本
+    assert [row["game_id"] for row in db.iter_calibration_samples()] == ["old"]
+    assert [row["evidence_score"] for row in db.iter_labeled_evidence()] == [0.7]
+    with pytest.raises(ValueError):
+        db.record_suspicion_evidence("old", "p1", 0.5)
+
+    archive_path = db.router.archive_location("old")
+    db.delete_game("old")
+    with db.router.acquire(archive_path) as archive:
+        assert archive.count_rows("SuspicionEvidence", "game_id = ?", ["old"]) == 0
+
+
+@pytest.mark.parametrize("action", ["archive", "delete"])
+def test_finished_games_leave_the_session_registry(db, action):
+    _finished_game(db, "old", days_ago=30)
+    registry = SessionRegistry(AsyncGameDatabase(db, reader_threads=1, writer_threads=1), idle_ttl_seconds=0)
+    registry.get("old")
+    registry.get("live")
+
+    _job(db, finished_game_action=action, registry=registry).run_once()
+
+    assert registry.game_ids() == ["live"]
+
+
+def test_expired_finished_games_are_deleted(db):
+    _finished_game(db, "old", days_ago=30, events=5)
+    _finished_game(db, "recent", days_ago=1)
+
+    _job(db, finished_game_action="delete").run_once()
+
+    assert db.get_game_history(game_id="old") == []
+    assert db.get_game_state("old") is None
+    assert db.count_rows("SuspicionEvidence", "game_id = ?", ["old"]) == 0
+    assert len(db.get_game_history(game_id="recent")) == 3
+
+
+def test_per_table_retention_purges_in_chunks(db):
+    for i in range(5):
+        db.update_player_profile(f"stale{i}", suspicion_score=0.1)
+        db.record_event(1, "p1", f"orphan {i}", "speak")
+    db.update_player_profile("fresh", suspicion_score=0.2)
+    db.record_event(1, "p1", "kept", "speak", game_id="g1")
+    db.create_training_run("done", "LSTM", "d", "{}", status="finished")
+    db.create_training_run("running", "LSTM", "d", "{}")
+    with db._write() as conn:
+        conn.execute("UPDATE PlayerProfile SET updated_at = ? WHERE player_id LIKE 'stale%'", (_days_ago(100),))
+        conn.execute("UPDATE GameHistory SET timestamp = ? WHERE game_id IS NULL", (_days_ago(100),))
+        conn.execute("UPDATE TrainingRun SET end_time = ?", (_days_ago(400),))
+
+    stats = _job(db, retention_days={"GameHistory": 30, "PlayerProfile": 90, "TrainingRun": 180}).run_once()
+
+    assert stats["purged"] == {"GameHistory": 5, "PlayerProfile": 5, "TrainingRun": 1}
+    assert [p["player_id"] for p in db.get_all_player_profiles()] == ["fresh"]
+    assert [h["content"] for h in db.get_game_history()] == ["kept"]
+    assert db.get_training_run("running") is not None
+
+
+def test_incremental_vacuum_reclaims_free_pages(db):
+    db.record_events([
+        {"round_num": 1, "speaker": "p1", "content": "x" * 2000, "action_type": "speak", "game_id": "g1"}
+        for _ in range(200)
+    ])
+    db.purge_rows("GameHistory", "game_id = ?", ["g1"], chunk_size=50)
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    assert db.freelist_pages() > 0
+
+    stats = _job(db, vacuum_pages=16).run_once()
+
+    assert stats["vacuumed_pages"] > 0
+    assert db.freelist_pages() == 0
+
+
+def test_archive_pauses_between_purge_chunks(db, monkeypatch):
+    _finished_game(db, "old", days_ago=30, events=5)
+    purges = []
+    purge_rows = db.purge_rows
+    monkeypatch.setattr(db, "purge_rows", lambda *args: purges.append(args) or purge_rows(*args))
+    monkeypatch.setattr("core.maintenance.time.sleep", lambda seconds: None)
+
+    _job(db, chunk_pause_ms=20).run_once()
+
+    assert db.router.archive_location("old") is not None
+    assert purges == [
+        (table, "game_id = ?", ["old"], 2, 0.02) for table in ("GameHistory", "SuspicionEvidence")
+    ]
+
+
+def test_default_config_purges_nothing(db):
+    _finished_game(db, "old", days_ago=365)
+    with db._write() as conn:
+        conn.execute("UPDATE PlayerProfile SET updated_at = ?", (_days_ago(365),))
+
+    stats = MaintenanceJob(db, chunk_pause_ms=0).run_once()
+
+    assert stats["games"] == 0 and not any(stats["purged"].values())
+    assert db.router.archive_location("old") is None
@@ -0,0 +1,127 @@
+"""
+采样引擎单元测试：与精确联合后验一致、时间预算与 ESS 报告、硬事实、状态往返、进程池
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.joint_inference import JointBayesianInference
+from core.sampling_inference import SamplingBayesianInference, effective_sample_size
+
+PLAYERS = [f"p{i}" for i in range(10)]
+
+
+def _evidence(n, players, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"player_id": players[int(rng.integers(len(players)))], "evidence_score": float(rng.random())}
+        for _ in range(n)
+    ]
+
+
+def _engine(**kwargs):
+    kwargs.setdefault("workers", 1)
+    kwargs.setdefault("seed", 7)
+    kwargs.setdefault("time_budget_ms", 200)
+    kwargs.setdefault("max_sweeps", 300)
+    return SamplingBayesianInference(**kwargs)
+
+
+def test_marginals_match_exact_joint_posterior():
+    evidence = _evidence(60, PLAYERS)
+    exact, sampled = JointBayesianInference(), _engine()
+    for engine in (exact, sampled):
+        engine.initialize_priors(PLAYERS, total_wolves=3)
+        engine.update_suspicion_batch(evidence)
+        engine.observe_role("p0", is_wolf=False)
+
+    assert sampled.get_all_suspicions() == pytest.approx(exact.get_all_suspicions(), abs=0.03)
+    assert sampled.get_suspicion("p0") == 0.0
+    assert sum(sampled.get_all_suspicions().values()) == pytest.approx(3.0)
+    stats = sampled.diagnostics()
+    assert stats["samples"] > 0 and 0 < stats["ess_min"] <= stats["samples"]
+    assert "p0" not in stats["ess"]
+
+
+def test_refresh_samples_once_off_the_calling_thread(monkeypatch):
+    engine = _engine()
+    engine.initialize_priors(PLAYERS, total_wolves=3)
+    engine.update_suspicion_batch(_evidence(30, PLAYERS))
+    sample = engine._sample
+    threads = []
+
+    def tracking_sample(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return sample(*args, **kwargs)
+
+    engine.add_evidence_batch(_evidence(5, PLAYERS, seed=1))
+    monkeypatch.setattr(engine, "_sample", tracking_sample)
+    asyncio.run(engine.refresh())
+    suspicions = engine.get_all_suspicions()
+    players, pairs = engine.pair_marginals()
+    asyncio.run(engine.refresh())
+
+    assert len(threads) == 1 and threads[0] is not threading.main_thread()
+    assert np.diag(pairs) == pytest.approx([suspicions[p] for p in players])
+
+    # 采样期间有新证据时结果作废，读取时按新证据重新采样
+    version = engine._version
+    engine.add_evidence_batch(_evidence(1, PLAYERS, seed=2))
+    engine._store(version, engine._compute(engine._roles.copy(), engine._llr.copy()))
+    assert engine._marginals is None
+
+
+def test_time_budget_bounds_latency():
+    players = [f"p{i}" for i in range(40)]
+    engine = _engine(time_budget_ms=20, max_sweeps=100000)
+    engine.initialize_priors(players, total_wolves=10)
+    engine.add_evidence_batch(_evidence(200, players))
+
+    start = time.perf_counter()
+    engine.get_all_suspicions()
+    assert time.perf_counter() - start < 0.5
+    assert engine.diagnostics()["samples"] > 0
+
+
+def test_uniform_or_fixed_posteriors_skip_sampling():
+    engine = _engine()
+    engine.initialize_priors(["a", "b", "c", "d"], total_wolves=1)
+    assert engine.get_all_suspicions() == {"a": 0.25, "b": 0.25, "c": 0.25, "d": 0.25}
+    assert engine.observe_role("b", is_wolf=True)
+    assert not engine.role_possible("c", is_wolf=True)
+    assert engine.get_all_suspicions() == {"a": 0.0, "b": 1.0, "c": 0.0, "d": 0.0}
+    assert engine.diagnostics()["samples"] == 0
+
+
+def test_state_round_trip_and_outside_players():
+    engine = _engine()
+    engine.initialize_priors(PLAYERS, total_wolves=2)
+    engine.add_evidence_batch(_evidence(30, PLAYERS + ["ghost"], seed=3))
+    engine.observe_role("p1", is_wolf=True)
+
+    restored = _engine()
+    restored.load_state(engine.to_state())
+    assert restored.to_state() == engine.to_state()
+    assert restored.get_suspicion("ghost") == engine.get_suspicion("ghost")
+    assert restored.get_suspicion("p1") == 1.0
+
+
+def test_process_pool_chains():
+    engine = _engine(workers=2, chains=8)
+    engine.initialize_priors(PLAYERS, total_wolves=3)
+    engine.update_suspicion_batch(_evidence(40, PLAYERS, seed=4))
+    assert sum(engine.get_all_suspicions().values()) == pytest.approx(3.0)
+    assert engine.diagnostics()["chains"] == 8
+
+
+def test_effective_sample_size():
+    rng = np.random.default_rng(0)
+    independent = rng.random((2000, 1))
+    correlated = np.repeat(rng.random((100, 1)), 20, axis=0)
+    assert effective_sample_size(independent)[0] > 1000
+    assert effective_sample_size(correlated)[0] < 300
+    assert effective_sample_size(np.ones((50, 1)))[0] == 50
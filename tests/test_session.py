@@ -0,0 +1,69 @@
+"""
+SessionRegistry 单元测试：按 game_id 隔离状态、LRU/内存/空闲淘汰
+"""
+
+import pytest
+
+from core.session import DEFAULT_GAME_ID, INFERENCE_ENGINES, GameSession
+
+
+def test_sessions_are_isolated_per_game(make_registry):
+    registry = make_registry(pooled=False, max_sessions=10, max_memory_mb=64)
+    registry.get("g1").bayesian.initialize_priors(["a", "b"], total_wolves=1)
+    registry.get("g2").knowledge_graph.add_edge("a", "b", "attack")
+
+    assert registry.get("g1").bayesian.get_suspicion("a") == 0.5
+    assert registry.get("g2").bayesian.get_all_suspicions() == {}
+    assert not registry.get("g1").knowledge_graph.edges
+    assert registry.get(None) is registry.get(DEFAULT_GAME_ID)
+
+
+def test_lru_eviction_keeps_recent_games(make_registry):
+    registry = make_registry(pooled=False, max_sessions=2, max_memory_mb=64)
+    evicted = []
+    registry.add_evict_listener(lambda session: evicted.append(session.game_id))
+
+    registry.get("g1")
+    registry.get("g2")
+    registry.get("g1")
+    registry.get("g3")
+
+    assert evicted == ["g2"]
+    assert set(registry.game_ids()) == {"g1", "g3"}
+
+
+def test_memory_cap_evicts_oldest_until_under_budget(make_registry):
+    registry = make_registry(pooled=False, max_sessions=100, max_memory_mb=0.05)
+    big = registry.get("big")
+    for i in range(200):
+        big.knowledge_graph.add_edge(f"p{i % 7}", f"p{(i + 1) % 7}", "attack", metadata={"content": "x" * 64})
+
+    registry.get("small")
+
+    assert "big" not in registry.game_ids()
+    assert "small" in registry.game_ids()
+
+
+def test_create_replaces_existing_state(make_registry):
+    registry = make_registry(pooled=False)
+    registry.get("g1").knowledge_graph.add_edge("a", "b", "attack")
+    fresh = registry.create("g1")
+    assert not fresh.knowledge_graph.edges
+
+
+@pytest.mark.parametrize("engine", ["scalar", "vectorized", "joint", "sampling"])
+def test_out_of_range_evidence_never_poisons_the_posterior(engine):
+    session = GameSession("g1")
+    session.bayesian = INFERENCE_ENGINES[engine]()
+    session.bayesian.initialize_priors(["a", "b", "c"], total_wolves=1)
+
+    applied = session.apply_evidence_batch([
+        {"id": 1, "player_id": "a", "evidence_score": 2.5},
+        {"id": 2, "player_id": "a", "evidence_score": float("nan")},
+        {"id": 3, "player_id": "a", "evidence_score": 0.2},
+    ])
+    session.bayesian.update_suspicion("b", 2.5)
+
+    assert applied == 3 and session.evidence_id == 3
+    assert session.bayesian.evidence_count("a") == 1
+    assert all(0.0 < p < 1.0 for p in session.bayesian.get_all_suspicions().values())
@@ -0,0 +1,90 @@
+"""
+训练数据流式导出单元测试（直接调用导出工具，无需启动 MCP 服务）
+"""
+
+import asyncio
+import csv
+import json
+import threading
+
+import pytest
+
+import tools.training_tools as training_tools
+from core.async_database import AsyncGameDatabase
+from core.database import GameDatabase
+
+
+@pytest.fixture
+def adb(tmp_path, monkeypatch):
+    database = AsyncGameDatabase(GameDatabase(db_path=str(tmp_path / "game.db"), pooled=True), reader_threads=1)
+    monkeypatch.setattr(training_tools, "db", database)
+    yield database
+    database.close()
+
+
+@pytest.mark.parametrize("export_format", ["json", "csv"])
+def test_export_streams_every_row(adb, tmp_path, export_format):
+    for i in range(1200):
+        adb.db.create_training_data("ds", {"score": i}, "wolf" if i % 3 == 0 else "villager")
+
+    result = asyncio.run(training_tools.export_training_data(
+        dataset_id="ds", export_format=export_format, output_path=str(tmp_path / "out" / "data")
+    ))
+
+    assert result["status"] == "success"
+    assert result["record_count"] == 1200
+    with open(result["file_path"], encoding="utf-8") as f:
+        if export_format == "json":
+            rows = json.load(f)
+            assert rows[-1]["features"] == {"score": 1199}
+        else:
+            rows = list(csv.DictReader(f))
+    assert len(rows) == 1200
+
+
+def test_export_reports_missing_data(adb, tmp_path):
+    result = asyncio.run(training_tools.export_training_data(
+        dataset_id="missing", output_path=str(tmp_path / "data")
+    ))
+    assert result["status"] == "failed"
+
+
+def test_fit_calibration_runs_off_the_event_loop(adb, monkeypatch):
+    threads = {}
+    samples = [(0.9, i % 2 == 0) for i in range(40)] + [(0.1, i % 5 == 0) for i in range(40)]
+    monkeypatch.setattr(training_tools.calibration, "finished_game_samples", lambda db: samples)
+    fit = training_tools.calibration.fit_calibration
+    monkeypatch.setattr(
+        training_tools.calibration, "fit_calibration",
+        lambda *args, **kwargs: threads.setdefault("fit", threading.current_thread()) and fit(*args, **kwargs)
+    )
+    monkeypatch.setattr(
+        training_tools.calibration.Calibration, "save",
+        lambda self, path: threads.setdefault("save", threading.current_thread())
+    )
+
+    result = asyncio.run(training_tools.fit_calibration(method="isotonic", activate=False))
+
+    assert result["status"] == "success"
+    assert set(threads) == {"fit", "save"}
+    assert all(thread is not threading.main_thread() for thread in threads.values())
+
+
+def test_fit_likelihood_tables_saves_off_the_event_loop(adb, tmp_path, monkeypatch):
+    threads = {}
+    tables_module = training_tools.likelihood_tables
+    monkeypatch.setattr(
+        tables_module, "fit_from_database",
+        lambda *args: threads.setdefault("fit", threading.current_thread()) and tables_module.LikelihoodTables(bins=4)
+    )
+    monkeypatch.setattr(
+        tables_module.LikelihoodTables, "save",
+        lambda self, path: threads.setdefault("save", threading.current_thread())
+    )
+    monkeypatch.setattr(tables_module, "set_likelihood_tables", lambda tables: None)
+
+    result = asyncio.run(training_tools.fit_likelihood_tables(output_path=str(tmp_path / "tables.json")))
+
+    assert result["status"] == "success"
+    assert set(threads) == {"fit", "save"}
+    assert all(thread is not threading.main_thread() for thread in threads.values())
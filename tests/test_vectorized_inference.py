@@ -0,0 +1,75 @@
+"""
+向量化贝叶斯引擎单元测试：与标量实现逐条结果一致，批量更新等价于顺序更新
+"""
+
+import numpy as np
+import pytest
+
+from core.bayesian_inference import BayesianInference
+from core.vectorized_inference import VectorizedBayesianInference
+
+
+def _random_evidence(n, players, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "player_id": players[int(rng.integers(len(players)))],
+            "evidence_score": float(rng.random()),
+            "evidence_type": "behavior",
+            "description": str(i),
+        }
+        for i in range(n)
+    ]
+
+
+def test_matches_scalar_engine_item_by_item():
+    players = [f"p{i}" for i in range(6)]
+    scalar, vectorized = BayesianInference(), VectorizedBayesianInference(capacity=2)
+    scalar.initialize_priors(players, total_wolves=2)
+    vectorized.initialize_priors(players, total_wolves=2)
+
+    for item in _random_evidence(200, players + ["newcomer"]):
+        expected = scalar.update_suspicion(**item)
+        assert vectorized.update_suspicion(**item) == pytest.approx(expected, abs=1e-12)
+
+    assert vectorized.get_all_suspicions() == pytest.approx(scalar.get_all_suspicions(), abs=1e-12)
+    assert vectorized.evidence_history == scalar.evidence_history
+
+
+def test_batch_update_equals_sequential_updates():
+    players = [f"p{i}" for i in range(12)]
+    evidence = _random_evidence(300, players, seed=1)
+    sequential, batched = VectorizedBayesianInference(), VectorizedBayesianInference()
+    for engine in (sequential, batched):
+        engine.initialize_priors(players, total_wolves=3)
+
+    for item in evidence:
+        sequential.update_suspicion(**item)
+    posteriors = batched.update_suspicion_batch(evidence)
+
+    assert set(posteriors) == {item["player_id"] for item in evidence}
+    assert batched.get_all_suspicions() == pytest.approx(sequential.get_all_suspicions(), abs=1e-12)
+    assert posteriors == pytest.approx({p: sequential.get_suspicion(p) for p in posteriors}, abs=1e-12)
+
+
+def test_state_round_trip_keeps_exact_log_odds():
+    engine = VectorizedBayesianInference()
+    engine.initialize_priors(["a", "b", "c"], total_wolves=1)
+    engine.update_suspicion_batch(_random_evidence(20, ["a", "b", "c"], seed=2))
+
+    restored = VectorizedBayesianInference()
+    restored.load_state(engine.to_state())
+    for engine_ in (engine, restored):
+        engine_.update_suspicion("a", 0.9)
+
+    assert restored.to_state() == engine.to_state()
+
+
+def test_unknown_player_and_reset():
+    engine = VectorizedBayesianInference()
+    assert engine.get_suspicion("ghost") == 0.4
+    engine.update_suspicion("ghost", 0.5)
+    assert engine.get_suspicion("ghost") == pytest.approx(0.4)
+    engine.reset()
+    assert engine.get_all_suspicions() == {}
+    assert engine.evidence_history == {}
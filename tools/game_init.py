@@ -1,15 +1,12 @@
 from typing import Dict, List, Optional, Any
 from tools import YA_MCPServer_Tool
-from core.database import GameDatabase
-from core.bayesian_inference import BayesianInference
-from core.knowledge_graph import KnowledgeGraph
+from core.session import get_registry
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("game_init")
 
-db = GameDatabase()
-bayesian = BayesianInference()
-knowledge_graph = KnowledgeGraph()
+registry = get_registry()
+db = registry.db
 
 
 @YA_MCPServer_Tool(
@@ -36,22 +33,30 @@ async def initialize_game(
         - status: Initialization status
     """
     try:
-        db.update_game_state(
+        await db.update_game_state(
             game_id=game_id,
             current_round=1,
             alive_players=player_ids,
             game_status="active"
         )
         
+        session = registry.create(game_id)
+        bayesian = session.bayesian
+        knowledge_graph = session.knowledge_graph
         bayesian.initialize_priors(player_ids, total_wolves)
+        session.total_wolves = total_wolves
+        await bayesian.refresh()
         
-        for player_id in player_ids:
-            db.update_player_profile(
-                player_id=player_id,
-                suspicion_score=bayesian.get_suspicion(player_id),
-                game_id=game_id
-            )
-            knowledge_graph.add_node(player_id)
+        await db.update_player_profiles_many(
+            [
+                {"player_id": player_id, "suspicion_score": bayesian.get_suspicion(player_id)}
+                for player_id in player_ids
+            ],
+            game_id=game_id
+        )
+        knowledge_graph.add_nodes(player_ids)
+        # 新对局从此检查点开始重放，同 game_id 的旧事件不再计入
+        await registry.checkpoints.save_fresh(session)
         
         logger.info(f"Initialized game {game_id} with {len(player_ids)} players")
         
@@ -67,6 +72,106 @@ async def initialize_game(
         return {"error": str(e)}
 
 
+@YA_MCPServer_Tool(
+    name="end_round",
+    title="End Round",
+    description="Close the current round: remove eliminated players, advance the round counter and persist all suspicion scores"
+)
+async def end_round(
+    game_id: str,
+    eliminated_players: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Finish the current round of a game.
+    
+    Args:
+        game_id: The game identifier
+        eliminated_players: Players eliminated this round (voted out or killed)
+        
+    Returns:
+        Dict containing:
+        - game_id: The game ID
+        - current_round: The new round number
+        - alive_players: Remaining alive players
+        - profiles_updated: Number of player profiles written
+    """
+    try:
+        game_state = await db.get_game_state(game_id)
+        if not game_state:
+            return {"error": "Game not found", "game_id": game_id}
+        
+        eliminated = set(eliminated_players or [])
+        alive_players = [p for p in game_state.get("alive_players") or [] if p not in eliminated]
+        next_round = game_state.get("current_round", 1) + 1
+        
+        await db.update_game_state(
+            game_id=game_id,
+            current_round=next_round,
+            alive_players=alive_players
+        )
+        
+        bayesian = (await registry.get_async(game_id)).bayesian
+        await bayesian.refresh()
+        suspicions = bayesian.get_all_suspicions()
+        await db.update_player_profiles_many(
+            [
+                {"player_id": player_id, "suspicion_score": score}
+                for player_id, score in suspicions.items()
+            ],
+            game_id=game_id
+        )
+        
+        logger.info(f"Ended round {next_round - 1} of game {game_id}, {len(alive_players)} players alive")
+        
+        return {
+            "game_id": game_id,
+            "current_round": next_round,
+            "alive_players": alive_players,
+            "eliminated_players": sorted(eliminated),
+            "profiles_updated": len(suspicions)
+        }
+    except Exception as e:
+        logger.error(f"Error ending round: {e}")
+        return {"error": str(e)}
+
+
+@YA_MCPServer_Tool(
+    name="archive_game",
+    title="Archive Game",
+    description="Finish a game and move its event history into the monthly archive file"
+)
+async def archive_game(game_id: str, month: Optional[str] = None) -> Dict[str, Any]:
+    """Mark a game as finished and archive its history.
+    
+    Archived history stays readable through recall_memory and the game
+    history resources, but no further events can be recorded for the game.
+    
+    Args:
+        game_id: The game identifier
+        month: Archive month as YYYY-MM (default: current month)
+        
+    Returns:
+        Dict containing:
+        - game_id: The game ID
+        - archive_path: Archive file the history was moved to
+        - events: Number of events archived
+    """
+    try:
+        game_state = await db.get_game_state(game_id)
+        if not game_state:
+            return {"error": "Game not found", "game_id": game_id}
+        
+        await db.update_game_state(game_id=game_id, game_status="finished")
+        # 先移出注册表：归档期间会话不会再被淘汰并保存旧水位的检查点
+        registry.drop(game_id)
+        result = await db.archive_game(game_id, month=month)
+        
+        logger.info(f"Archived game {game_id}: {result['events']} events")
+        return result
+    except Exception as e:
+        logger.error(f"Error archiving game: {e}")
+        return {"error": str(e)}
+
+
 @YA_MCPServer_Tool(
     name="reset_game",
     title="Reset Game",
@@ -76,14 +181,15 @@ async def reset_game(game_id: Optional[str] = None) -> Dict[str, Any]:
     """Reset game data and algorithms.
     
     Args:
-        game_id: Optional game ID to reset specific game
+        game_id: Optional game ID to reset specific game; resets every game in memory when omitted
         
     Returns:
         Dict containing reset status
     """
     try:
-        bayesian.reset()
-        knowledge_graph.reset()
+        # 保存空状态的检查点，重启或淘汰后恢复时不会重放重置前的事件
+        for reset_id in ([game_id] if game_id else registry.game_ids()):
+            await registry.checkpoints.save_fresh(registry.create(reset_id))
         
         logger.info(f"Reset game data for game_id: {game_id}")
         
@@ -1,17 +1,16 @@
 from typing import Dict, List, Optional, Any
+import numpy as np
 from tools import YA_MCPServer_Tool
-from core.database import GameDatabase
-from core.bayesian_inference import BayesianInference
-from core.knowledge_graph import KnowledgeGraph
-from core.game_tree import GameTreeSearch
+from core.bayesian_inference import ROLE_FACT
+from core.calibration import get_calibration_async
+from core.session import GameSession, get_registry
+from modules.YA_Common.utils.config import get_config
 from modules.YA_Common.utils.logger import get_logger
 
 logger = get_logger("game_tools")
 
-db = GameDatabase()
-bayesian = BayesianInference()
-knowledge_graph = KnowledgeGraph()
-game_tree = GameTreeSearch()
+registry = get_registry()
+db = registry.db
 
 
 @YA_MCPServer_Tool(
@@ -32,7 +31,7 @@ async def query_game_state(game_id: str) -> Dict[str, Any]:
         - game_status: Current game status
     """
     try:
-        game_state = db.get_game_state(game_id)
+        game_state = await db.get_game_state(game_id)
         
         if not game_state:
             return {
@@ -59,44 +58,67 @@ async def query_game_state(game_id: str) -> Dict[str, Any]:
     description="Retrieve historical statements and actions from a specific player using RAG algorithm"
 )
 async def recall_memory(
-    player_id: str,
+    player_id: Optional[str] = None,
     game_id: Optional[str] = None,
     round_num: Optional[int] = None,
     action_type: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    before_id: Optional[int] = None,
+    query: Optional[str] = None
 ) -> Dict[str, Any]:
     """Recall memory of a player's past statements and actions.
     
     Args:
-        player_id: The player ID to retrieve memory for
+        player_id: The player ID to retrieve memory for; all speakers when omitted
         game_id: Optional game ID to filter by
         round_num: Optional round number to filter by
         action_type: Optional action type filter (e.g., 'speak', 'vote', 'check')
         limit: Maximum number of records to return
+        before_id: Optional record ID cursor; only records older than this ID are returned (ignored with query)
+        query: Optional full-text query; every word must appear in the content, results are ranked by relevance
         
     Returns:
         Dict containing:
         - player_id: The queried player ID
-        - memories: List of historical records
+        - memories: List of historical records, newest first (most relevant first with query,
+          each carrying a highlighted snippet and a relevance score)
         - summary: Summary of player behavior
+        - next_before_id: Cursor for the next page, or None when there are no more records
     """
     try:
-        history = db.get_game_history(
-            game_id=game_id,
-            round_num=round_num,
-            speaker=player_id,
-            action_type=action_type,
-            limit=limit
-        )
+        if query:
+            history = await db.search_game_history(
+                query,
+                game_id=game_id,
+                round_num=round_num,
+                speaker=player_id,
+                action_type=action_type,
+                limit=limit
+            )
+        else:
+            history = await db.get_game_history(
+                game_id=game_id,
+                round_num=round_num,
+                speaker=player_id,
+                action_type=action_type,
+                limit=limit,
+                before_id=before_id
+            )
         
         memories = []
         for record in history:
-            memories.append({
+            memory = {
+                "id": record["id"],
                 "round": record["round_num"],
+                "speaker": record["speaker"],
                 "content": record["content"],
                 "action_type": record["action_type"],
                 "timestamp": record["timestamp"]
-            })
+            }
+            if query:
+                memory["snippet"] = record["snippet"]
+                memory["score"] = record["score"]
+            memories.append(memory)
         
         summary = _generate_memory_summary(memories)
         
@@ -104,9 +126,11 @@ async def recall_memory(
         
         return {
             "player_id": player_id,
+            "query": query,
             "memories": memories,
             "summary": summary,
-            "count": len(memories)
+            "count": len(memories),
+            "next_before_id": memories[-1]["id"] if len(memories) == limit and not query else None
         }
     except Exception as e:
         logger.error(f"Error recalling memory: {e}")
@@ -156,24 +180,44 @@ async def analyze_suspicion(
         - previous_suspicion: Previous suspicion score
         - current_suspicion: Updated suspicion score
         - evidence_count: Number of evidence pieces collected
+        - inference: Sampling diagnostics (samples, effective sample size) when a
+          sampling engine produced the score, otherwise empty
+        - calibrated_suspicion: current_suspicion mapped through the active calibration
+          (fit_calibration); equal to current_suspicion when no calibration is active
+        - calibration: Version and method of the active calibration, or None
     """
     try:
-        previous_suspicion = bayesian.get_suspicion(player_id)
+        if not 0.0 <= evidence_score <= 1.0:
+            return {"error": "evidence_score must be within [0, 1]"}
         
-        current_suspicion = bayesian.update_suspicion(
-            player_id=player_id,
-            evidence_score=evidence_score,
-            evidence_type=evidence_type,
-            description=description
-        )
+        session = await registry.get_async(game_id)
+        bayesian = session.bayesian
+        # 采样类引擎在线程中算后验，之后的读取命中缓存
+        await bayesian.refresh()
+        previous_suspicion = bayesian.get_suspicion(player_id)
         
-        db.update_player_profile(
+        # 先写入证据日志，再更新内存中的引擎，重启后可从日志重放
+        evidence = {
+            "player_id": player_id,
+            "evidence_score": evidence_score,
+            "evidence_type": evidence_type,
+            "description": description
+        }
+        async with registry.journal(session.game_id):
+            evidence["id"] = await db.record_suspicion_evidence(game_id=session.game_id, **evidence)
+            session.apply_evidence_batch([evidence])
+            await registry.checkpoints.maybe_checkpoint(session)
+        await bayesian.refresh()
+        current_suspicion = bayesian.get_suspicion(player_id)
+        
+        await db.update_player_profile(
             player_id=player_id,
             suspicion_score=current_suspicion,
             game_id=game_id
         )
         
-        evidence_count = len(bayesian.evidence_history.get(player_id, []))
+        evidence_count = bayesian.evidence_count(player_id)
+        calibration = await get_calibration_async(db)
         
         logger.info(
             f"Analyzed suspicion for {player_id}: "
@@ -184,14 +228,304 @@ async def analyze_suspicion(
             "player_id": player_id,
             "previous_suspicion": round(previous_suspicion, 3),
             "current_suspicion": round(current_suspicion, 3),
+            "calibrated_suspicion": round(calibration.apply(current_suspicion) if calibration else current_suspicion, 3),
+            "calibration": calibration.info() if calibration else None,
             "evidence_count": evidence_count,
-            "evidence_type": evidence_type
+            "evidence_type": evidence_type,
+            "inference": bayesian.diagnostics()
         }
     except Exception as e:
         logger.error(f"Error analyzing suspicion: {e}")
         return {"error": str(e)}
 
 
+@YA_MCPServer_Tool(
+    name="analyze_suspicion_batch",
+    title="Analyze Suspicion Batch",
+    description="Update suspicion scores for many evidence items at once (e.g. a whole round of statements) in one vectorized Bayesian update"
+)
+async def analyze_suspicion_batch(
+    evidence: List[Dict[str, Any]],
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Apply a batch of evidence items in one Bayesian update.
+    
+    Args:
+        evidence: List of evidence dicts, each with 'player_id' and 'evidence_score'
+            (0.0-1.0, higher means more suspicious), plus optional 'evidence_type' and 'description'.
+            Several items for the same player are applied in order.
+        game_id: Optional game ID
+        
+    Returns:
+        Dict containing:
+        - players: Per-player previous, current and calibrated suspicion plus evidence count
+        - evidence_ids: Stored evidence IDs in the same order as the input
+        - count: Number of evidence items applied
+        - inference: Sampling diagnostics, empty for exact engines
+        - calibration: Version and method of the active calibration, or None
+    """
+    try:
+        for index, item in enumerate(evidence):
+            if "player_id" not in item or "evidence_score" not in item:
+                return {"error": f"Evidence {index} needs 'player_id' and 'evidence_score'"}
+            if not 0.0 <= float(item["evidence_score"]) <= 1.0:
+                return {"error": f"Evidence {index} has evidence_score outside [0, 1]"}
+        
+        session = await registry.get_async(game_id)
+        bayesian = session.bayesian
+        items = [
+            {
+                "player_id": item["player_id"],
+                "evidence_score": float(item["evidence_score"]),
+                "evidence_type": item.get("evidence_type") or "general",
+                "description": item.get("description") or ""
+            }
+            for item in evidence
+        ]
+        await bayesian.refresh()
+        previous = {item["player_id"]: bayesian.get_suspicion(item["player_id"]) for item in items}
+        
+        async with registry.journal(session.game_id):
+            evidence_ids = await db.record_suspicion_evidence_many(session.game_id, items)
+            for item, evidence_id in zip(items, evidence_ids):
+                item["id"] = evidence_id
+            session.apply_evidence_batch(items)
+            await registry.checkpoints.maybe_checkpoint(session)
+        
+        await bayesian.refresh()
+        current = {player_id: bayesian.get_suspicion(player_id) for player_id in previous}
+        await db.update_player_profiles_many(
+            [{"player_id": player_id, "suspicion_score": score} for player_id, score in current.items()],
+            game_id=game_id
+        )
+        
+        calibration = await get_calibration_async(db)
+        logger.info(f"Analyzed batch of {len(items)} evidence items for {len(current)} players")
+        
+        return {
+            "players": {
+                player_id: {
+                    "previous_suspicion": round(previous[player_id], 3),
+                    "current_suspicion": round(current[player_id], 3),
+                    "calibrated_suspicion": round(calibration.apply(score) if calibration else score, 3),
+                    "evidence_count": bayesian.evidence_count(player_id)
+                }
+                for player_id, score in current.items()
+            },
+            "evidence_ids": evidence_ids,
+            "count": len(items),
+            "inference": bayesian.diagnostics(),
+            "calibration": calibration.info() if calibration else None,
+            "game_id": game_id
+        }
+    except Exception as e:
+        logger.error(f"Error analyzing suspicion batch: {e}")
+        return {"error": str(e)}
+
+
+@YA_MCPServer_Tool(
+    name="observe_role",
+    title="Observe Role",
+    description="Record a hard fact about a player's role (seer check, revealed role on elimination) and update every player's suspicion"
+)
+async def observe_role(
+    player_id: str,
+    is_wolf: bool,
+    source: str = "seer_check",
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Record that a player's role is known for certain.
+
+    With the joint inference engine the fact also shifts everyone else: confirming one
+    wolf lowers the others' suspicion because exactly total_wolves players are wolves.
+
+    Args:
+        player_id: The player whose role is known
+        is_wolf: True if the player is a wolf, False if confirmed good
+        source: Where the fact comes from (e.g., 'seer_check', 'revealed_on_death')
+        game_id: Optional game ID
+
+    Returns:
+        Dict containing:
+        - player_id: The observed player ID
+        - is_wolf: The recorded role
+        - evidence_id: Stored evidence ID
+        - suspicions: Updated suspicion scores of all players
+    """
+    try:
+        session = await registry.get_async(game_id)
+        bayesian = session.bayesian
+        if not bayesian.role_possible(player_id, is_wolf):
+            return {"error": f"Role fact for {player_id} contradicts earlier facts"}
+        await bayesian.refresh()
+
+        evidence = {
+            "player_id": player_id,
+            "evidence_score": 1.0 if is_wolf else 0.0,
+            "evidence_type": ROLE_FACT,
+            "description": source
+        }
+        # 事实揭晓前的未校准后验，对局结束后作为 fit_calibration 的样本
+        async with registry.journal(session.game_id):
+            evidence["id"] = await db.record_suspicion_evidence(
+                game_id=session.game_id, suspicion_before=bayesian.get_suspicion(player_id), **evidence
+            )
+            session.apply_evidence_batch([evidence])
+            await registry.checkpoints.maybe_checkpoint(session)
+
+        await bayesian.refresh()
+        suspicions = bayesian.get_all_suspicions()
+        await db.update_player_profiles_many(
+            [{"player_id": pid, "suspicion_score": score} for pid, score in suspicions.items()],
+            game_id=game_id
+        )
+
+        logger.info(f"Observed role for {player_id}: {'wolf' if is_wolf else 'good'} ({source})")
+
+        return {
+            "player_id": player_id,
+            "is_wolf": is_wolf,
+            "evidence_id": evidence["id"],
+            "suspicions": {pid: round(score, 3) for pid, score in suspicions.items()},
+            "game_id": game_id
+        }
+    except Exception as e:
+        logger.error(f"Error observing role: {e}")
+        return {"error": str(e)}
+
+
+@YA_MCPServer_Tool(
+    name="explain_suspicion",
+    title="Explain Suspicion",
+    description="Explain suspicion scores with a leave-one-out analysis: the posterior without each piece of evidence, and the items that moved it most"
+)
+async def explain_suspicion(
+    player_id: Optional[str] = None,
+    top_k: int = 5,
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Rank the evidence behind one player's (or every player's) suspicion.
+
+    Every piece of evidence in the game's log is removed in turn and the posterior is
+    recomputed in one vectorized pass, without replaying the game. With the joint engine,
+    evidence about other players counts too: suspecting someone else lowers this player.
+    Role facts are hard constraints and are not ranked.
+
+    Args:
+        player_id: Player to explain; omit to explain every player
+        top_k: Number of evidence items to return per player
+        game_id: Optional game ID
+
+    Returns:
+        Dict containing:
+        - players: Per player, the current suspicion and top_evidence, a list of evidence
+          items with contribution (current suspicion minus suspicion_without the item)
+        - evidence_count: Number of evidence items analysed
+        - inference: Sampling diagnostics, empty for exact engines
+    """
+    try:
+        session = await registry.get_async(game_id)
+        bayesian = session.bayesian
+        evidence = await db.run_read(_evidence_log, session)
+        await bayesian.refresh()
+        players, current, without = bayesian.leave_one_out(evidence)
+        index = {pid: slot for slot, pid in enumerate(players)}
+        if player_id is not None and player_id not in index:
+            return {"error": f"Player {player_id} has no suspicion score in this game"}
+
+        contributions = current[None, :] - without
+        result = {}
+        for pid in ([player_id] if player_id is not None else players):
+            column = contributions[:, index[pid]]
+            ranked = [row for row in np.argsort(-np.abs(column), kind="stable")[:top_k] if abs(column[row]) > 1e-9]
+            result[pid] = {
+                "suspicion": round(float(current[index[pid]]), 3),
+                "top_evidence": [
+                    {
+                        "id": evidence[row]["id"],
+                        "player_id": evidence[row]["player_id"],
+                        "evidence_type": evidence[row]["evidence_type"],
+                        "evidence_score": evidence[row]["evidence_score"],
+                        "description": evidence[row]["description"],
+                        "contribution": round(float(column[row]), 4),
+                        "suspicion_without": round(float(without[row, index[pid]]), 3)
+                    }
+                    for row in ranked
+                ]
+            }
+
+        logger.info(f"Explained suspicion for {len(result)} players from {len(evidence)} evidence items")
+
+        return {
+            "players": result,
+            "evidence_count": len(evidence),
+            "inference": bayesian.diagnostics(),
+            "game_id": game_id
+        }
+    except Exception as e:
+        logger.error(f"Error explaining suspicion: {e}")
+        return {"error": str(e)}
+
+
+def _evidence_log(session: GameSession) -> List[Dict[str, Any]]:
+    # 只取当前对局已应用到引擎的证据：重置前的旧证据和尚未应用的新证据都不参与解释
+    last_id = session.evidence_id
+    evidence = []
+    for item in db.db.iter_suspicion_evidence(session.game_id, after_id=session.reset_evidence_id):
+        if item["id"] > last_id:
+            break
+        evidence.append(item)
+    return evidence
+
+
+@YA_MCPServer_Tool(
+    name="detect_contradictions",
+    title="Detect Contradictions",
+    description="Find a player's earlier statements that contradict a new statement using the per-game statement index"
+)
+async def detect_contradictions(
+    player_id: str,
+    statement: str,
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Check a statement against everything the player said earlier in the game.
+
+    Statements are indexed when they are recorded with record_event, so the check does
+    not rescan the history. The resulting score can be passed to analyze_suspicion as
+    evidence_score with evidence_type 'contradiction'.
+
+    Args:
+        player_id: The player who made the statement
+        statement: The statement text to check
+        game_id: Optional game ID
+
+    Returns:
+        Dict containing:
+        - contradictions: Contradicting statement IDs (GameHistory IDs) with the features that clash
+        - contradiction_score: Score in [0, 0.9] based on the share of contradicting statements
+        - statements_indexed: Number of indexed statements for the player
+    """
+    try:
+        index = (await registry.get_async(game_id)).contradictions
+        hits = index.find(player_id, statement)
+
+        logger.info(f"Found {len(hits)} contradictions for {player_id}")
+
+        return {
+            "player_id": player_id,
+            "contradictions": [
+                {"id": statement_id, "features": sorted(features)}
+                for statement_id, features in sorted(hits.items())
+            ],
+            "contradiction_score": round(index.score(player_id, statement), 3),
+            "statements_indexed": index.statement_count(player_id),
+            "game_id": game_id
+        }
+    except Exception as e:
+        logger.error(f"Error detecting contradictions: {e}")
+        return {"error": str(e)}
+
+
 @YA_MCPServer_Tool(
     name="record_event",
     title="Record Event",
@@ -224,30 +558,21 @@ async def record_event(
         - timestamp: When the event was recorded
     """
     try:
-        db.record_event(
-            round_num=round_num,
-            speaker=speaker,
-            content=content,
-            action_type=action_type,
-            game_id=game_id
-        )
-        
-        if target_player and relation_type:
-            knowledge_graph.add_edge(
-                source=speaker,
-                target=target_player,
-                relation_type=relation_type,
-                weight=1.0,
-                metadata={
-                    "round": round_num,
-                    "action_type": action_type,
-                    "content": content
-                }
-            )
-        
-        knowledge_graph.add_node(speaker)
-        if target_player:
-            knowledge_graph.add_node(target_player)
+        event = {
+            "round_num": round_num,
+            "speaker": speaker,
+            "content": content,
+            "action_type": action_type,
+            "game_id": game_id,
+            "target_player": target_player,
+            "relation_type": relation_type
+        }
+        # 同一局的事件在锁内写入并应用，按 ID 顺序进入会话
+        async with registry.journal(game_id):
+            event["id"] = await db.record_event(**event)
+            session = await registry.get_async(game_id)
+            session.apply_history_events([event])
+            await registry.checkpoints.maybe_checkpoint(session)
         
         logger.info(
             f"Recorded event: {action_type} by {speaker} "
@@ -256,6 +581,7 @@ async def record_event(
         
         return {
             "success": True,
+            "event_id": event["id"],
             "round_num": round_num,
             "speaker": speaker,
             "action_type": action_type,
@@ -266,39 +592,196 @@ async def record_event(
         return {"success": False, "error": str(e)}
 
 
+@YA_MCPServer_Tool(
+    name="record_events_batch",
+    title="Record Events Batch",
+    description="Record a batch of game events in one transaction and update the knowledge graph in bulk"
+)
+async def record_events_batch(
+    events: List[Dict[str, Any]],
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Record many game events at once (e.g. replaying a game or a whole round of speeches).
+    
+    Args:
+        events: List of event dicts, each with 'round_num', 'speaker', 'content' and
+            'action_type', plus optional 'game_id', 'target_player' and 'relation_type'
+        game_id: Optional default game ID for events that do not carry their own
+        
+    Returns:
+        Dict containing:
+        - success: Whether the batch was recorded
+        - event_ids: Record IDs in the same order as the input events
+        - count: Number of recorded events
+    """
+    try:
+        required = ("round_num", "speaker", "content", "action_type")
+        for index, event in enumerate(events):
+            missing = [key for key in required if key not in event]
+            if missing:
+                return {
+                    "success": False,
+                    "error": f"Event {index} is missing fields: {', '.join(missing)}"
+                }
+        
+        rows = [{**event, "game_id": event.get("game_id") or game_id} for event in events]
+        async with registry.journal(*(row["game_id"] for row in rows)):
+            event_ids = await db.record_events(rows)
+            
+            # 事件可能属于不同对局，按 game_id 分组应用到各自的会话
+            rows_by_game: Dict[Optional[str], List[Dict]] = {}
+            for row, event_id in zip(rows, event_ids):
+                rows_by_game.setdefault(row["game_id"], []).append({**row, "id": event_id})
+            for event_game_id, game_rows in rows_by_game.items():
+                session = await registry.get_async(event_game_id)
+                session.apply_history_events(game_rows)
+                await registry.checkpoints.maybe_checkpoint(session)
+        relations_added = sum(1 for row in rows if row.get("target_player") and row.get("relation_type"))
+        
+        logger.info(f"Recorded batch of {len(event_ids)} events ({relations_added} relations)")
+        
+        return {
+            "success": True,
+            "event_ids": event_ids,
+            "count": len(event_ids),
+            "relations_added": relations_added,
+            "game_id": game_id
+        }
+    except Exception as e:
+        logger.error(f"Error recording event batch: {e}")
+        return {"success": False, "error": str(e)}
+
+
 @YA_MCPServer_Tool(
     name="get_player_relations",
     title="Get Player Relations",
     description="Get relationship network for a player using knowledge graph"
 )
-async def get_player_relations(player_id: str) -> Dict[str, Any]:
+async def get_player_relations(player_id: str, game_id: Optional[str] = None) -> Dict[str, Any]:
     """Get relationship network for a player.
     
     Args:
         player_id: The player ID to analyze
+        game_id: Optional game ID whose knowledge graph to query
         
     Returns:
         Dict containing:
         - player_id: The queried player ID
         - relations: Incoming and outgoing relations
         - centrality: Centrality score in the network
+        - centrality_scores: PageRank, eigenvector, signed influence and degree centrality
     """
     try:
+        knowledge_graph = (await registry.get_async(game_id)).knowledge_graph
         relations = knowledge_graph.get_player_relations(player_id)
         centrality = knowledge_graph.calculate_centrality(player_id)
+        scores = knowledge_graph.centrality_scores().get(player_id, {})
         
         logger.info(f"Retrieved relations for player: {player_id}")
         
         return {
             "player_id": player_id,
             "relations": relations,
-            "centrality": round(centrality, 3)
+            "centrality": round(centrality, 3),
+            "centrality_scores": {metric: round(score, 4) for metric, score in scores.items()}
         }
     except Exception as e:
         logger.error(f"Error getting player relations: {e}")
         return {"error": str(e)}
 
 
+@YA_MCPServer_Tool(
+    name="get_recent_relations",
+    title="Get Recent Relations",
+    description="Get relations from the last N rounds and time-decayed edge weights from the knowledge graph"
+)
+async def get_recent_relations(
+    last_rounds: int = 2,
+    player_id: Optional[str] = None,
+    relation_type: Optional[str] = None,
+    game_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Get relations in a window of recent rounds, plus exponentially decayed edge weights.
+    
+    Args:
+        last_rounds: Number of most recent rounds to include (counting back from the latest round)
+        player_id: Optional player ID; only relations involving this player are returned
+        relation_type: Optional relation type filter (e.g., 'attack', 'support')
+        game_id: Optional game ID whose knowledge graph to query
+        
+    Returns:
+        Dict containing:
+        - latest_round: Latest round with a recorded relation
+        - relations: Relations in the window, each with source, target, round, type and weight
+        - decayed_weights: Edges with weights halved every knowledge_graph.temporal.half_life_rounds
+          rounds, in descending order of absolute weight
+    """
+    try:
+        knowledge_graph = (await registry.get_async(game_id)).knowledge_graph
+        latest_round = knowledge_graph.latest_round
+        relations = knowledge_graph.relations_in_window(
+            start_round=latest_round - last_rounds + 1,
+            player_id=player_id,
+            relation_type=relation_type
+        )
+        decayed = knowledge_graph.decayed_weights(relation_type=relation_type, player_id=player_id)
+        
+        logger.info(f"Retrieved {len(relations)} relations from the last {last_rounds} rounds")
+        
+        return {
+            "latest_round": latest_round,
+            "relations": [
+                {key: relation[key] for key in ("source", "target", "round", "type", "weight")}
+                for relation in relations
+            ],
+            "decayed_weights": [
+                {"source": source, "target": target, "weight": round(weight, 4)}
+                for (source, target), weight in sorted(decayed.items(), key=lambda item: -abs(item[1]))
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error getting recent relations: {e}")
+        return {"error": str(e)}
+
+
+@YA_MCPServer_Tool(
+    name="rank_players",
+    title="Rank Players",
+    description="Rank all players by PageRank, eigenvector, signed influence or degree centrality in the knowledge graph"
+)
+async def rank_players(metric: str = "pagerank", top_k: Optional[int] = None, game_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rank all players by a centrality metric computed over the whole graph in one pass.
+    
+    Args:
+        metric: One of pagerank, eigenvector, influence (support minus attack received,
+            weighted by the sender's PageRank, in [-1, 1]) or degree
+        top_k: Optional number of top players to return
+        game_id: Optional game ID whose knowledge graph to rank
+        
+    Returns:
+        Dict containing:
+        - metric: The metric used for ordering
+        - ranking: Players in descending order, each with all centrality scores
+        - count: Number of players returned
+    """
+    try:
+        ranking = (await registry.get_async(game_id)).knowledge_graph.rank_players(metric=metric, top_k=top_k)
+        
+        logger.info(f"Ranked {len(ranking)} players by {metric}")
+        
+        return {
+            "metric": metric,
+            "ranking": [
+                {key: round(value, 4) if isinstance(value, float) else value for key, value in entry.items()}
+                for entry in ranking
+            ],
+            "count": len(ranking)
+        }
+    except Exception as e:
+        logger.error(f"Error ranking players: {e}")
+        return {"error": str(e)}
+
+
 @YA_MCPServer_Tool(
     name="calculate_action_utility",
     title="Calculate Action Utility",
@@ -308,7 +791,8 @@ async def calculate_action_utility(
     action_candidates: List[Dict],
     current_role: str,
     alive_count: int,
-    suspicion_scores: Dict[str, float]
+    suspicion_scores: Dict[str, float],
+    game_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """Calculate utility scores for possible actions.
     
@@ -317,6 +801,7 @@ async def calculate_action_utility(
         current_role: Current role of the player (e.g., 'seer', 'villager')
         alive_count: Number of alive players
         suspicion_scores: Dictionary mapping player_id to suspicion score
+        game_id: Optional game ID
         
     Returns:
         Dict containing:
@@ -324,7 +809,7 @@ async def calculate_action_utility(
         - best_action: The action with highest utility
     """
     try:
-        utilities = game_tree.calculate_action_utility(
+        utilities = (await registry.get_async(game_id)).game_tree.calculate_action_utility(
             action_candidates=action_candidates,
             current_role=current_role,
             alive_count=alive_count,
@@ -350,19 +835,35 @@ async def calculate_action_utility(
     title="Detect Wolf Patterns",
     description="Detect suspicious patterns like wolf pairs or collusion using knowledge graph"
 )
-async def detect_wolf_patterns(threshold: float = 0.7) -> Dict[str, Any]:
+async def detect_wolf_patterns(
+    threshold: float = 0.7,
+    game_id: Optional[str] = None,
+    team_size: Optional[int] = None,
+    at_round: Optional[int] = None
+) -> Dict[str, Any]:
     """Detect suspicious patterns in player relationships.
     
     Args:
         threshold: Threshold for detecting suspicious pairs (0.0-1.0)
+        game_id: Optional game ID whose knowledge graph to analyze
+        team_size: Size of candidate wolf teams (defaults to total_wolves from initialize_game, or 2
+            when the game was not initialized)
+        at_round: Optional round; analyze the graph as it was at the end of that round
         
     Returns:
         Dict containing:
         - suspicious_pairs: List of suspicious player pairs
         - collusion_scores: Collusion scores for each player
         - attack_network: Network of attack relationships
+        - team_size: Team size used for the candidate teams
+        - candidate_teams: Wolf-team candidates from community detection on the signed
+          support/attack graph, each with players, cohesion and community_size
     """
     try:
+        session = await registry.get_async(game_id)
+        knowledge_graph = session.knowledge_graph
+        if at_round is not None:
+            knowledge_graph = knowledge_graph.snapshot(at_round)
         suspicious_pairs = knowledge_graph.detect_wolf_pair(threshold=threshold)
         
         all_players = list(knowledge_graph.nodes)
@@ -370,12 +871,21 @@ async def detect_wolf_patterns(threshold: float = 0.7) -> Dict[str, Any]:
         
         attack_network = knowledge_graph.get_attack_network()
         
-        logger.info(f"Detected {len(suspicious_pairs)} suspicious pairs")
+        team_size = team_size or session.total_wolves or 2
+        candidate_teams = knowledge_graph.candidate_teams(
+            team_size, top_k=get_config("knowledge_graph.community.top_teams", 5)
+        )
+        
+        logger.info(f"Detected {len(suspicious_pairs)} suspicious pairs and {len(candidate_teams)} candidate teams")
         
         return {
             "suspicious_pairs": suspicious_pairs,
             "collusion_scores": collusion_scores,
-            "attack_network": attack_network
+            "attack_network": attack_network,
+            "team_size": team_size,
+            "candidate_teams": [
+                {**team, "cohesion": round(team["cohesion"], 4)} for team in candidate_teams
+            ]
         }
     except Exception as e:
         logger.error(f"Error detecting wolf patterns: {e}")
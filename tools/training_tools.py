@@ -1,16 +1,19 @@
-from typing import Dict, List, Optional, Any, Literal
+from typing import Dict, List, Optional, Any, Literal, Tuple
 from tools import YA_MCPServer_Tool  # 复用现有工具注册装饰器
-from core.database import GameDatabase  # 复用现有数据库实例
+from core.session import get_registry  # 复用进程级共享数据库句柄
+from core import calibration  # 后验校准映射拟合与在线版本
+from core import likelihood_tables  # 证据似然表拟合与进程内共享表
 from modules.YA_Common.utils.logger import get_logger  # 复用现有日志
 from modules.YA_Common.utils.config import get_config  # 复用现有配置读取
 import json
 import os
+import textwrap
 from datetime import datetime
 import uuid
 
 # 全局初始化（与游戏工具共享资源，确保兼容性）
 logger = get_logger("training_tools")
-db = GameDatabase()
+db = get_registry().db
 # 全局训练状态管理（单机版，生产可替换为Redis）
 _training_global_state = {
     "is_running": False,
@@ -51,7 +54,7 @@ async def start_training(
                 "current_running_run_id": _training_global_state["current_run_id"],
                 "status": "failed"
             }
-        if not db.get_training_data(dataset_id=dataset_id):
+        if not await db.has_training_data(dataset_id=dataset_id):
             return {"error": f"数据集{dataset_id or '默认'}无训练数据，请先导入", "status": "failed"}
 
         # 生成唯一训练ID
@@ -64,7 +67,7 @@ async def start_training(
         }, ensure_ascii=False)
 
         # 数据库记录训练任务（第三步系统集成：对接TrainingRun表）
-        db.create_training_run(
+        await db.create_training_run(
             run_id=run_id,
             model_type=model_type,
             dataset_id=dataset_id or get_config("training.data.default_dataset_id", "default_werewolf"),
@@ -108,7 +111,7 @@ async def stop_training() -> Dict[str, Any]:
 
         run_id = _training_global_state["current_run_id"]
         # 更新数据库训练任务
-        db.update_training_run(
+        await db.update_training_run(
             run_id=run_id,
             status="stopped",
             end_time=datetime.now().isoformat(),
@@ -147,7 +150,7 @@ async def get_training_status(run_id: Optional[str] = None) -> Dict[str, Any]:
             return {"error": "无任何训练任务记录", "current_global_status": _training_global_state["status"], "status": "failed"}
 
         # 从数据库获取持久化数据
-        training_run = db.get_training_run(run_id=target_run_id)
+        training_run = await db.get_training_run(run_id=target_run_id)
         if not training_run:
             return {"error": f"训练任务{target_run_id}不存在", "status": "failed"}
 
@@ -185,11 +188,11 @@ async def evaluate_model(
     """评估模型，生成准确率/精确率/召回率/F1/混淆矩阵，对接评估层"""
     try:
         # 验证模型存在
-        model_version = db.get_model_version(version_id=model_version_id)
+        model_version = await db.get_model_version(version_id=model_version_id)
         if not model_version:
             return {"error": f"模型版本{model_version_id}不存在", "status": "failed"}
         # 验证测试集存在
-        if test_set_id and not db.get_training_data(dataset_id=test_set_id):
+        if test_set_id and not await db.has_training_data(dataset_id=test_set_id):
             return {"error": f"测试集{test_set_id}无数据", "status": "failed"}
 
         # 评估层逻辑占位（实际需对接scikit-learn/torch评估代码）
@@ -204,7 +207,7 @@ async def evaluate_model(
         confusion_matrix = [[85, 15], [12, 88]]
 
         # 更新数据库模型指标
-        db.update_model_version(
+        await db.update_model_version(
             version_id=model_version_id,
             metrics=json.dumps(evaluate_metrics, ensure_ascii=False),
             last_evaluated=datetime.now().isoformat()
@@ -233,13 +236,16 @@ async def evaluate_model(
 async def load_model(model_version_id: str) -> Dict[str, Any]:
     """加载模型，验证文件存在性，对接模型层加载逻辑"""
     try:
-        model_version = db.get_model_version(version_id=model_version_id)
+        model_version = await db.get_model_version(version_id=model_version_id)
         if not model_version:
             return {"error": f"模型版本{model_version_id}不存在", "status": "failed"}
         # 验证模型文件存在
         model_path = model_version["model_path"]
         if not os.path.exists(model_path):
             return {"error": f"模型文件缺失 | path={model_path}", "status": "failed"}
+        # 后验校准版本：切换为在线使用的校准映射
+        if model_version["model_type"] == calibration.CALIBRATION_MODEL_TYPE:
+            calibration.set_calibration(await db.run_read(calibration.Calibration.load, model_path))
 
         # 模型层加载逻辑占位（实际需对接torch.load/tensorflow.load）
         logger.info(f"模型加载成功 | model_version_id={model_version_id} | path={model_path}")
@@ -271,7 +277,7 @@ async def save_model(
     """保存模型，自动生成版本ID，更新TrainingRun和ModelVersion表"""
     try:
         # 验证训练任务存在
-        training_run = db.get_training_run(run_id=run_id)
+        training_run = await db.get_training_run(run_id=run_id)
         if not training_run:
             return {"error": f"训练任务{run_id}不存在", "status": "failed"}
         # 验证训练任务非已完成
@@ -289,7 +295,7 @@ async def save_model(
         # torch.save(model.state_dict(), model_path)  # PyTorch示例
 
         # 数据库记录模型版本
-        db.create_model_version(
+        await db.create_model_version(
             version_id=model_version_id,
             model_name=model_name,
             model_type=model_type,
@@ -299,7 +305,7 @@ async def save_model(
             created_at=datetime.now().isoformat()
         )
         # 更新训练任务为完成，关联模型版本
-        db.update_training_run(
+        await db.update_training_run(
             run_id=run_id,
             status="finished",
             end_time=datetime.now().isoformat(),
@@ -341,43 +347,60 @@ async def export_training_data(
     export_format: Literal["json", "csv"] = "json",
     output_path: str = get_config("training.data.export_path", "./exports/training_data")
 ) -> Dict[str, Any]:
-    """导出训练数据，自动创建目录，支持过滤条件"""
+    """导出训练数据，自动创建目录，支持过滤条件；流式写出，内存占用与数据量无关"""
     try:
-        # 获取过滤后的数据
-        training_data = db.get_training_data(dataset_id=dataset_id, label=label)
-        if not training_data:
+        if not await db.has_training_data(dataset_id=dataset_id, label=label):
             return {"error": "无符合条件的训练数据", "filter": {"dataset_id": dataset_id, "label": label}, "status": "failed"}
 
         # 确保导出目录存在
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         file_path = f"{output_path}.{export_format}"
 
-        # 导出数据（JSON/CSV）
-        if export_format == "json":
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(training_data, f, ensure_ascii=False, indent=2)
-        elif export_format == "csv":
-            import csv
-            if training_data:
-                fieldnames = training_data[0].keys()
-                with open(file_path, "w", encoding="utf-8", newline="") as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(training_data)
+        # 导出数据（JSON/CSV），在读线程中逐块读取、逐行写出
+        record_count = await db.run_read(_stream_training_data, file_path, export_format, dataset_id, label)
 
-        logger.info(f"训练数据导出成功 | 条数={len(training_data)} | 格式={export_format} | 路径={file_path}")
+        logger.info(f"训练数据导出成功 | 条数={record_count} | 格式={export_format} | 路径={file_path}")
         return {
             "status": "success",
             "filter": {"dataset_id": dataset_id, "label": label},
             "export_format": export_format,
             "file_path": os.path.abspath(file_path),
-            "record_count": len(training_data),
+            "record_count": record_count,
             "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
     except Exception as e:
         logger.error(f"导出训练数据失败: {str(e)}", exc_info=True)
         return {"error": f"导出训练数据失败：{str(e)}", "status": "failed"}
 
+
+def _stream_training_data(
+    file_path: str,
+    export_format: str,
+    dataset_id: Optional[str],
+    label: Optional[str]
+) -> int:
+    """把 iter_training_data 的结果逐行写入文件，返回写出的条数"""
+    rows = db.db.iter_training_data(dataset_id=dataset_id, label=label)
+    count = 0
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        if export_format == "json":
+            f.write("[")
+            for row in rows:
+                f.write(",\n" if count else "\n")
+                f.write(textwrap.indent(json.dumps(row, ensure_ascii=False, indent=2), "  "))
+                count += 1
+            f.write("\n]" if count else "]")
+        elif export_format == "csv":
+            import csv
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=row.keys())
+                    writer.writeheader()
+                writer.writerow(row)
+                count += 1
+    return count
+
 # -------------------------- 8. 获取模型指标 --------------------------
 @YA_MCPServer_Tool(
     name="get_model_metrics",
@@ -387,7 +410,7 @@ async def export_training_data(
 async def get_model_metrics(model_version_id: str) -> Dict[str, Any]:
     """获取模型指标，从ModelVersion表读取，返回标准化格式"""
     try:
-        model_version = db.get_model_version(version_id=model_version_id)
+        model_version = await db.get_model_version(version_id=model_version_id)
         if not model_version:
             return {"error": f"模型版本{model_version_id}不存在", "status": "failed"}
 
@@ -427,7 +450,7 @@ async def compare_models(model_version_ids: List[str]) -> Dict[str, Any]:
         valid_models = []
         # 遍历获取每个模型的指标
         for version_id in model_version_ids:
-            model_version = db.get_model_version(version_id=version_id)
+            model_version = await db.get_model_version(version_id=version_id)
             if not model_version:
                 compare_result[version_id] = {"status": "failed", "error": "模型版本不存在"}
                 continue
@@ -461,4 +484,105 @@ async def compare_models(model_version_ids: List[str]) -> Dict[str, Any]:
         }
     except Exception as e:
         logger.error(f"对比模型失败: {str(e)}", exc_info=True)
-        return {"error": f"对比模型失败：{str(e)}", "status": "failed"}
\ No newline at end of file
+        return {"error": f"对比模型失败：{str(e)}", "status": "failed"}
+# -------------------------- 10. 拟合证据似然表 --------------------------
+@YA_MCPServer_Tool(
+    name="fit_likelihood_tables",
+    title="Fit Likelihood Tables",
+    description="离线拟合按证据类型的似然表（TrainingData + 已结束对局），写入 inference.likelihood_tables.path，之后创建的推理引擎按表查询"
+)
+async def fit_likelihood_tables(
+    dataset_id: Optional[str] = None,
+    include_finished_games: bool = True,
+    output_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """在读线程中流式读取带标签的证据，拟合后写表文件并替换进程内共享表"""
+    try:
+        output_path = output_path or get_config("inference.likelihood_tables.path", "data/likelihood_tables.json")
+        tables = await db.run_read(_fit_and_save_likelihood_tables, dataset_id, include_finished_games, output_path)
+        likelihood_tables.set_likelihood_tables(tables)
+
+        logger.info(f"似然表拟合完成 | 类型数={len(tables)} | 路径={output_path}")
+        return {
+            "status": "success",
+            "filter": {"dataset_id": dataset_id, "include_finished_games": include_finished_games},
+            "file_path": os.path.abspath(output_path),
+            "bins": tables.bins,
+            "evidence_types": {
+                evidence_type: tables.samples.get(evidence_type, {}) for evidence_type in tables.evidence_types
+            },
+            "fitted_at": tables.fitted_at,
+            "tips": "没有表的证据类型继续使用线性似然；已驻留内存的对局在重新加载前沿用旧表"
+        }
+    except Exception as e:
+        logger.error(f"拟合似然表失败: {str(e)}", exc_info=True)
+        return {"error": f"拟合似然表失败：{str(e)}", "status": "failed"}
+
+# -------------------------- 11. 拟合后验校准 --------------------------
+@YA_MCPServer_Tool(
+    name="fit_calibration",
+    title="Fit Suspicion Calibration",
+    description="离线拟合后验校准映射（isotonic/platt），样本为已结束对局中身份揭晓前的后验；结果保存为 calibration 类型的模型版本"
+)
+async def fit_calibration(
+    method: Literal["isotonic", "platt"] = get_config("inference.calibration.method", "isotonic"),
+    activate: bool = True
+) -> Dict[str, Any]:
+    """拟合校准映射，写入映射文件与 ModelVersion（含校准前后的 Brier/ECE 指标），可立即切换为在线版本"""
+    try:
+        model_version_id = f"calib_{uuid.uuid4().hex[:8]}_{datetime.now().strftime('%Y%m%d')}"
+        model_path = os.path.join(
+            get_config("inference.calibration.path", "data/calibration"), f"{model_version_id}.json"
+        )
+        samples, fitted, metrics = await db.run_read(_fit_and_save_calibration, method, model_version_id, model_path)
+        now = datetime.now().isoformat()
+        await db.create_model_version(
+            version_id=model_version_id,
+            model_name="suspicion_calibration",
+            model_type=calibration.CALIBRATION_MODEL_TYPE,
+            model_path=model_path,
+            description=f"{method} 后验校准 | 样本数={len(samples)}",
+            created_at=now
+        )
+        await db.update_model_version(version_id=model_version_id, metrics=json.dumps(metrics), last_evaluated=now)
+        if activate:
+            calibration.set_calibration(fitted)
+
+        logger.info(f"后验校准拟合完成 | model_version_id={model_version_id} | 方法={method} | 样本数={len(samples)}")
+        return {
+            "status": "success",
+            "model_version_id": model_version_id,
+            "method": method,
+            "model_path": os.path.abspath(model_path),
+            "knots": len(fitted),
+            "metrics": metrics,
+            "active": activate,
+            "tips": "指标在拟合样本上计算；可用 load_model 切换在线使用的校准版本"
+        }
+    except Exception as e:
+        logger.error(f"拟合后验校准失败: {str(e)}", exc_info=True)
+        return {"error": f"拟合后验校准失败：{str(e)}", "status": "failed"}
+
+
+def _fit_and_save_likelihood_tables(
+    dataset_id: Optional[str],
+    include_finished_games: bool,
+    output_path: str
+) -> likelihood_tables.LikelihoodTables:
+    """拟合似然表并写表文件，整体在读线程中执行"""
+    tables = likelihood_tables.fit_from_database(db.db, dataset_id, include_finished_games)
+    tables.save(output_path)
+    return tables
+
+
+def _fit_and_save_calibration(
+    method: str,
+    model_version_id: str,
+    model_path: str
+) -> Tuple[List[Tuple[float, bool]], calibration.Calibration, Dict[str, Any]]:
+    """读取样本、拟合校准映射、计算指标并写映射文件，整体在读线程中执行"""
+    samples = calibration.finished_game_samples(db.db)
+    fitted = calibration.fit_calibration(samples, method=method, version=model_version_id)
+    metrics = calibration.calibration_metrics(samples, fitted)
+    fitted.save(model_path)
+    return samples, fitted, metrics